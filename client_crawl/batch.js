@@ -0,0 +1,62 @@
+const { blockResources, Timings } = require('./page_utils');
+
+// Render nhiều URL trong cùng một browser context: `concurrency` page chạy song song,
+// kết quả của mỗi URL được trả về (onResult) ngay khi URL đó xong, kèm thời gian theo giai đoạn.
+// handler(page, url, timings)
+async function runBatch(context, handler, urls, concurrency, onResult) {
+    let next = 0;
+
+    async function lane() {
+        while (next < urls.length) {
+            const url = urls[next++];
+            const timings = new Timings();
+            let page;
+            try {
+                page = await context.newPage();
+                const result = await handler(page, url, timings);
+                onResult({ url, ok: true, result, timings });
+            } catch (err) {
+                onResult({ url, ok: false, error: String(err && err.stack || err), timings });
+            } finally {
+                if (page) await page.close().catch(() => {});
+            }
+        }
+    }
+
+    const lanes = Math.max(1, Math.min(concurrency || 1, urls.length));
+    await Promise.all(Array.from({ length: lanes }, lane));
+}
+
+// Số page song song mặc định khi chạy script từ dòng lệnh
+const DEFAULT_CONCURRENCY = parseInt(process.env.RENDER_PAGES || '4', 10);
+
+// Chạy một handler từ dòng lệnh: một URL -> in kết quả (JSON), nhiều URL -> mỗi URL một dòng JSON
+async function runCli(handler, usage) {
+    const { chromium } = require('playwright');
+    const urls = process.argv.slice(2);
+    if (urls.length === 0) {
+        console.error(usage);
+        process.exit(1);
+    }
+
+    let browser;
+    try {
+        browser = await chromium.launch({ headless: true });
+        const context = await browser.newContext();
+        await blockResources(context);
+        if (urls.length === 1) {
+            const page = await context.newPage();
+            console.log(JSON.stringify(await handler(page, urls[0]), null, 2));
+        } else {
+            await runBatch(context, handler, urls, DEFAULT_CONCURRENCY,
+                message => process.stdout.write(JSON.stringify(message) + '\n'));
+        }
+    } catch (err) {
+        console.error('Error in script:', err);
+        process.exitCode = 1;
+    } finally {
+        if (browser) await browser.close();
+    }
+}
+
+module.exports = { runBatch, runCli, DEFAULT_CONCURRENCY };
@@ -1,85 +1,77 @@
-const { chromium } = require('playwright');
+const { runCli } = require('./batch');
 
-(async () => {
-    let browser;
-    const result = {};
+const { WAIT_TIMEOUT, Timings, waitForAny } = require('./page_utils');
 
-    try {
-        const url = process.argv[2];
-        if (!url) {
-            console.error('Usage: node crawl.js <URL>');
-            process.exit(1);
-        }
+// Nút mở modal thông số (selector chính trước, các selector thay thế sau)
+const SPECS_BUTTONS = [
+    ".button__show-modal-technical",
+    "button[data-modal='technical']",
+    ".btn-technical",
+    ".show-specs",
+    "button:has-text('Thông số kỹ thuật')",
+    "button:has-text('Chi tiết')"
+];
+// Nội dung modal specs (selector chính trước)
+const SPECS_MODALS = [
+    ".teleport-modal_content .technical-content-section",
+    ".modal .technical-content-section",
+    ".popup .technical-content-section",
+    ".overlay .technical-content-section",
+    ".specifications-modal",
+    ".tech-specs"
+];
 
-        browser = await chromium.launch({ headless: true });
-        const page = await browser.newPage();
-        await page.goto(url, { waitUntil: "domcontentloaded" });
-        await page.waitForTimeout(3000);
+// Selector đầu tiên trong danh sách đang có trên trang
+async function firstPresent(page, selectors) {
+    for (const sel of selectors) {
+        if (await page.locator(sel).count() > 0) return sel;
+    }
+    return null;
+}
 
-        // Tìm và click nút specs
-        const specsButton = page.locator(".button__show-modal-technical");
-        if (await specsButton.count() === 0) {
-            const altSelectors = [
-                "button[data-modal='technical']",
-                ".btn-technical",
-                ".show-specs",
-                "button:has-text('Thông số kỹ thuật')",
-                "button:has-text('Chi tiết')"
-            ];
-            for (const sel of altSelectors) {
-                if (await page.locator(sel).count() > 0) {
-                    await page.click(sel);
-                    break;
-                }
-            }
-        } else {
-            await specsButton.click();
-        }
+// Mở modal thông số kỹ thuật của Cellphones và đọc toàn bộ bảng specs
+async function crawlSpecifications(page, url, timings = new Timings()) {
+    await timings.measure('goto', () => page.goto(url, { waitUntil: "domcontentloaded" }));
 
-        // Chờ modal specs xuất hiện
-        let modalSelector = ".teleport-modal_content .technical-content-section";
-        try {
-            await page.waitForSelector(modalSelector, { timeout: 10000 });
-        } catch {
-            const fallbacks = [
-                ".modal .technical-content-section",
-                ".popup .technical-content-section",
-                ".overlay .technical-content-section",
-                ".specifications-modal",
-                ".tech-specs"
-            ];
-            for (const sel of fallbacks) {
-                try {
-                    await page.waitForSelector(sel, { timeout: 2000 });
-                    modalSelector = sel;
-                    break;
-                } catch { }
-            }
-        }
+    // Chờ nút specs xuất hiện thay vì sleep cố định, rồi click
+    await timings.measure('wait', () => waitForAny(page, SPECS_BUTTONS, WAIT_TIMEOUT, 'visible'));
+    const specsButton = await firstPresent(page, SPECS_BUTTONS);
+    if (specsButton) {
+        await page.click(specsButton);
+    }
+
+    // Chờ modal specs xuất hiện (bất kỳ selector nào), dùng selector đầu tiên có nội dung
+    await timings.measure('wait', () => waitForAny(page, SPECS_MODALS, 10000, 'visible'));
+    const modalSelector = await firstPresent(page, SPECS_MODALS) || SPECS_MODALS[0];
+
+    // Đọc specs
+    return timings.measure('extract', () => readSpecs(page, modalSelector));
+}
 
-        // Đọc specs
-        const sections = await page.locator(modalSelector).all();
-        for (const section of sections) {
-            const title = (await section.locator("p.title").innerText()).trim();
-            const rows = await section.locator("tr.technical-content-item").all();
-            const specs = {};
-            for (const row of rows) {
-                const cells = await row.locator("td").all();
-                if (cells.length >= 2) {
-                    const key = (await cells[0].innerText()).trim();
-                    const val = (await cells[1].innerText()).trim();
-                    specs[key] = val;
-                }
+// Đọc các bảng specs trong modal: {tiêu đề nhóm: {tên thông số: giá trị}}
+async function readSpecs(page, modalSelector) {
+    const result = {};
+    const sections = await page.locator(modalSelector).all();
+    for (const section of sections) {
+        const title = (await section.locator("p.title").innerText()).trim();
+        const rows = await section.locator("tr.technical-content-item").all();
+        const specs = {};
+        for (const row of rows) {
+            const cells = await row.locator("td").all();
+            if (cells.length >= 2) {
+                const key = (await cells[0].innerText()).trim();
+                const val = (await cells[1].innerText()).trim();
+                specs[key] = val;
             }
-            result[title] = specs;
         }
+        result[title] = specs;
+    }
+    return result;
+}
 
-        console.log(JSON.stringify(result, null, 2));  // xuất ra stdout
+module.exports = { crawlSpecifications };
 
-    } catch (err) {
-        console.error("Error in script:", err);
-        process.exitCode = 1;
-    } finally {
-        if (browser) await browser.close();
-    }
-})();
\ No newline at end of file
+if (require.main === module) {
+    // node crawl.js <URL> [URL...] - nhiều URL được render song song trong một browser
+    runCli(crawlSpecifications, 'Usage: node crawl.js <URL> [URL...]');
+}
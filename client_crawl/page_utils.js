@@ -0,0 +1,78 @@
+// Tiện ích dùng chung cho các script render: chặn tài nguyên không cần, chờ theo điều kiện, đo thời gian
+
+// Thời gian chờ tối đa (ms) cho phần bắt buộc (vd: giá) và phần có thể không có (vd: khuyến mãi)
+const WAIT_TIMEOUT = parseInt(process.env.RENDER_WAIT_TIMEOUT || '5000', 10);
+const OPTIONAL_WAIT_TIMEOUT = parseInt(process.env.RENDER_OPTIONAL_WAIT_TIMEOUT || '1500', 10);
+
+// Extractor chỉ đọc text trong DOM: ảnh, font, media và analytics không cần tải
+const BLOCKED_RESOURCE_TYPES = new Set(['image', 'font', 'media']);
+const BLOCKED_HOSTS = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googlesyndication.com',
+    'facebook.net',
+    'connect.facebook.com',
+    'analytics.tiktok.com',
+    'hotjar.com',
+    'clarity.ms',
+    'criteo.com',
+    'criteo.net',
+];
+
+function isBlocked(request) {
+    if (BLOCKED_RESOURCE_TYPES.has(request.resourceType())) return true;
+    let host;
+    try {
+        host = new URL(request.url()).hostname;
+    } catch {
+        return false;
+    }
+    return BLOCKED_HOSTS.some(blocked => host === blocked || host.endsWith('.' + blocked));
+}
+
+// Chặn tài nguyên cho mọi page của context (tắt bằng RENDER_BLOCK_RESOURCES=0)
+async function blockResources(context) {
+    if (process.env.RENDER_BLOCK_RESOURCES === '0') return;
+    await context.route('**/*', route => (
+        isBlocked(route.request()) ? route.abort() : route.continue()
+    ));
+}
+
+// Chờ tới khi một trong các selector có trong DOM, trả về true/false thay vì throw khi hết giờ
+async function waitForAny(page, selectors, timeout = WAIT_TIMEOUT, state = 'attached') {
+    try {
+        await page.waitForSelector(selectors.join(', '), { state, timeout });
+        return true;
+    } catch {
+        return false;
+    }
+}
+
+// Thời gian (ms) theo từng giai đoạn của một URL, cộng dồn nếu một giai đoạn lặp lại (vd: mỗi màu một goto)
+class Timings {
+    constructor() {
+        this.start = performance.now();
+        this.phases = {};
+    }
+
+    async measure(phase, fn) {
+        const start = performance.now();
+        try {
+            return await fn();
+        } finally {
+            this.phases[phase] = (this.phases[phase] || 0) + performance.now() - start;
+        }
+    }
+
+    toJSON() {
+        const result = {};
+        for (const [phase, elapsed] of Object.entries(this.phases)) {
+            result[phase] = Math.round(elapsed);
+        }
+        result.total = Math.round(performance.now() - this.start);
+        return result;
+    }
+}
+
+module.exports = { WAIT_TIMEOUT, OPTIONAL_WAIT_TIMEOUT, blockResources, waitForAny, Timings };
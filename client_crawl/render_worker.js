@@ -0,0 +1,93 @@
+const readline = require('readline');
+const { chromium } = require('playwright');
+const { crawlColorVariants, crawlPrice } = require('./thegioididong_crawl');
+const { crawlSpecifications } = require('./crawl');
+const { runBatch, DEFAULT_CONCURRENCY } = require('./batch');
+const { blockResources } = require('./page_utils');
+
+// Worker render chạy lâu dài: giữ một browser, nhận job qua stdin (JSON lines)
+// và trả kết quả qua stdout (JSON lines).
+//
+// Mỗi job là một batch URL, render song song trên `concurrency` page của cùng browser;
+// kết quả của từng URL được gửi ngay khi xong (không theo thứ tự), rồi một dòng kết thúc job.
+//
+//   stdin : {"id": 1, "task": "thegioididong", "urls": ["https://...", ...], "concurrency": 4}
+//           {"id": 2, "task": "thegioididong", "url": "https://..."}       (một URL)
+//   stdout: {"id": 1, "url": "https://...", "ok": true, "result": ..., "timings": {"goto": 812, "wait": 240, ..., "total": 1130}}
+//           {"id": 1, "url": "https://...", "ok": false, "error": "...", "timings": {...}}
+//           {"id": 1, "done": true}
+//           {"id": 1, "done": true, "ok": false, "error": "..."}           (lỗi cả job)
+//           {"id": null, "done": true, "ok": false, "error": "Invalid job: ..."} (dòng job hỏng, không đọc được id)
+const TASKS = {
+    thegioididong: crawlColorVariants,
+    thegioididong_price: crawlPrice,
+    cellphones_specs: crawlSpecifications,
+};
+
+// stdout dành riêng cho protocol, mọi log khác chuyển sang stderr
+console.log = (...args) => console.error(...args);
+
+function send(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+let browser;
+let context;
+
+async function getContext() {
+    if (!browser) {
+        browser = await chromium.launch({ headless: true });
+    }
+    if (!context) {
+        context = await browser.newContext();
+        await blockResources(context);
+    }
+    return context;
+}
+
+async function runJob(job) {
+    const handler = TASKS[job.task];
+    if (!handler) {
+        send({ id: job.id, done: true, ok: false, error: `Unknown task: ${job.task}` });
+        return;
+    }
+
+    const urls = job.urls || [job.url];
+    try {
+        const context = await getContext();
+        await runBatch(context, handler, urls, job.concurrency || DEFAULT_CONCURRENCY,
+            message => send({ id: job.id, ...message }));
+        send({ id: job.id, done: true });
+    } catch (err) {
+        send({ id: job.id, done: true, ok: false, error: String(err && err.stack || err) });
+    }
+}
+
+async function shutdown() {
+    if (browser) await browser.close().catch(() => {});
+    process.exit(0);
+}
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+let chain = Promise.resolve();
+
+rl.on('line', line => {
+    if (!line.trim()) return;
+    let job;
+    try {
+        job = JSON.parse(line);
+    } catch (err) {
+        // Trả lỗi cho đúng job nếu còn đọc được id, để phía Python không phải chờ tới timeout
+        const match = /"id"\s*:\s*(\d+)/.exec(line);
+        send({ id: match ? Number(match[1]) : null, done: true, ok: false, error: `Invalid job: ${err}` });
+        return;
+    }
+    // Các job (batch) được xử lý lần lượt, các URL trong một batch chạy song song
+    chain = chain.then(() => runJob(job));
+});
+
+rl.on('close', () => {
+    chain.then(shutdown);
+});
+
+process.on('SIGTERM', shutdown);
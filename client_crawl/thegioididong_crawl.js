@@ -1,4 +1,19 @@
-const { chromium } = require('playwright');
+const { runCli } = require('./batch');
+const { OPTIONAL_WAIT_TIMEOUT, Timings, waitForAny } = require('./page_utils');
+
+// Các phần extractPriceAndPromotions đọc: giá (luôn có) và khuyến mãi (không phải sản phẩm nào cũng có)
+const PRICE_SELECTORS = ['div.price-one', 'div.bs_title div.bs_price'];
+const PROMO_SELECTORS = ['div.block__promo'];
+const COLOR_LINKS = 'div.scrolling_inner div.box03.color.group.desk a.box03__item';
+
+// Mở URL và chờ các phần cần trích xuất thay vì sleep cố định
+async function openProduct(page, url, timings) {
+    await timings.measure('goto', () => page.goto(url, { waitUntil: 'domcontentloaded' }));
+    await timings.measure('wait', () => Promise.all([
+        waitForAny(page, PRICE_SELECTORS),
+        waitForAny(page, PROMO_SELECTORS, OPTIONAL_WAIT_TIMEOUT),
+    ]));
+}
 
 async function extractPriceAndPromotions(page) {
     const productData = {};
@@ -47,53 +62,46 @@ async function extractPriceAndPromotions(page) {
     return productData;
 }
 
-(async () => {
-    let browser;
-    try {
-        const url = process.argv[2];
-        if (!url) {
-            console.error('Usage: node crawl.js <BASE_URL>');
-            process.exit(1);
-        }
+// Duyệt từng màu của sản phẩm trên một page có sẵn, trả về mảng giá theo màu
+async function crawlColorVariants(page, url, timings = new Timings()) {
+    await openProduct(page, url, timings);
 
-        browser = await chromium.launch({ headless: true });
-        const page = await browser.newPage();
-        await page.goto(url, { waitUntil: 'domcontentloaded' });
-        await page.waitForTimeout(2000);
-
-        // 1. Lấy danh sách màu: text + href
-        const colors = await page.$$eval(
-            'div.scrolling_inner div.box03.color.group.desk a.box03__item',
-            els => els.map(a => ({
-                name: a.textContent.trim(),
-                href: a.href
-            }))
-        );
+    // 1. Lấy danh sách màu: text + href
+    const colors = await page.$$eval(
+        COLOR_LINKS,
+        els => els.map(a => ({
+            name: a.textContent.trim(),
+            href: a.href
+        }))
+    );
 
-        const results = [];
-        for (const { name: color, href } of colors) {
-            // 2. Đi tới URL của màu đó
-            await page.goto(href, { waitUntil: 'domcontentloaded' });
-            await page.waitForTimeout(2000);
+    const results = [];
+    for (const { name: color, href } of colors) {
+        // 2. Đi tới URL của màu đó (màu đang mở thì không cần tải lại)
+        if (href !== page.url()) {
+            await openProduct(page, href, timings);
+        }
 
-            // 3. (Nếu cần) click specs modal
-            //    await page.click('.button__show-modal-technical').catch(() => {});
-            //    await page.waitForTimeout(1500);
+        // 3. Extract price & promotions
+        const data = await timings.measure('extract', () => extractPriceAndPromotions(page));
 
-            // 4. Extract price & promotions
-            const data = await extractPriceAndPromotions(page);
+        // 4. Gán thêm trường color, url
+        results.push({ color, ...data });
+    }
 
-            // 5. Gán thêm trường color, url
-            results.push({ color, ...data });
-        }
+    return results;
+}
+
+// Giá & khuyến mãi của đúng một trang (một màu), dùng khi spider tự tải các màu
+// nhưng HTML tĩnh của trang màu không có giá
+async function crawlPrice(page, url, timings = new Timings()) {
+    await openProduct(page, url, timings);
+    return timings.measure('extract', () => extractPriceAndPromotions(page));
+}
 
-        // In ra mảng kết quả
-        console.log(JSON.stringify(results, null, 2));
+module.exports = { extractPriceAndPromotions, crawlColorVariants, crawlPrice };
 
-    } catch (err) {
-        console.error('Error in script:', err);
-        process.exitCode = 1;
-    } finally {
-        if (browser) await browser.close();
-    }
-})();
+if (require.main === module) {
+    // node thegioididong_crawl.js <URL> [URL...] - nhiều URL được render song song trong một browser
+    runCli(crawlColorVariants, 'Usage: node thegioididong_crawl.js <BASE_URL> [BASE_URL...]');
+}
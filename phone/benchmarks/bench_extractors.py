@@ -0,0 +1,233 @@
+# bench_extractors.py - So sánh thời gian và memory trích xuất mỗi trang:
+# BeautifulSoup cả trang, BeautifulSoup chỉ các container (SoupStrainer), lxml (selector compile sẵn)
+#
+# Chạy từ thư mục phone/:
+#   python benchmarks/bench_extractors.py fptshop:saved/fpt.html cellphones:saved/cps.html
+#   python benchmarks/bench_extractors.py                      # trang tổng hợp (synthetic) của cả 3 site
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_fpt_specs import build_synthetic_page as build_fpt_specs  # noqa: E402
+from phone.extraction import ExtractionExecutor  # noqa: E402
+from phone.spiders.crawl_phone import JobSpider  # noqa: E402
+
+
+def filler(n):
+    """Phần nội dung không liên quan (menu, bài viết, script) làm trang có kích thước thật"""
+    blocks = []
+    for i in range(n):
+        blocks.append(
+            f'<div class="block-{i % 7} flex flex-col"><a href="/link-{i}">Liên kết {i}</a>'
+            f'<p class="text-sm">Đoạn mô tả số {i} <b>in đậm</b> <!-- comment --> và <i>nghiêng</i>.</p>'
+            f'<ul><li><span>Mục {i}.1</span></li><li><span>Mục {i}.2</span></li></ul></div>'
+        )
+    return ''.join(blocks) + '<script>var config = {"a": 1, "b": [1, 2, 3]};</script><style>.x{color:red}</style>'
+
+
+def build_thegioididong(noise=400):
+    specs = ''.join(
+        f'<div class="box-specifi"><h3>Nhóm {g}</h3><ul class="text-specifi">' + ''.join(
+            f'<li><aside><strong>Thông số {g}.{k}:</strong></aside>'
+            f'<aside><span>Giá trị</span> <a href="#">{g}.{k}</a> <span>đơn vị</span></aside></li>'
+            for k in range(8)) + '</ul></div>'
+        for g in range(10))
+    return (
+        '<!DOCTYPE html><html><head><title>TGDD</title></head><body>' + filler(noise) +
+        '<section class="detail"><ul class="breadcrumb"><li><a href="/">Điện thoại</a></li>'
+        '<li><a href="/dtdd-apple-iphone">iPhone</a></li></ul>'
+        '<div class="product-name"><h1>Điện thoại iPhone 16 Pro Max 256GB</h1>'
+        '<span class="quantity-sale">Đã bán 12,3k</span><div class="detail-rate"><p>4.9</p> <p>(1.234)</p></div></div>'
+        '<div class="group-box03"><div class="box03 group"><a class="box03__item item">128GB</a>'
+        '<a class="box03__item item act">256GB</a></div>'
+        '<div class="box03 color group"><a class="box03__item item act">Titan Đen</a>'
+        '<a class="box03__item item">Titan Trắng</a><a class="box03__item item">Titan Sa Mạc</a></div></div>'
+        '<div class="scrolling_inner"><div class="box03 color group desk">'
+        '<a class="box03__item item act" href="/dtdd/iphone-16-pro-max?code=den">Titan Đen</a>'
+        '<a class="box03__item item" href="/dtdd/iphone-16-pro-max?code=trang">Titan Trắng</a></div></div>'
+        '<div class="price-one"><div class="box-price"><p class="box-price-present">30.990.000₫ </p>'
+        '<p class="box-price-old">34.990.000₫</p><p class="box-price-percent">-11%</p></div>'
+        '<span class="label--black">Trả góp 0%</span></div>'
+        '<div id="location-detail"><a href="#"> Hồ Chí Minh </a></div>'
+        '<div class="block__promo"><p class="pr-txtb">Khuyến mãi trị giá 500.000₫</p><div class="divb-right">'
+        '<p>Giảm 500K khi thu cũ</p><p>Tặng phiếu mua hàng <a href="#">chi tiết</a></p></div></div>'
+        '<p class="loyalty__main__point">+7.747 điểm tích lũy</p>'
+        '</section>' + specs +
+        '<ul class="policy__list"><li><div class="pl-txt">Hư gì đổi nấy <b>12 tháng</b></div></li>'
+        '<li><div class="pl-txt">Bảo hành chính hãng 1 năm</div></li></ul>'
+        '<div id="popup-baohanh-content"><div class="warranty-box"><h2 class="title">Bảo hành</h2>'
+        '<span>Bảo hành 12 tháng tại trung tâm</span></div><div class="change-box">'
+        '<div class="block-change"><h3>Đổi trả</h3><div class="content-insider"><p>Dòng 1</p><p>Dòng 2</p></div></div>'
+        '<div class="block-change"><h3>Hoàn tiền</h3><div class="content-insider"><p>Hoàn 100%</p></div></div>'
+        '</div></div>' + filler(noise) + '</body></html>'
+    ).encode('utf-8')
+
+
+def build_cellphones(noise=400):
+    breadcrumb = ('{"@context":"https://schema.org","@type":"BreadcrumbList","itemListElement":['
+                  '{"@type":"ListItem","position":1,"item":{"@id":"https://cellphones.com.vn","name":"Trang chủ"}},'
+                  '{"@type":"ListItem","position":2,"item":{"@id":"https://cellphones.com.vn/mobile.html","name":"Điện thoại"}}]}')
+    versions = ''.join(
+        f'<a href="/iphone-16-{c}.html" class="item-linked{" active" if c == "256gb" else ""}"><strong>{c.upper()}</strong>'
+        f'<span>30.990.000đ</span></a>' for c in ('128gb', '256gb', '512gb'))
+    variants = ''.join(
+        f'<li class="item-variant{" active" if i == 0 else ""}"><a href="/iphone-16?color={i}" class="change-button">'
+        f'<strong class="item-variant-name">Màu {i}</strong><span class="item-variant-price">2{i}.990.000đ</span></a></li>'
+        for i in range(4))
+    promotions = ''.join(
+        f'<div class="promotion-pack_item"><div class="box-product-promotion-detail"><p>Khuyến mãi {i} '
+        f'<a href="/km-{i}">Xem chi tiết</a></p></div></div>' for i in range(6))
+    payment = ''.join(f'<li>Giảm {i}00K khi thanh toán <a href="/tt-{i}">qua thẻ</a></li>' for i in range(5))
+    warranty = ''.join(
+        f'<div class="item-warranty-info"><div class="icon"></div><div class="description">Cam kết {i} '
+        f'<a href="/ck-{i}">chi tiết</a></div></div>' for i in range(4))
+    return (
+        '<!DOCTYPE html><html><head><title>Cellphones</title>'
+        f'<script type="application/ld+json">{{"@type":"Product","name":"x"}}</script>'
+        f'<script type="application/ld+json">{breadcrumb}</script></head><body>' + filler(noise) +
+        '<div class="box-detail-product"><div class="box-detail-product__box-left">'
+        '<div class="box-product-name"><h1>iPhone 16 Pro Max 256GB</h1></div>'
+        '<div class="box-rating"><span>4.9</span> <span class="total-rating">(123 đánh giá)</span></div>'
+        '<div class="box-bottom-item"><span class="label">Thông số</span></div>'
+        '<div class="box-bottom-item"><span class="label">Hỏi đáp</span></div>'
+        '<div class="pdp-compare-button-box"><a class="label">So sánh</a></div>'
+        '<div class="box-warranty-info"><div class="box-title"><p>Cam kết sản phẩm</p></div>' + warranty + '</div>'
+        '</div><div class="box-detail-product__box-center">'
+        '<div class="box-product-price"><div class="sale-price">30.990.000đ</div><del class="base-price">34.990.000đ</del></div>'
+        '<div class="box-linked">' + versions + '</div>'
+        '<div class="box-product-variants"><ul class="list-variants">' + variants + '</ul></div>'
+        '<div class="box-product-promotion"><div class="box-product-promotion-header"><span>Khuyến mãi hấp dẫn</span></div>'
+        + promotions + '</div><div class="box-more-promotion"><div class="box-more-promotion-title"><span>Ưu đãi thanh toán</span>'
+        '</div><div class="render-promotion"><ul>' + payment + '</ul></div></div>'
+        '</div></div>' + filler(noise) + '</body></html>'
+    ).encode('utf-8')
+
+
+def build_fptshop(noise=400):
+    storage = ''.join(
+        f'<button class="Selection_button{" Selection_buttonSelect__7lW_h" if i == 1 else ""}">'
+        f'<span class="block text-textOnWhitePrimary b2-medium">{c}</span></button>'
+        for i, c in enumerate(('128GB', '256GB', '512GB')))
+    colors = ''.join(
+        f'<button class="Selection_button{" Selection_buttonSelect__7lW_h" if i == 0 else ""}"><img src="/c{i}.png">'
+        f'<span class="block text-textOnWhitePrimary b2-medium">Màu {i}</span></button>' for i in range(4))
+    slides = ''.join(f'<div class="swiper-slide"><img alt=" Ưu đãi {i} " src=" /s{i}.png "></div>' for i in range(5))
+    warranty = ''.join(
+        f'<div class="relative grid h-14"><p class="line-clamp-2">Gói {i}</p>'
+        f'<span class="text-textOnWhiteBrand">{i}90.000 ₫</span>'
+        f'<span class="text-textOnWhiteDisable line-through">{i}99.000 ₫</span></div>' for i in range(1, 4))
+    specs_page = build_fpt_specs().decode('utf-8')
+    scripts = specs_page[specs_page.index('<script>'):specs_page.rindex('</body>')]
+    return (
+        '<!DOCTYPE html><html><head><title>FPT</title></head><body>' + filler(noise) +
+        '<nav class="Breadcrumb"><ol><li><a href="/"><span>Trang chủ</span></a></li>'
+        '<li><a href="/dien-thoai">Điện thoại</a></li><li>iPhone 16</li></ol></nav>'
+        '<div id="ThongTinSanPham">'
+        '<h1 class="text-textOnWhitePrimary b2-medium pc:l6-semibold">iPhone 16 Pro Max 256GB</h1>'
+        '<div class="ml-1.5 flex items-center gap-1"><div class="text-textOnWhitePrimary b2-regular">4.9</div></div>'
+        '<div class="ml-1 cursor-pointer text-textOnWhiteHyperLink f1-medium pc:b2-medium">123 đánh giá</div>'
+        '<div class="grid gap-y-3 pb-4 pt-3 pc:gap-y-2 pc:py-0">'
+        '<div><span>Dung lượng</span><div class="flex">' + storage + '</div></div>'
+        '<div><span>Màu sắc</span><div class="flex">' + colors + '</div></div></div>'
+        '<div id="tradePrice"><span class="h4-bold">30.990.000 ₫</span>'
+        '<span class="text-neutral-gray-5 line-through">34.990.000 ₫</span><span class="text-red-red-7">-11%</span>'
+        '<span class="text-yellow-yellow-7 b2-medium">+7.497 Điểm thưởng</span></div>'
+        '<div class="relative flex flex-col gap-2.5 rounded-[0.375rem] border"><p>Giảm ngay 1 triệu</p><p>Tặng ốp lưng</p></div>'
+        '<div class="flex flex-col pc:flex-col-reverse pc:gap-3"><div class="swiper"><div class="swiper-wrapper">' + slides +
+        '</div></div><div class="flex flex-col gap-3"><p class="text-textOnWhitePrimary">Quà tặng 1 Xem chi tiết</p>'
+        '<p class="text-textOnWhitePrimary">Xem chi tiết</p></div></div>'
+        '<div class="flex flex-col gap-2 px-4 pb-4 pt-3">' + warranty + '</div>'
+        '</div>' + filler(noise) + scripts + '</body></html>'
+    ).encode('utf-8')
+
+
+BUILDERS = {
+    'thegioididong': build_thegioididong,
+    'cellphones': build_cellphones,
+    'fptshop': build_fptshop,
+}
+
+
+def bench(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# tên cột -> (EXTRACTION_BACKEND, EXTRACTION_PARSE_ONLY)
+VARIANTS = {
+    'bs4': ('bs4', False),
+    'bs4-strain': ('bs4', True),
+    'lxml': ('lxml', True),
+}
+
+
+def make_spider(backend, parse_only=True):
+    spider = JobSpider()
+    spider.extraction = ExtractionExecutor(max_workers=1, mode='serial')
+    spider.extraction_backend = backend
+    spider.parse_only_sections = parse_only
+    return spider
+
+
+def peak_memory(fn):
+    """Peak memory (Python allocations) trong lúc chạy fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-page extraction: bs4 vs bs4 + SoupStrainer vs lxml")
+    parser.add_argument('pages', nargs='*', help='site:path tới trang sản phẩm đã lưu (vd: fptshop:page.html)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for spec in args.pages:
+            site, _, path = spec.partition(':')
+            with open(path, 'rb') as f:
+                pages.append((site, os.path.basename(path), f.read()))
+    else:
+        pages = [(site, 'synthetic', build()) for site, build in BUILDERS.items()]
+
+    spiders = {name: make_spider(*options) for name, options in VARIANTS.items()}
+    total = dict.fromkeys(VARIANTS, 0.0)
+    print(f"{'site':<14} {'page':<20} {'size':>8}" + ''.join(f" {name:>18}" for name in VARIANTS) + "  same")
+    for site, name, body in pages:
+        times, peaks, results = {}, {}, {}
+        for variant, spider in spiders.items():
+            # Bỏ các dòng print của extractor khỏi output benchmark
+            with contextlib.redirect_stdout(io.StringIO()):
+                def run():
+                    return spider.extract_sections(site, body, name, 'utf-8')
+                times[variant], results[variant] = bench(run, args.repeat)
+                peaks[variant] = peak_memory(run)
+            total[variant] += times[variant]
+        same = all(result == results['bs4'] for result in results.values())
+        print(f"{site:<14} {name:<20} {len(body):>8}" + ''.join(
+            f" {times[v] * 1000:>7.2f}ms {peaks[v] / 1024 / 1024:>6.1f}MB" for v in VARIANTS) + f"  {same}")
+        if not same and not args.pages:
+            for variant, result in results.items():
+                print(f"   {variant}: {result}")
+
+    print("\nTotal: " + ', '.join(f"{v} {total[v] * 1000:.1f}ms ({total['bs4'] / max(total[v], 1e-9):.1f}x)"
+                                for v in VARIANTS))
+
+
+if __name__ == '__main__':
+    main()
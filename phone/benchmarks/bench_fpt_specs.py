@@ -0,0 +1,121 @@
+# bench_fpt_specs.py - So sánh trích xuất thông số FPT Shop: flight decoder vs prettify + regex + demjson3
+# (đường cũ được đo cùng bước soup.prettify() mà nó từng cần)
+#
+# Chạy từ thư mục phone/:
+#   python benchmarks/bench_fpt_specs.py saved_pages/*.html   # các trang FPT đã lưu
+#   python benchmarks/bench_fpt_specs.py                      # trang tổng hợp (synthetic)
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from phone.spiders.crawl_phone import JobSpider, demjson3  # noqa: E402
+
+
+def push(chunk):
+    return f'<script>self.__next_f.push([1,{json.dumps(chunk, ensure_ascii=False)}])</script>'
+
+
+def build_synthetic_page(groups=20, attributes=12, filler_rows=600):
+    """
+    Trang có cấu trúc giống FPT Shop: nhiều chunk flight (component tree, import, hint,
+    text row) và row "16" trỏ tới object chứa attributeItem - đủ để cả hai cách parse chạy được.
+    """
+    rows = [
+        '1:I["(app-pages-browser)/./src/app/layout.tsx",["app/layout","static/chunks/app/layout.js"],"default"]',
+        '2:HL["/_next/static/css/app.css","style"]',
+    ]
+    for i in range(filler_rows):
+        row_id = format(0x100 + i, 'x')
+        child = format(0x100 + i + 1, 'x') if i + 1 < filler_rows else None
+        props = {
+            "className": f"flex flex-col gap-{i % 8} text-textOnWhitePrimary",
+            "children": [f"$L{child}"] if child else [f"Nội dung khối {i}"],
+            "data": {"id": i, "slug": f"block-{i}", "items": list(range(i % 10))},
+        }
+        rows.append(f'{row_id}:{json.dumps(["$", "div", None, props], ensure_ascii=False)}')
+    text = 'Mô tả sản phẩm\nĐiện thoại thông minh với nhiều tính năng.'
+    rows.append(f'3:T{len(text.encode("utf-8")):x},{text}')
+
+    attribute_items = [
+        {
+            "groupName": f"Nhóm thông số {g}",
+            "attributes": [
+                {"displayName": f"Thuộc tính {g}.{a}", "value": f"Giá trị {g}.{a} (chuẩn A/B)", "unit": None}
+                for a in range(attributes)
+            ],
+        }
+        for g in range(groups)
+    ]
+    head = '\n'.join(rows) + '\n'
+    specs = '16:["$a1"]\na1:' + json.dumps({"product": {"sku": "00912", "attributeItem": attribute_items}},
+                                           ensure_ascii=False) + '\n'
+
+    # Next.js chia payload thành nhiều chunk
+    step = max(1, len(head) // 8)
+    scripts = [push(head[i:i + step]) for i in range(0, len(head), step)] + [push(specs)]
+    html = ('<!DOCTYPE html><html><head><title>FPT</title></head><body>'
+            '<div id="ThongTinSanPham"><h1>Điện thoại</h1></div>' + ''.join(scripts) + '</body></html>')
+    return html.encode('utf-8')
+
+
+def bench(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FPT Shop spec extraction")
+    parser.add_argument('pages', nargs='*', help='Các file HTML trang sản phẩm FPT Shop đã lưu')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for path in args.pages:
+            with open(path, 'rb') as f:
+                pages.append((os.path.basename(path), f.read()))
+    else:
+        pages = [('synthetic', build_synthetic_page())]
+
+    spider = JobSpider()
+    total_new = total_old = 0.0
+    print(f"{'page':<40} {'size':>9} {'flight':>10} {'legacy':>10} {'speedup':>8}  same")
+    for name, body in pages:
+        new_time, new_specs = bench(lambda: spider._extract_all_specs_fptshop(body, name), args.repeat)
+
+        if demjson3 is None:
+            print(f"{name:<40} {len(body):>9} {new_time * 1000:>8.2f}ms {'-':>10} {'-':>8}  (demjson3 not installed)")
+            total_new += new_time
+            continue
+
+        # Đường cũ: prettify toàn bộ soup rồi regex + demjson3 (không tính thời gian parse soup,
+        # vì soup từng được dùng cho các extractor khác)
+        soup = BeautifulSoup(body, 'lxml')
+
+        def legacy():
+            return spider._extract_all_specs_fptshop_legacy(soup.prettify().encode('utf-8'), name)
+
+        old_time, old_specs = bench(legacy, args.repeat)
+        total_new += new_time
+        total_old += old_time
+        print(f"{name:<40} {len(body):>9} {new_time * 1000:>8.2f}ms {old_time * 1000:>8.2f}ms "
+              f"{old_time / max(new_time, 1e-9):>7.1f}x  {new_specs == old_specs}")
+
+    if total_old:
+        print(f"\nTotal: flight {total_new * 1000:.1f}ms, legacy {total_old * 1000:.1f}ms "
+              f"({total_old / max(total_new, 1e-9):.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
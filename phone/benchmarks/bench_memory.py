@@ -0,0 +1,97 @@
+# bench_memory.py - Peak RSS khi trích xuất với CONCURRENT_REQUESTS trang đang xử lý cùng lúc
+#
+# Mô phỏng callback sản phẩm: mỗi response sống tới khi render (giá/thông số) xong, nên luôn có
+# `--concurrency` trang "in-flight" giữ body cùng những gì callback còn giữ trong lúc chờ.
+# Mỗi biến thể chạy trong một process riêng vì ru_maxrss là peak của cả process.
+#
+# Chạy từ thư mục phone/:
+#   python benchmarks/bench_memory.py                   # CONCURRENT_REQUESTS = 32
+#   python benchmarks/bench_memory.py --concurrency 64 --pages 600
+import argparse
+import contextlib
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# biến thể -> mô tả
+VARIANTS = {
+    'before': "response.text + BeautifulSoup(text) cả trang (+ prettify cho FPT), soup giữ trong lúc chờ render",
+    'bs4': "BeautifulSoup từ bytes, cả trang, cây được decompose sau khi trích xuất",
+    'bs4-strain': "BeautifulSoup từ bytes, chỉ các container (EXTRACTION_PARSE_ONLY)",
+    'lxml': "lxml từ bytes, selector compile sẵn (EXTRACTION_BACKEND = 'lxml')",
+}
+
+
+def rss_mb():
+    # Linux: KB, macOS: bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_variant(variant, concurrency, pages):
+    from bs4 import BeautifulSoup
+
+    from bench_extractors import BUILDERS, make_spider
+
+    templates = [(site, build()) for site, build in BUILDERS.items()]
+    spider = make_spider('lxml' if variant == 'lxml' else 'bs4', parse_only=(variant == 'bs4-strain'))
+    baseline = rss_mb()
+
+    in_flight = deque()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(pages):
+            site, template = templates[i % len(templates)]
+            # Mỗi response có body riêng như khi tải về
+            body = template + f'<!-- {i} -->'.encode()
+            url = f'https://example.com/{site}/{i}'
+
+            if variant == 'before':
+                text = body.decode('utf-8')
+                soup = BeautifulSoup(text, 'lxml')
+                extract = getattr(spider, spider.SECTION_EXTRACTORS['bs4'][site])
+                sections = extract(soup, url, body)
+                pretty = str(soup.prettify()) if site == 'fptshop' else None
+                held = (body, text, soup, pretty, sections)
+            else:
+                held = (body, spider.extract_sections(site, body, url, 'utf-8'))
+
+            in_flight.append(held)
+            if len(in_flight) > concurrency:
+                in_flight.popleft()
+    elapsed = time.perf_counter() - start
+    return baseline, rss_mb(), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of product-page extraction at a given concurrency")
+    parser.add_argument('--concurrency', type=int, default=32, help='Số trang in-flight (CONCURRENT_REQUESTS)')
+    parser.add_argument('--pages', type=int, default=150)
+    parser.add_argument('--variant', choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        baseline, peak, elapsed = run_variant(args.variant, args.concurrency, args.pages)
+        print(f"{baseline:.1f} {peak:.1f} {elapsed:.3f}")
+        return
+
+    print(f"CONCURRENT_REQUESTS={args.concurrency}, {args.pages} pages (thegioididong/cellphones/fptshop synthetic)")
+    print(f"{'variant':<12} {'baseline':>10} {'peak RSS':>10} {'delta':>10} {'time':>9}")
+    for variant, description in VARIANTS.items():
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--variant', variant,
+             '--concurrency', str(args.concurrency), '--pages', str(args.pages)],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+        baseline, peak, elapsed = (float(value) for value in output[-3:])
+        print(f"{variant:<12} {baseline:>8.1f}MB {peak:>8.1f}MB {peak - baseline:>8.1f}MB {elapsed:>8.2f}s  {description}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+# bench_mongo_pipelines.py - Throughput ghi item của OptimizedMongoDBPipeline (writer thread)
+# so với AsyncMongoDBPipeline (asyncio task trên event loop của reactor)
+#
+# Mỗi pipeline nhận `--items` item với tối đa `--concurrent-items` item đang xử lý cùng lúc
+# (như CONCURRENT_ITEMS của Scrapy), đo từ item đầu tiên tới khi close_spider ghi xong.
+#
+# Mặc định dùng MongoDB giả lập trong process: bulk_write chờ `--latency-ms` + `--per-item-ms` * số item
+# (time.sleep cho client sync, asyncio.sleep cho client async). Với mongod thật:
+#   python benchmarks/bench_mongo_pipelines.py --mongo-url mongodb://localhost:27017
+# (ghi vào database `bench_mongo_pipelines`, bị xoá khi chạy xong)
+#
+# --recrawl: đo lần crawl lại (INCREMENTAL_RECRAWL) sau một lần ghi đầu không đo, `--changed` phần item
+# đổi nội dung; hash nội dung giúp item không đổi chỉ gửi $set crawled_at (số byte gửi đi: chỉ với giả lập).
+#
+# Chạy từ thư mục phone/:
+#   python benchmarks/bench_mongo_pipelines.py
+#   python benchmarks/bench_mongo_pipelines.py --items 20000 --latency-ms 10 --writers 8
+#   python benchmarks/bench_mongo_pipelines.py --recrawl --changed 0.1
+import argparse
+import asyncio
+import bson
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('url', 'mongodb://localhost:27017')
+
+from twisted.internet import asyncioreactor
+
+asyncioreactor.install()
+
+from twisted.internet import reactor  # noqa: E402
+
+import scrapy  # noqa: E402
+from scrapy.utils.defer import deferred_from_coro  # noqa: E402
+from scrapy.utils.test import get_crawler  # noqa: E402
+
+from phone.pipelines import AsyncMongoDBPipeline, OptimizedMongoDBPipeline  # noqa: E402
+
+BENCH_DATABASE = 'bench_mongo_pipelines'
+
+# MongoDB giả lập: full_name -> {url: content_hash}, giữ qua các pipeline (lần ghi đầu rồi crawl lại)
+FAKE_DOCUMENTS = {}
+FAKE_LOCK = threading.Lock()
+FAKE_WIRE = {'bytes': 0}  # Số byte BSON của các operation đã gửi
+
+
+class FakeBulkWriteResult(object):
+    def __init__(self, upserted_ids, modified_count):
+        self.upserted_ids = upserted_ids
+        self.upserted_count = len(upserted_ids)
+        self.modified_count = modified_count
+
+
+class FakeCollection(object):
+    """Collection giả: nhớ URL đã upsert, bulk_write tốn thời gian theo kích thước batch"""
+
+    def __init__(self, full_name, latency_ms, per_item_ms):
+        self.full_name = full_name
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.documents = FAKE_DOCUMENTS.setdefault(full_name, {})
+
+    def delay(self, operations):
+        return (self.latency_ms + self.per_item_ms * len(operations)) / 1000
+
+    def apply(self, operations):
+        upserted_ids = {}
+        modified = 0
+        with FAKE_LOCK:
+            for i, operation in enumerate(operations):
+                FAKE_WIRE['bytes'] += len(bson.encode(operation._filter)) + len(bson.encode(operation._doc))
+                url = operation._filter['url']
+                fields = operation._doc.get('$set') or operation._doc.get('$setOnInsert')
+                if url not in self.documents:
+                    if operation._upsert:
+                        self.documents[url] = fields.get('content_hash')
+                        upserted_ids[i] = i
+                elif '$set' in operation._doc:
+                    self.documents[url] = fields.get('content_hash', self.documents[url])
+                    modified += 1
+        return FakeBulkWriteResult(upserted_ids, modified)
+
+    def found(self, query):
+        with FAKE_LOCK:
+            return [{'url': url, 'content_hash': self.documents[url]}
+                    for url in query['url']['$in'] if url in self.documents]
+
+
+class FakeSyncCollection(FakeCollection):
+    def create_index(self, keys, **options):
+        return keys
+
+    def bulk_write(self, operations, ordered=True):
+        time.sleep(self.delay(operations))
+        return self.apply(operations)
+
+    def find(self, query, projection=None):
+        time.sleep(self.latency_ms / 1000)
+        return self.found(query)
+
+
+class FakeAsyncCollection(FakeCollection):
+    async def create_index(self, keys, **options):
+        return keys
+
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(self.delay(operations))
+        return self.apply(operations)
+
+    def find(self, query, projection=None):
+        return FakeAsyncCursor(self, query)
+
+
+class FakeAsyncCursor(object):
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.query = query
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(self.collection.latency_ms / 1000)
+        return self.collection.found(self.query)
+
+
+class FakeDatabase(object):
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, name):
+        return self.client.collection(f'{self.name}.{name}')
+
+    async def _async_command(self, command):
+        return {'ok': 1}
+
+    def command(self, command):
+        if self.client.collection_class is FakeAsyncCollection:
+            return self._async_command(command)
+        return {'ok': 1}
+
+
+class FakeClient(object):
+    def __init__(self, collection_class, latency_ms, per_item_ms):
+        self.collection_class = collection_class
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.collections = {}
+        self.admin = FakeDatabase(self, 'admin')
+
+    def __getitem__(self, name):
+        return FakeDatabase(self, name)
+
+    def collection(self, full_name):
+        if full_name not in self.collections:
+            self.collections[full_name] = self.collection_class(full_name, self.latency_ms, self.per_item_ms)
+        return self.collections[full_name]
+
+    def close(self):
+        pass
+
+
+def bench_pipeline(base, args):
+    """Subclass của pipeline dùng client giả (nếu không có --mongo-url)"""
+    if args.mongo_url:
+        return base
+
+    collection_class = FakeAsyncCollection if base is AsyncMongoDBPipeline else FakeSyncCollection
+
+    class BenchPipeline(base):
+        def create_client(self):
+            return FakeClient(collection_class, args.latency_ms, args.per_item_ms)
+
+    BenchPipeline.__name__ = base.__name__
+    return BenchPipeline
+
+
+def make_items(count, run, changed=0.0):
+    """Item giống trang sản phẩm; `changed`: phần item có giá khác lần ghi trước"""
+    changed_every = round(1 / changed) if changed else 0
+    return [
+        {
+            'url': f'https://bench.invalid/{run}/product-{i}',
+            'status': 'success',
+            'crawled_at': '2024-01-02 00:00:00' if changed_every else '2024-01-01 00:00:00',
+            'product_data': {
+                'product_name': f'Phone {i}',
+                'price': '9.990.000₫' if changed_every and i % changed_every == 0 else '10.990.000₫',
+                'promotions': ['Giảm 500.000₫ khi thanh toán qua VNPAY'] * 3,
+                'specifications': {f'Thông số {k}': f'Giá trị {k}' for k in range(40)},
+            },
+        }
+        for i in range(count)
+    ]
+
+
+async def run_pipeline(base, args, run, changed=0.0):
+    settings = {
+        'MONGO_DATABASE': BENCH_DATABASE,
+        'MONGO_COLLECTION': 'items',
+        'MONGO_WRITER_THREADS': args.writers,
+        'MONGO_QUEUE_SIZE': args.queue_size,
+        'INCREMENTAL_RECRAWL': args.recrawl,
+        'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
+    }
+    crawler = get_crawler(scrapy.Spider, settings)
+    spider = scrapy.Spider.from_crawler(crawler, name='bench')
+    pipeline = bench_pipeline(base, args).from_crawler(crawler)
+    if args.mongo_url:
+        pipeline.url = args.mongo_url
+    items = make_items(args.items, run, changed)
+    FAKE_WIRE['bytes'] = 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = pipeline.open_spider(spider)
+        if asyncio.iscoroutine(result):
+            await result
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(args.concurrent_items)
+
+        async def process(item):
+            async with semaphore:
+                await pipeline.process_item(item, spider)
+
+        await asyncio.gather(*(process(item) for item in items))
+        result = pipeline.close_spider(spider)
+        if asyncio.iscoroutine(result):
+            await result
+        elapsed = time.perf_counter() - start
+
+    stats = crawler.stats.get_stats()
+    return {
+        'elapsed': elapsed,
+        'written': pipeline.stats['processed'],
+        'counts': {key: pipeline.stats[key] for key in ('inserted', 'updated', 'unchanged', 'duplicates')},
+        'wire_bytes': None if args.mongo_url else FAKE_WIRE['bytes'],
+        'errors': pipeline.stats['errors'],
+        'flushes': stats.get('mongo/flushes', 0),
+        'batch_size': stats.get('mongo/batch_size'),
+    }
+
+
+async def drop_bench_database(args):
+    if not args.mongo_url:
+        return
+    import pymongo
+    client = pymongo.MongoClient(args.mongo_url)
+    client.drop_database(BENCH_DATABASE)
+    client.close()
+
+
+async def main(args):
+    print(f"🏁 {args.items} items, {args.concurrent_items} concurrent items, {args.writers} writers, "
+          + (f"MongoDB: {args.mongo_url}" if args.mongo_url
+             else f"fake MongoDB: {args.latency_ms} ms + {args.per_item_ms} ms/item per bulk_write"))
+    try:
+        for run, base in enumerate((OptimizedMongoDBPipeline, AsyncMongoDBPipeline)):
+            if args.recrawl:
+                # Lần ghi đầu (không đo), pipeline mới cho lần crawl lại nên cache hash bắt đầu rỗng
+                await run_pipeline(base, args, run)
+            result = await run_pipeline(base, args, run, args.changed if args.recrawl else 0.0)
+            rate = result['written'] / max(result['elapsed'], 1e-9)
+            wire = f", sent: {result['wire_bytes'] / 1024:.0f} KiB" if result['wire_bytes'] is not None else ''
+            print(f"{base.__name__:<26} {result['elapsed']:7.2f} s  {rate:9.0f} items/s  "
+                  f"written: {result['written']}, errors: {result['errors']}, "
+                  f"flushes: {result['flushes']}, final batch size: {result['batch_size']}{wire}")
+            print(f"{'':<26} " + ", ".join(f"{key}: {count}" for key, count in result['counts'].items()))
+    finally:
+        await drop_bench_database(args)
+
+
+def run(args):
+    failures = []
+
+    def stop(result):
+        if reactor.running:
+            reactor.stop()
+        return result
+
+    d = deferred_from_coro(main(args))
+    d.addErrback(failures.append)
+    d.addBoth(stop)
+    reactor.run()
+    if failures:
+        failures[0].raiseException()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput of the threaded vs asyncio MongoDB pipelines")
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--concurrent-items', type=int, default=100, help='CONCURRENT_ITEMS')
+    parser.add_argument('--writers', type=int, default=4, help='MONGO_WRITER_THREADS')
+    parser.add_argument('--queue-size', type=int, default=1000, help='MONGO_QUEUE_SIZE')
+    parser.add_argument('--mongo-url', default=os.environ.get('BENCH_MONGO_URL'),
+                        help='mongod thật; mặc định dùng MongoDB giả lập trong process')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Độ trễ cố định mỗi bulk_write (giả lập)')
+    parser.add_argument('--per-item-ms', type=float, default=0.05, help='Thời gian thêm cho mỗi item (giả lập)')
+    parser.add_argument('--recrawl', action='store_true', help='Đo lần crawl lại với INCREMENTAL_RECRAWL')
+    parser.add_argument('--changed', type=float, default=0.1, help='Phần item đổi nội dung khi --recrawl')
+    run(parser.parse_args())
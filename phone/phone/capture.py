@@ -0,0 +1,192 @@
+# capture.py - Lưu artifact debug (HTML, JSON trung gian) theo yêu cầu, ghi bất đồng bộ
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from queue import Full, Queue
+
+CAPTURE_MODES = ('off', 'sample', 'failures')
+
+
+def url_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class ArtifactCapture(object):
+    """
+    Lưu artifact debug của trang vào `directory/<url_hash[:2]>/<url_hash>/`.
+
+    - mode 'off'     : không làm gì, hot path không tốn I/O hay serialize
+    - mode 'sample'  : lưu N trang đầu tiên (`sample_size`) và mọi trang lỗi
+    - mode 'failures': chỉ lưu khi trích xuất lỗi
+    Tên file chứa hash nội dung (`page.<sha1[:12]>.html`) nên cùng nội dung không bị ghi lại.
+    Việc ghi chạy trên một thread riêng qua queue có giới hạn: queue đầy thì bỏ artifact,
+    không bao giờ block callback. Mỗi artifact bị cắt ở `max_artifact_bytes`, và ngừng lưu
+    khi tổng dung lượng đã ghi đạt `max_total_bytes`.
+    """
+
+    def __init__(self, mode='off', directory='captures', sample_size=20,
+                 max_artifact_bytes=5 * 1024 * 1024, max_total_bytes=500 * 1024 * 1024, queue_size=100):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown CAPTURE_MODE: {mode!r} (expected one of {CAPTURE_MODES})")
+        self.mode = mode
+        self.directory = directory
+        self.sample_size = sample_size
+        self.max_artifact_bytes = max_artifact_bytes
+        self.max_total_bytes = max_total_bytes
+
+        self.lock = threading.Lock()
+        self.sampled = 0
+        self.total_bytes = 0
+        self.stats = {
+            'captured': 0,
+            'dropped': 0,
+            'truncated': 0,
+        }
+
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = None
+        if self.enabled:
+            self.thread = threading.Thread(target=self._run, daemon=True, name='artifact-capture')
+            self.thread.start()
+
+    @staticmethod
+    def settings_kwargs(settings):
+        """Tham số khởi tạo từ Scrapy settings (dict thuần, gửi được sang worker process)"""
+        return dict(
+            mode=settings.get('CAPTURE_MODE', 'off'),
+            directory=settings.get('CAPTURE_DIR', 'captures'),
+            sample_size=settings.getint('CAPTURE_SAMPLE_SIZE', 20),
+            max_artifact_bytes=settings.getint('CAPTURE_MAX_ARTIFACT_KB', 5 * 1024) * 1024,
+            max_total_bytes=settings.getint('CAPTURE_MAX_TOTAL_MB', 500) * 1024 * 1024,
+            queue_size=settings.getint('CAPTURE_QUEUE_SIZE', 100),
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(**cls.settings_kwargs(settings))
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def wants(self, failed=False):
+        """
+        Có nên lưu trang này không. Gọi trước khi chuẩn bị artifact để mode 'off' không tốn gì.
+        Với mode 'sample', mỗi lần trả về True cho trang thành công tính vào `sample_size`.
+        """
+        if self.mode == 'off':
+            return False
+        if failed:
+            return True
+        if self.mode != 'sample':
+            return False
+        with self.lock:
+            if self.sampled >= self.sample_size:
+                return False
+            self.sampled += 1
+            return True
+
+    def capture(self, url, reason, artifacts):
+        """
+        Đưa artifact vào queue ghi.
+
+        Args:
+            url (str): URL của trang
+            reason (str): 'sample' hoặc 'failure: ...'
+            artifacts (dict): tên file (vd: 'page.html') -> bytes/str/object (ghi dạng JSON)
+        """
+        if not self.enabled:
+            return
+        # Serialize object ngay (dict có thể bị callback sửa tiếp trong lúc thread ghi)
+        artifacts = {name: value if isinstance(value, (bytes, str)) else _to_bytes(value)
+                     for name, value in artifacts.items()}
+        try:
+            self.queue.put_nowait((url, reason, time.time(), artifacts))
+        except Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            try:
+                self._write(*job)
+            except Exception as e:
+                with self.lock:
+                    self.stats['dropped'] += 1
+                print(f"⚠️ Could not write capture for {job[0]}: {e}")
+                print(traceback.format_exc())
+
+    def _write(self, url, reason, captured_at, artifacts):
+        key = url_key(url)
+        target = os.path.join(self.directory, key[:2], key)
+        os.makedirs(target, exist_ok=True)
+
+        files = {}
+        for name, value in artifacts.items():
+            data = _to_bytes(value)
+            if len(data) > self.max_artifact_bytes:
+                data = data[:self.max_artifact_bytes]
+                with self.lock:
+                    self.stats['truncated'] += 1
+
+            stem, ext = os.path.splitext(name)
+            filename = f"{stem}.{hashlib.sha1(data).hexdigest()[:12]}{ext}"
+            path = os.path.join(target, filename)
+            if not os.path.exists(path):
+                with self.lock:
+                    if self.total_bytes + len(data) > self.max_total_bytes:
+                        self.stats['dropped'] += 1
+                        continue
+                    self.total_bytes += len(data)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            files[name] = filename
+
+        # meta.json giữ lịch sử các lần lưu của URL (lý do, thời điểm, file)
+        meta_path = os.path.join(target, 'meta.json')
+        meta = {"url": url, "captures": []}
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    meta = json.load(f)
+            except ValueError:
+                pass
+        meta["captures"].append({
+            "reason": reason,
+            "captured_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(captured_at)),
+            "files": files,
+        })
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        with self.lock:
+            self.stats['captured'] += 1
+
+    def export_stats(self, stats):
+        for name, value in self.stats.items():
+            stats.set_value(f'capture/{name}', value)
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=30)
+        self.thread = None
+        if self.stats['captured'] or self.stats['dropped']:
+            print(f"📸 Artifact capture ({self.mode}) - captured: {self.stats['captured']}, "
+                  f"dropped: {self.stats['dropped']}, truncated: {self.stats['truncated']}, dir: {self.directory}")
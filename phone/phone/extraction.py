@@ -0,0 +1,121 @@
+# extraction.py - Executor dùng chung cho các hàm trích xuất trong spider
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+EXTRACTION_MODES = ('serial', 'threaded')
+
+
+class ExtractionExecutor(object):
+    """
+    Executor dùng chung cho toàn bộ spider thay vì tạo ThreadPoolExecutor cho mỗi response.
+
+    - mode 'serial'  : các hàm BeautifulSoup (CPU-bound) chạy tuần tự ngay trong thread gọi,
+                       tránh chi phí tạo thread vô ích vì GIL
+    - mode 'threaded': các hàm trích xuất chạy trên thread pool chung có kích thước cấu hình được.
+                       Chỉ dùng để benchmark so sánh với 'serial': `run_all` vẫn chờ kết quả
+                       (block thread gọi, tức reactor), và vì GIL nên không nhanh hơn.
+    Phần I/O-bound (render qua Node.js) không chạy ở đây: render pool trả về Deferred,
+    `track()` chỉ đo thời gian chờ.
+    Thời gian chạy của từng extractor được ghi lại và export vào Scrapy stats.
+    """
+
+    def __init__(self, max_workers=4, mode='serial'):
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown EXTRACTION_MODE: {mode!r} (expected one of {EXTRACTION_MODES})")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extraction')
+
+        self.timings_lock = threading.Lock()
+        self.timings = {}  # name -> [calls, total_seconds, max_seconds]
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_workers=settings.getint('EXTRACTION_MAX_WORKERS', 4),
+            mode=settings.get('EXTRACTION_MODE', 'serial'),
+        )
+
+    def record(self, name, elapsed):
+        with self.timings_lock:
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+
+    def drain_timings(self):
+        """Lấy và xoá thống kê hiện tại (dùng trong worker process của parse stage)"""
+        with self.timings_lock:
+            timings, self.timings = self.timings, {}
+        return timings
+
+    def merge_timings(self, timings):
+        """Gộp thống kê trả về từ worker process"""
+        with self.timings_lock:
+            for name, (calls, total, max_elapsed) in timings.items():
+                timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+                timing[0] += calls
+                timing[1] += total
+                timing[2] = max(timing[2], max_elapsed)
+
+    def _timed(self, name, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def run(self, name, fn, *args):
+        """Chạy một extractor ngay trong thread hiện tại, có đo thời gian"""
+        return self._timed(name, fn, *args)
+
+    def run_all(self, tasks):
+        """
+        Chạy một nhóm extractor, trả về dict {name: result}.
+        Đồng bộ ở cả hai mode: mode 'threaded' block thread gọi tới khi mọi extractor xong.
+
+        Args:
+            tasks (list): danh sách (name, fn, args)
+        """
+        if self.mode == 'serial':
+            return {name: self._timed(name, fn, *args) for name, fn, args in tasks}
+
+        futures = [(name, self.executor.submit(self._timed, name, fn, *args)) for name, fn, args in tasks]
+        return {name: future.result() for name, future in futures}
+
+    def track(self, name, d):
+        """Đo thời gian từ lúc gọi đến khi Deferred hoàn thành (vd: job render)"""
+        start = time.perf_counter()
+
+        def _done(result):
+            self.record(name, time.perf_counter() - start)
+            return result
+
+        d.addBoth(_done)
+        return d
+
+    def export_stats(self, stats):
+        """Ghi thống kê thời gian từng extractor vào Scrapy stats"""
+        with self.timings_lock:
+            timings = dict(self.timings)
+
+        for name, (calls, total, max_elapsed) in timings.items():
+            stats.set_value(f'extraction/{name}/calls', calls)
+            stats.set_value(f'extraction/{name}/total_ms', round(total * 1000, 1))
+            stats.set_value(f'extraction/{name}/avg_ms', round(total * 1000 / max(calls, 1), 2))
+            stats.set_value(f'extraction/{name}/max_ms', round(max_elapsed * 1000, 1))
+
+    def print_stats(self):
+        with self.timings_lock:
+            timings = sorted(self.timings.items(), key=lambda kv: kv[1][1], reverse=True)
+
+        if not timings:
+            return
+        print(f"⏱️  Extraction timings (mode: {self.mode})")
+        for name, (calls, total, max_elapsed) in timings:
+            print(f"   {name:<32} calls: {calls:<6} total: {total * 1000:>10.1f} ms  "
+                  f"avg: {total * 1000 / max(calls, 1):>8.2f} ms  max: {max_elapsed * 1000:>8.1f} ms")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
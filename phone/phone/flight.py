@@ -0,0 +1,300 @@
+# flight.py - Decode payload RSC "flight" của Next.js (self.__next_f.push) từ HTML thô
+import json
+import re
+
+# <script>self.__next_f.push([1,"..."])</script> - chuỗi thứ hai là JSON string literal
+NEXT_F_CHUNK = re.compile(rb'self\.__next_f\.push\(\[1,\s*("[^"\\]*(?:\\.[^"\\]*)*")\]\)', re.DOTALL)
+
+# Giá trị đặc biệt bắt đầu bằng '$' không phải tham chiếu tới row khác
+SPECIAL_VALUES = {
+    '$undefined': None,
+    '$NaN': float('nan'),
+    '$Infinity': float('inf'),
+    '$-Infinity': float('-inf'),
+}
+
+
+class FlightDecodeError(ValueError):
+    """Payload flight không đúng định dạng"""
+
+
+def iter_chunks(body):
+    """
+    Yield từng chunk (str) của self.__next_f.push([1, "..."]) trong body (bytes).
+    Chuỗi JSON được decode thẳng từ memoryview của body, không tạo bản sao bytes cho từng chunk.
+    """
+    with memoryview(body) as view:
+        for match in NEXT_F_CHUNK.finditer(body):
+            start, end = match.span(1)
+            yield json.loads(str(view[start:end], 'utf-8', 'surrogatepass'))
+
+
+def split_rows(payload):
+    """
+    Tách payload thành dict {row_id: raw_value}.
+
+    Mỗi row có dạng `<id>:<value>\\n`. Row text `<id>:T<hex_len>,<text>` có độ dài theo
+    byte UTF-8 và có thể chứa '\\n', các row khác (JSON, hoặc tag I/HL/E/D/W + JSON)
+    kết thúc ở '\\n'. Giá trị được giữ nguyên dạng chuỗi, chỉ decode khi cần.
+    """
+    rows = {}
+    pos = 0
+    end = len(payload)
+    while pos < end:
+        if payload[pos] == '\n':
+            pos += 1
+            continue
+        colon = payload.find(':', pos)
+        if colon == -1:
+            break
+        row_id = payload[pos:colon]
+        start = colon + 1
+
+        if payload.startswith('T', start):
+            comma = payload.find(',', start)
+            if comma == -1:
+                raise FlightDecodeError(f"Truncated text row {row_id!r}")
+            length = int(payload[start + 1:comma], 16)
+            text = payload[comma + 1:comma + 1 + length]
+            # Độ dài tính theo byte, cắt lại nếu text có ký tự nhiều byte
+            encoded = text.encode('utf-8')
+            if len(encoded) > length:
+                text = encoded[:length].decode('utf-8', errors='ignore')
+            rows[row_id] = ('T', text)
+            pos = comma + 1 + len(text)
+            continue
+
+        newline = payload.find('\n', start)
+        if newline == -1:
+            newline = end
+        rows[row_id] = payload[start:newline]
+        pos = newline + 1
+    return rows
+
+
+class FlightPayload(object):
+    """
+    Payload flight đã tách row, mỗi row chỉ được json.loads ở lần truy cập đầu tiên.
+
+    Tham chiếu dạng chuỗi: "$<id>", "$L<id>" (lazy), "$@<id>" (promise) trỏ tới row
+    <id>; "$<id>:a:b" trỏ tới đường dẫn a/b bên trong row; "$$..." là chuỗi bắt đầu
+    bằng '$'.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.decoded = {}
+        self._resolver = None
+
+    @classmethod
+    def from_body(cls, body):
+        """Ghép các chunk trong HTML thô (bytes) rồi tách row. Trả về None nếu trang không có flight data."""
+        chunks = list(iter_chunks(body))
+        if not chunks:
+            return None
+        return cls(split_rows(''.join(chunks)))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, row_id):
+        return row_id in self.rows
+
+    def row(self, row_id):
+        """Giá trị đã decode của một row, None nếu không có"""
+        if row_id in self.decoded:
+            return self.decoded[row_id]
+        raw = self.rows.get(row_id)
+        value = self._decode(raw) if raw is not None else None
+        self.decoded[row_id] = value
+        return value
+
+    @staticmethod
+    def _decode(raw):
+        if isinstance(raw, tuple):  # Row text
+            return raw[1]
+        # Bỏ tag của row (I, HL, E, D, W...) nếu có
+        i = 0
+        while i < len(raw) and 'A' <= raw[i] <= 'Z':
+            i += 1
+        try:
+            return json.loads(raw[i:])
+        except json.JSONDecodeError:
+            return raw
+
+    def rows_containing(self, needle):
+        """Các row id mà giá trị thô chứa `needle` (không cần decode)"""
+        return [row_id for row_id, raw in self.rows.items() if not isinstance(raw, tuple) and needle in raw]
+
+    def parse_reference(self, value):
+        """
+        Phân tích một chuỗi '$...'. Trả về (row_id, path) nếu là tham chiếu,
+        ngược lại None (giá trị thường, xem `literal()`).
+        """
+        if len(value) < 2 or value[0] != '$' or value in SPECIAL_VALUES:
+            return None
+        ref = value[1:]
+        if ref[0] in 'L@':
+            ref = ref[1:]
+        row_id, _, path = ref.partition(':')
+        if not row_id or row_id not in self.rows:
+            return None
+        return row_id, path.split(':') if path else []
+
+    @staticmethod
+    def literal(value):
+        """Giá trị của một chuỗi không phải tham chiếu"""
+        if value in SPECIAL_VALUES:
+            return SPECIAL_VALUES[value]
+        if value.startswith('$$'):
+            return value[1:]
+        return value
+
+    def follow(self, row_id, path):
+        """Lấy giá trị (chưa resolve) tại đường dẫn `path` bên trong row"""
+        value = self.row(row_id)
+        for key in path:
+            if isinstance(value, str):
+                reference = self.parse_reference(value)
+                if reference is None:
+                    return None
+                value = self.follow(*reference)
+            if isinstance(value, list):
+                try:
+                    value = value[int(key)]
+                except (ValueError, IndexError):
+                    return None
+            elif isinstance(value, dict):
+                value = value.get(key)
+            else:
+                return None
+        return value
+
+    def resolve(self, value):
+        """Thay các tham chiếu '$...' trong value bằng giá trị của row tương ứng"""
+        return self.resolver.resolve(value)
+
+    def find_key(self, value, key, where=None):
+        """Tìm `key` theo tham chiếu, chỉ resolve subtree của giá trị tìm được"""
+        return self.resolver.find_key(value, key, where)
+
+    @property
+    def resolver(self):
+        if self._resolver is None:
+            self._resolver = ReferenceResolver(
+                lambda reference: self.follow(*reference),
+                parse_reference=self.parse_reference,
+                literal=self.literal,
+            )
+        return self._resolver
+
+
+def parse_plain_reference(value):
+    """'$key' -> 'key' (định dạng cũ: obj_map[key]), None nếu không phải tham chiếu"""
+    if len(value) > 1 and value[0] == '$':
+        return value[1:]
+    return None
+
+
+class ReferenceResolver(object):
+    """
+    Resolve các tham chiếu '$...' trong cây JSON, dùng chung cho flight payload và đường parse cũ.
+
+    - Mỗi tham chiếu chỉ được resolve một lần (memo theo chuỗi tham chiếu)
+    - Duyệt bằng stack tường minh nên không chạm giới hạn đệ quy với cây sâu
+    - Tham chiếu vòng được phát hiện bằng tập các tham chiếu đang resolve trên stack
+      (không copy set cho từng phần tử) và được thay bằng None
+    - `find_key()` chỉ đi theo đường dẫn tới key cần tìm, không materialize cả cây
+
+    Args:
+        lookup: hàm nhận kết quả của parse_reference, trả về giá trị (chưa resolve)
+        parse_reference: hàm nhận chuỗi, trả về tham chiếu hoặc None nếu là chuỗi thường
+        literal: hàm chuyển chuỗi thường thành giá trị
+    """
+
+    def __init__(self, lookup, parse_reference=parse_plain_reference, literal=None):
+        self.lookup = lookup
+        self.parse_reference = parse_reference
+        self.literal = literal or (lambda value: value)
+        self.memo = {}
+        self.active = set()
+
+    def resolve(self, value):
+        holder = [None]
+        frames = []
+        if self._enter(value, holder, 0, frames):
+            while frames:
+                frame = frames[-1]
+                items, out = frame[0], frame[1]
+                for slot, child in items:
+                    if self._enter(child, out, slot, frames):
+                        break
+                else:
+                    frames.pop()
+                    for ref in frame[2]:
+                        self.active.discard(ref)
+                        self.memo[ref] = out
+        return holder[0]
+
+    def _enter(self, value, parent, slot, frames):
+        """
+        Gán giá trị đã resolve của `value` vào parent[slot]. Với list/dict, tạo container
+        rỗng, gán ngay (giữ thứ tự key) và đẩy một frame lên stack; trả về True khi đó.
+        """
+        refs = []
+        while isinstance(value, str):
+            reference = self.parse_reference(value)
+            if reference is None:
+                value = self.literal(value)
+                break
+            if value in self.memo:
+                value = self.memo[value]
+                break
+            if value in self.active or value in refs:
+                value = None  # Tham chiếu vòng
+                break
+            refs.append(value)
+            value = self.lookup(reference)
+
+        if isinstance(value, list):
+            out = [None] * len(value)
+            items = enumerate(value)
+        elif isinstance(value, dict):
+            out = {}
+            items = iter(value.items())
+        else:
+            for ref in refs:
+                self.memo[ref] = value
+            parent[slot] = value
+            return False
+
+        parent[slot] = out
+        self.active.update(refs)
+        frames.append((items, out, refs))
+        return True
+
+    def find_key(self, value, key, where=None):
+        """
+        Tìm (DFS, theo thứ tự key) dict đầu tiên chứa `key`, đi theo các tham chiếu nhưng
+        không resolve chúng. Trả về giá trị đã resolve của key, hoặc None.
+        `where` (vd: list) lọc theo kiểu của giá trị đã resolve, giá trị khác kiểu bị bỏ qua.
+        """
+        stack = [value]
+        visited = set()
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                reference = self.parse_reference(node)
+                if reference is None or node in visited:
+                    continue
+                visited.add(node)
+                stack.append(self.lookup(reference))
+            elif isinstance(node, dict):
+                if key in node:
+                    found = self.resolve(node[key])
+                    if where is None or isinstance(found, where):
+                        return found
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+        return None
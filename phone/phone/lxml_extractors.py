@@ -0,0 +1,695 @@
+# lxml_extractors.py - Extractor trên cây lxml với selector CSS/XPath compile một lần khi import
+#
+# Mỗi hàm trả về đúng dict như extractor BeautifulSoup cùng tên trong spider
+# (EXTRACTION_BACKEND = 'bs4'), chỉ khác cách duyệt cây.
+import json
+import traceback
+from urllib.parse import urljoin
+
+from cssselect import HTMLTranslator
+from lxml import etree
+
+EXTRACTION_BACKENDS = ('lxml', 'bs4')
+
+_translator = HTMLTranslator()
+
+
+def css(selector):
+    """
+    Compile selector CSS thành `etree.XPath`, tìm trong các phần tử con cháu
+    (không gồm chính phần tử gốc) giống `Tag.select()` của BeautifulSoup.
+    """
+    return etree.XPath(_translator.css_to_xpath(selector, prefix='descendant::'), smart_strings=False)
+
+
+def xpath(expr):
+    return etree.XPath(expr, smart_strings=False)
+
+
+def first(selector, node):
+    """Phần tử đầu tiên khớp selector (theo thứ tự trong tài liệu), None nếu không có"""
+    found = selector(node)
+    return found[0] if found else None
+
+
+# Text giống `Tag.get_text()`: bỏ comment và nội dung script/style/template
+_TEXT = xpath('descendant::text()[not(parent::script or parent::style or parent::template)]')
+
+
+def get_text(node, separator='', strip=False):
+    strings = _TEXT(node)
+    if strip:
+        return separator.join([s for s in (s.strip() for s in strings) if s])
+    return separator.join(strings)
+
+
+def has_class(node, name):
+    return name in (node.get('class') or '').split()
+
+
+_parsers = {}
+
+
+def parse_html(body, encoding=None):
+    """Parse HTML thô (bytes) thành cây lxml, trả về phần tử gốc (None nếu body rỗng)"""
+    parser = _parsers.get(encoding)
+    if parser is None:
+        try:
+            parser = etree.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+        except LookupError:
+            # libxml2 không biết tên encoding này, để libxml2 tự nhận diện
+            parser = _parsers.get(None) or etree.HTMLParser(remove_comments=True, remove_pis=True)
+        _parsers[encoding] = parser
+    return etree.fromstring(body, parser)
+
+
+def _price(text):
+    return int(text.replace('₫', '').replace('.', '').strip())
+
+
+# ---------------------------------------------------------------------------
+# Thegioididong
+# ---------------------------------------------------------------------------
+
+TGDD_DETAIL = css('section.detail')
+TGDD_NAME_CONTAINER = css('div.product-name')
+TGDD_NAME = css('h1')
+TGDD_QUANTITY_SALE = css('span.quantity-sale')
+TGDD_RATE = css('div.detail-rate')
+TGDD_BREADCRUMB = css('ul.breadcrumb')
+TGDD_BREADCRUMB_LINKS = css('a')
+TGDD_OPTIONS = css('div.group-box03')
+TGDD_SELECTED_CAPACITY = css('div.box03:not(.color) a.act')
+TGDD_COLORS = css('div.box03.color a')
+TGDD_SPEC_GROUPS = css('div.box-specifi')
+TGDD_SPEC_GROUP_NAME = css('h3')
+TGDD_SPEC_ROWS = css('ul > li')
+TGDD_SPEC_PARTS = css('aside')
+TGDD_POLICY_LIST = css('ul.policy__list')
+TGDD_COMMITMENTS = css('li > div.pl-txt')
+TGDD_POPUP = css('div#popup-baohanh-content')
+TGDD_WARRANTY_BOX = css('div.warranty-box')
+TGDD_WARRANTY_TITLE = css('h2.title')
+TGDD_WARRANTY_TEXT = css('span')
+TGDD_CHANGE_BOX = css('div.change-box')
+TGDD_CHANGE_BLOCKS = css('div.block-change')
+TGDD_CHANGE_TITLE = css('h3')
+TGDD_CHANGE_CONTENT = css('div.content-insider')
+# Giá & khuyến mãi trong HTML tĩnh (cùng selector với client_crawl/thegioididong_crawl.js)
+TGDD_PRICE_ONE = css('div.price-one')
+TGDD_PRICE_PRESENT = css('p.box-price-present')
+TGDD_PRICE_OLD = css('p.box-price-old')
+TGDD_PRICE_PERCENT = css('p.box-price-percent')
+TGDD_INSTALLMENT = css('span.label--black')
+TGDD_BS_PRICE = css('div.bs_title div.bs_price')
+TGDD_BS_CURRENT = css('strong')
+TGDD_BS_ORIGINAL = css('em')
+TGDD_BS_DISCOUNT = css('i')
+TGDD_LOCATION = css('div#location-detail a')
+TGDD_PROMO = css('div.block__promo')
+TGDD_PROMO_TITLE = css('p.pr-txtb')
+TGDD_PROMO_ITEMS = css('div.divb-right p')
+TGDD_LOYALTY = css('p.loyalty__main__point')
+TGDD_COLOR_LINKS = css('div.scrolling_inner div.box03.color.group.desk a.box03__item')
+
+
+def extract_basic_info_thegioididong(detail_container, url):
+    """Thông tin cơ bản (xem JobSpider.extract_basic_info)"""
+    product_data = {}
+
+    name_container = first(TGDD_NAME_CONTAINER, detail_container)
+    if name_container is not None:
+        name_tag = first(TGDD_NAME, name_container)
+        if name_tag is not None:
+            product_data['product_name'] = get_text(name_tag, strip=True)
+
+        quantity_tag = first(TGDD_QUANTITY_SALE, name_container)
+        if quantity_tag is not None:
+            product_data['quantity_sale'] = get_text(quantity_tag, strip=True)
+
+        rate_tag = first(TGDD_RATE, name_container)
+        if rate_tag is not None:
+            product_data['detail_rate'] = get_text(rate_tag, strip=True)
+
+    try:
+        breadcrumb_container = first(TGDD_BREADCRUMB, detail_container)
+        if breadcrumb_container is not None:
+            product_data['product_type'] = [get_text(a, strip=True) for a in TGDD_BREADCRUMB_LINKS(breadcrumb_container)]
+    except Exception as e:
+        print(f"⚠️ Error extracting product type for {url}: {e}")
+        product_data['product_type'] = []
+
+    return product_data
+
+
+def extract_options_thegioididong(detail_container, url):
+    """Dung lượng đang chọn và các màu sắc (xem JobSpider.extract_options)"""
+    product_data = {}
+
+    options_container = first(TGDD_OPTIONS, detail_container)
+    if options_container is not None:
+        capacity_tag = first(TGDD_SELECTED_CAPACITY, options_container)
+        product_data['selected_capacity'] = get_text(capacity_tag, strip=True) if capacity_tag is not None else ""
+        product_data['all_colors'] = [get_text(tag, strip=True) for tag in TGDD_COLORS(options_container)]
+    else:
+        print(f"⚠️ Could not find product options container for: {url}")
+
+    return product_data
+
+
+def extract_specifications_thegioididong(root, url):
+    """Thông số kỹ thuật theo nhóm (xem JobSpider.extract_specifications)"""
+    try:
+        all_specifications = {}
+        for group in TGDD_SPEC_GROUPS(root):
+            group_name_tag = first(TGDD_SPEC_GROUP_NAME, group)
+            if group_name_tag is None:
+                continue
+
+            specs_in_group = {}
+            for row in TGDD_SPEC_ROWS(group):
+                parts = TGDD_SPEC_PARTS(row)
+                if len(parts) == 2:
+                    key = get_text(parts[0], strip=True).replace(':', '')
+                    specs_in_group[key] = get_text(parts[1], separator=" ", strip=True)
+
+            all_specifications[get_text(group_name_tag, strip=True)] = specs_in_group
+        return all_specifications
+    except Exception as e:
+        print(f"⚠️ Error extracting specifications for {url}: {e}")
+        return {}
+
+
+def extract_policies_thegioididong(root, url):
+    """Cam kết, bảo hành và đổi trả (xem JobSpider.extract_policies)"""
+    try:
+        all_policies = {}
+
+        commitments_list = []
+        policy_list_tag = first(TGDD_POLICY_LIST, root)
+        if policy_list_tag is not None:
+            commitments_list = [get_text(item, strip=True) for item in TGDD_COMMITMENTS(policy_list_tag)]
+        all_policies['commitments'] = commitments_list
+
+        popup_content_tag = first(TGDD_POPUP, root)
+        if popup_content_tag is not None:
+            warranty_box = first(TGDD_WARRANTY_BOX, popup_content_tag)
+            if warranty_box is not None:
+                # Giống bản bs4: thiếu title/span thì lỗi và trả về {}
+                all_policies['warranty_policy'] = {
+                    "title": get_text(first(TGDD_WARRANTY_TITLE, warranty_box), strip=True),
+                    "details": get_text(first(TGDD_WARRANTY_TEXT, warranty_box), strip=True),
+                }
+
+            change_policy_dict = {}
+            change_box = first(TGDD_CHANGE_BOX, popup_content_tag)
+            if change_box is not None:
+                for block in TGDD_CHANGE_BLOCKS(change_box):
+                    block_title = get_text(first(TGDD_CHANGE_TITLE, block), strip=True)
+                    content_insider = first(TGDD_CHANGE_CONTENT, block)
+                    if content_insider is not None:
+                        change_policy_dict[block_title] = get_text(content_insider, separator="\n", strip=True)
+            all_policies['change_policy'] = change_policy_dict
+
+        return all_policies
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất thông tin chính sách: {e}")
+        return {}
+
+
+def _text_content(selector, node):
+    """Giống `el.textContent.trim()` của Playwright, '' nếu không có phần tử"""
+    found = first(selector, node)
+    return get_text(found).strip() if found is not None else ''
+
+
+def extract_price_static_thegioididong(root, url):
+    """Giá & khuyến mãi của màu đang mở và link các màu trong HTML tĩnh (xem JobSpider.extract_price_static)"""
+    fields = {}
+    price_box = first(TGDD_PRICE_ONE, root)
+    bs_price = first(TGDD_BS_PRICE, root) if price_box is None else None
+    if price_box is not None:
+        fields['current_price'] = _text_content(TGDD_PRICE_PRESENT, price_box)
+        fields['original_price'] = _text_content(TGDD_PRICE_OLD, price_box)
+        fields['discount'] = _text_content(TGDD_PRICE_PERCENT, price_box)
+        fields['installment_info'] = _text_content(TGDD_INSTALLMENT, price_box)
+    elif bs_price is not None:
+        fields['current_price'] = _text_content(TGDD_BS_CURRENT, bs_price)
+        fields['original_price'] = _text_content(TGDD_BS_ORIGINAL, bs_price)
+        fields['discount'] = _text_content(TGDD_BS_DISCOUNT, bs_price)
+        fields['installment_info'] = ''
+    else:
+        fields.update(current_price='', original_price='', discount='', installment_info='')
+
+    fields['location'] = _text_content(TGDD_LOCATION, root)
+
+    promo_box = first(TGDD_PROMO, root)
+    if promo_box is not None:
+        fields['promo_title'] = _text_content(TGDD_PROMO_TITLE, promo_box)
+        fields['promo_list'] = [get_text(p).strip() for p in TGDD_PROMO_ITEMS(promo_box)]
+    else:
+        fields['promo_title'] = ''
+        fields['promo_list'] = []
+
+    fields['loyalty_points'] = _text_content(TGDD_LOYALTY, root)
+
+    colors = [{'name': get_text(a).strip(), 'href': urljoin(url, a.get('href') or ''), 'selected': has_class(a, 'act')}
+              for a in TGDD_COLOR_LINKS(root)]
+    return {'fields': fields, 'colors': colors}
+
+
+# ---------------------------------------------------------------------------
+# Cellphones
+# ---------------------------------------------------------------------------
+
+CPS_DETAIL = css('div.box-detail-product')
+CPS_BREADCRUMB_SCRIPT = xpath("descendant::script[@type='application/ld+json'][contains(., 'BreadcrumbList')]")
+CPS_LEFT = css('div.box-detail-product__box-left')
+CPS_CENTER = css('div.box-detail-product__box-center')
+CPS_NAME = css('div.box-product-name h1')
+CPS_RATING_BOX = css('div.box-rating')
+CPS_RATING_SCORE = css('span:not(.total-rating)')
+CPS_TOTAL_RATING = css('span.total-rating')
+CPS_BOTTOM_ITEMS = css('div.box-bottom-item')
+CPS_LABEL = css('span.label')
+CPS_COMPARE = css('div.pdp-compare-button-box a.label')
+CPS_PRICE_BOX = css('div.box-product-price')
+CPS_SALE_PRICE = css('div.sale-price')
+CPS_BASE_PRICE = css('del.base-price')
+CPS_VERSION_BOX = css('div.box-linked')
+CPS_VERSION_ITEMS = css('a.item-linked')
+CPS_STRONG = css('strong')
+CPS_VARIANTS_BOX = css('div.box-product-variants')
+CPS_VARIANT_ITEMS = css('li.item-variant')
+CPS_VARIANT_NAME = css('strong.item-variant-name')
+CPS_VARIANT_PRICE = css('span.item-variant-price')
+CPS_LINK = css('a')
+CPS_PROMOTION_HEADER = css('.box-product-promotion-header span')
+CPS_PROMOTION_ITEMS = css('.promotion-pack_item')
+CPS_PROMOTION_DETAIL = css('.box-product-promotion-detail')
+CPS_PAYMENT_HEADER = css('.box-more-promotion-title span')
+CPS_PAYMENT_ITEMS = css('.render-promotion ul li')
+CPS_WARRANTY_TITLE = css('.box-warranty-info .box-title p')
+CPS_WARRANTY_ITEMS = css('.item-warranty-info')
+CPS_WARRANTY_DESCRIPTIONS = css('div.description')
+
+
+def extract_breadcrumb_cellphones(root, url):
+    """
+    Breadcrumb từ JSON-LD. Trả về None nếu trang không có script BreadcrumbList
+    (bản bs4 bỏ qua trang trong trường hợp này).
+    """
+    script = first(CPS_BREADCRUMB_SCRIPT, root)
+    if script is None:
+        return None
+
+    breadcrumb_items = []
+    try:
+        json_data = json.loads(script.text)
+        if isinstance(json_data, dict) and 'itemListElement' in json_data:
+            for item in json_data['itemListElement']:
+                if 'item' in item and 'name' in item['item']:
+                    breadcrumb_items.append(item['item']['name'])
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"⚠️ Lỗi khi phân tích JSON-LD của breadcrumb: {e}")
+        print(traceback.format_exc())
+    return breadcrumb_items
+
+
+def extract_basic_info_cellphones(detail_container_left, url):
+    """Tên, đánh giá và các nhãn chức năng (xem JobSpider._extract_basic_info_cellphones)"""
+    try:
+        product_info = {}
+
+        product_name_tag = first(CPS_NAME, detail_container_left)
+        if product_name_tag is not None:
+            product_info['product_name'] = get_text(product_name_tag, strip=True)
+
+        rating_box = first(CPS_RATING_BOX, detail_container_left)
+        if rating_box is not None:
+            rating_score_tag = first(CPS_RATING_SCORE, rating_box)
+            if rating_score_tag is not None:
+                product_info['rating_score'] = get_text(rating_score_tag, strip=True)
+
+            total_rating_tag = first(CPS_TOTAL_RATING, rating_box)
+            if total_rating_tag is not None:
+                product_info['total_ratings'] = get_text(total_rating_tag, strip=True).strip("()")
+
+        labels = []
+        for item in CPS_BOTTOM_ITEMS(detail_container_left):
+            label_tag = first(CPS_LABEL, item)
+            if label_tag is not None:
+                labels.append(get_text(label_tag, strip=True))
+
+        compare_tag = first(CPS_COMPARE, detail_container_left)
+        if compare_tag is not None:
+            labels.append(get_text(compare_tag, strip=True))
+
+        product_info['actions'] = labels
+        return product_info
+
+    except Exception as e:
+        print(f"⚠️ Error extracting header information for {url}: {e}")
+        return {}
+
+
+def extract_options_cellphones(detail_container_center, url):
+    """Giá, phiên bản và màu sắc (xem JobSpider._extract_options_cellphones)"""
+    product_options = {}
+
+    try:
+        price_box = first(CPS_PRICE_BOX, detail_container_center)
+        if price_box is not None:
+            sale_price_tag = first(CPS_SALE_PRICE, price_box)
+            if sale_price_tag is not None:
+                product_options['sale_price'] = get_text(sale_price_tag, strip=True)
+
+            base_price_tag = first(CPS_BASE_PRICE, price_box)
+            if base_price_tag is not None:
+                product_options['base_price'] = get_text(base_price_tag, strip=True)
+
+        versions = {}
+        version_box = first(CPS_VERSION_BOX, detail_container_center)
+        if version_box is not None:
+            for item in CPS_VERSION_ITEMS(version_box):
+                version_strong_tag = first(CPS_STRONG, item)
+                if version_strong_tag is not None:
+                    versions[get_text(version_strong_tag, strip=True)] = {
+                        "url": item.get("href"),
+                        "is_active": has_class(item, "active"),
+                    }
+        product_options['versions'] = versions
+
+        colors = {}
+        variants_box = first(CPS_VARIANTS_BOX, detail_container_center)
+        if variants_box is not None:
+            for item in CPS_VARIANT_ITEMS(variants_box):
+                color_name_tag = first(CPS_VARIANT_NAME, item)
+                color_price_tag = first(CPS_VARIANT_PRICE, item)
+
+                if color_name_tag is not None:
+                    # Giống bản bs4: thiếu thẻ <a> thì lỗi và trả về {}
+                    colors[get_text(color_name_tag, strip=True)] = {
+                        "price": get_text(color_price_tag, strip=True) if color_price_tag is not None else None,
+                        "url": first(CPS_LINK, item).get("href"),
+                        "is_active": has_class(item, "active"),
+                    }
+        product_options['colors'] = colors
+
+        return product_options
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất thông tin tùy chọn cho {url}: {e}")
+        print(traceback.format_exc())
+        return {}
+
+
+def _detail_and_link(node):
+    link_tag = first(CPS_LINK, node)
+    return {
+        "detail": get_text(node, separator=" ", strip=True),
+        "link": link_tag.get('href') if link_tag is not None else None,
+    }
+
+
+def extract_promotions_cellphones(detail_container_center, url):
+    """Khuyến mãi (xem JobSpider._extract_promotions_cellphones)"""
+    try:
+        header_tag = first(CPS_PROMOTION_HEADER, detail_container_center)
+        promotions_list = []
+        for item in CPS_PROMOTION_ITEMS(detail_container_center):
+            promotion_detail_tag = first(CPS_PROMOTION_DETAIL, item)
+            if promotion_detail_tag is not None:
+                promotions_list.append(_detail_and_link(promotion_detail_tag))
+        return {
+            'promotion_title': get_text(header_tag, strip=True) if header_tag is not None else "Khuyến mãi",
+            'promotions': promotions_list,
+        }
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất thông tin khuyến mãi từ {url}: {e}")
+        print(traceback.format_exc())
+        return {}
+
+
+def extract_payment_promotions_cellphones(detail_container_center, url):
+    """Ưu đãi thanh toán (xem JobSpider._extract_payment_promotions_cellphones)"""
+    try:
+        header_tag = first(CPS_PAYMENT_HEADER, detail_container_center)
+        return {
+            'title': get_text(header_tag, strip=True) if header_tag is not None else "Ưu đãi thanh toán",
+            'promotions': [_detail_and_link(item) for item in CPS_PAYMENT_ITEMS(detail_container_center)],
+        }
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất ưu đãi thanh toán từ {url}: {e}")
+        print(traceback.format_exc())
+        return {}
+
+
+def extract_commitments_cellphones(detail_container_left, url):
+    """Cam kết sản phẩm (xem JobSpider._extract_product_commitments_cellphones)"""
+    try:
+        title_tag = first(CPS_WARRANTY_TITLE, detail_container_left)
+        commitments_list = []
+        for item in CPS_WARRANTY_ITEMS(detail_container_left):
+            for desc_tag in CPS_WARRANTY_DESCRIPTIONS(item):
+                commitments_list.append(_detail_and_link(desc_tag))
+        return {
+            'title': get_text(title_tag, strip=True) if title_tag is not None else "Cam kết sản phẩm",
+            'commitments': commitments_list,
+        }
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất cam kết sản phẩm từ {url}: {e}")
+        print(traceback.format_exc())
+        return {}
+
+
+# ---------------------------------------------------------------------------
+# FPT Shop
+# ---------------------------------------------------------------------------
+
+FPT_DETAIL = xpath("descendant::div[@id='ThongTinSanPham']")
+FPT_BREADCRUMB = css('nav.Breadcrumb')
+FPT_BREADCRUMB_ITEMS = css('li')
+FPT_LINK = css('a')
+FPT_NAME = css(r'h1.text-textOnWhitePrimary.b2-medium.pc\:l6-semibold')
+FPT_RATING_SCORE = css(r'div.ml-1\.5.flex.items-center.gap-1 > div.text-textOnWhitePrimary.b2-regular')
+FPT_RATING_COUNT = css(r'div.ml-1.cursor-pointer.text-textOnWhiteHyperLink.f1-medium.pc\:b2-medium')
+FPT_OPTIONS = css(r'div.grid.gap-y-3.pb-4.pt-3.pc\:gap-y-2.pc\:py-0')
+# Nhãn 'Dung lượng'/'Màu sắc' rồi khối <div> ngay sau nó
+FPT_STORAGE_BUTTONS = xpath("descendant::span[.='Dung lượng'][1]/following-sibling::div[1]/descendant::button")
+FPT_COLOR_BUTTONS = xpath("descendant::span[.='Màu sắc'][1]/following-sibling::div[1]/descendant::button")
+FPT_OPTION_TEXT = css('span.block.text-textOnWhitePrimary.b2-medium')
+FPT_IMG = css('img')
+FPT_SELECTED_CLASS = 'Selection_buttonSelect__7lW_h'
+FPT_TRADE_PRICE = xpath("descendant::*[@id='tradePrice']")
+FPT_CURRENT_PRICE = css('span.h4-bold')
+FPT_ORIGINAL_PRICE = css('span.text-neutral-gray-5.line-through')
+FPT_DISCOUNT = css('span.text-red-red-7')
+FPT_REWARD_POINTS = css('span.text-yellow-yellow-7.b2-medium')
+FPT_PROMOTION_BOX = css(r'div.relative.flex.flex-col.gap-2\.5.rounded-\[0\.375rem\].border')
+FPT_PARAGRAPHS = css('p')
+FPT_PROMOTION_AND_PAYMENT = css(r'div.flex.flex-col.pc\:flex-col-reverse.pc\:gap-3')
+FPT_SWIPER_WRAPPER = css('div.swiper-wrapper')
+FPT_SWIPER_SLIDES = css('div.swiper-slide')
+FPT_OTHER_PROMOTIONS = css('div.flex.flex-col.gap-3')
+FPT_OTHER_PROMOTION_TEXT = css('p.text-textOnWhitePrimary')
+FPT_WARRANTY_LIST = css('div.flex.flex-col.gap-2.px-4.pb-4.pt-3')
+FPT_WARRANTY_ITEMS = css('div.relative.grid.h-14')
+FPT_WARRANTY_TITLE = css('p.line-clamp-2')
+FPT_WARRANTY_CURRENT_PRICE = css('span.text-textOnWhiteBrand')
+FPT_WARRANTY_ORIGINAL_PRICE = css('span.text-textOnWhiteDisable.line-through')
+
+
+def extract_breadcrumb_fptshop(root, url):
+    breadcrumb_container = first(FPT_BREADCRUMB, root)
+    if breadcrumb_container is None:
+        print("⚠️ Không tìm thấy container của breadcrumb ('nav' với class 'Breadcrumb').")
+        return []
+
+    breadcrumb_items = []
+    for li in FPT_BREADCRUMB_ITEMS(breadcrumb_container):
+        a_tag = first(FPT_LINK, li)
+        if a_tag is not None:
+            text = get_text(a_tag, strip=True)
+            if text:
+                breadcrumb_items.append(text)
+    return breadcrumb_items
+
+
+def extract_basic_info_fptshop(detail_container, url):
+    """Tên, điểm và số lượng đánh giá (xem JobSpider._extract_basic_info_fptshop)"""
+    product_details = {
+        'product_name': None,
+        'rating_score': None,
+        'rating_count': None
+    }
+
+    try:
+        for key, selector in (('product_name', FPT_NAME),
+                              ('rating_score', FPT_RATING_SCORE),
+                              ('rating_count', FPT_RATING_COUNT)):
+            tag = first(selector, detail_container)
+            if tag is not None:
+                product_details[key] = get_text(tag, strip=True)
+        return product_details
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất thông tin sản phẩm từ {url}: {e}")
+        print(traceback.format_exc())
+        return {}
+
+
+def extract_options_fptshop(detail_container, url):
+    """Tùy chọn dung lượng và màu sắc (xem JobSpider._extract_options_fptshop)"""
+    product_options = {
+        'storage_options': [],
+        'color_options': []
+    }
+
+    try:
+        options_container = first(FPT_OPTIONS, detail_container)
+        if options_container is None:
+            return product_options
+
+        for button in FPT_STORAGE_BUTTONS(options_container):
+            storage_text_tag = first(FPT_OPTION_TEXT, button)
+            if storage_text_tag is not None:
+                product_options['storage_options'].append({
+                    'value': get_text(storage_text_tag, strip=True),
+                    'is_selected': has_class(button, FPT_SELECTED_CLASS),
+                })
+
+        for button in FPT_COLOR_BUTTONS(options_container):
+            color_text_tag = first(FPT_OPTION_TEXT, button)
+            color_img_tag = first(FPT_IMG, button)
+            if color_text_tag is not None and color_img_tag is not None:
+                product_options['color_options'].append({
+                    'name': get_text(color_text_tag, strip=True),
+                    'image_url': color_img_tag.get('src'),
+                    'is_selected': has_class(button, FPT_SELECTED_CLASS),
+                })
+
+        return product_options
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất tùy chọn sản phẩm từ {url}: {e}")
+        print(traceback.format_exc())
+        return {}
+
+
+def extract_price_fptshop(detail_container, url):
+    """Giá bán, giá gốc, giảm giá và điểm thưởng (xem JobSpider._extract_price_fptshop)"""
+    price_info = {
+        'current_price': None,
+        'original_price': None,
+        'discount_percent': None,
+        'reward_points': None,
+    }
+
+    try:
+        price_container = first(FPT_TRADE_PRICE, detail_container)
+        if price_container is None:
+            return price_info
+
+        current_price_tag = first(FPT_CURRENT_PRICE, price_container)
+        if current_price_tag is not None:
+            price_info['current_price'] = _price(get_text(current_price_tag, strip=True))
+
+        original_price_tag = first(FPT_ORIGINAL_PRICE, price_container)
+        discount_percent_tag = first(FPT_DISCOUNT, price_container)
+        if original_price_tag is not None:
+            price_info['original_price'] = _price(get_text(original_price_tag, strip=True))
+        if discount_percent_tag is not None:
+            price_info['discount_percent'] = get_text(discount_percent_tag, strip=True)
+
+        reward_points_tag = first(FPT_REWARD_POINTS, price_container)
+        if reward_points_tag is not None:
+            price_info['reward_points'] = get_text(reward_points_tag, strip=True).replace('+7.497 Điểm thưởng', '7497').strip()
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất giá từ {url}: {e}")
+        print(traceback.format_exc())
+
+    return price_info
+
+
+def extract_promotions_fptshop(detail_container, url):
+    """Khuyến mãi chung, thanh toán và quà tặng (xem JobSpider._extract_all_promotions_fptshop)"""
+    all_promotions = {
+        'general_promotions': [],
+        'payment_promotions': [],
+        'other_promotions_and_gifts': []
+    }
+
+    try:
+        promotion_container = first(FPT_PROMOTION_BOX, detail_container)
+        if promotion_container is not None:
+            all_promotions['general_promotions'] = [get_text(p, strip=True) for p in FPT_PARAGRAPHS(promotion_container)]
+
+        promotion_and_payment_container = first(FPT_PROMOTION_AND_PAYMENT, detail_container)
+        if promotion_and_payment_container is not None:
+            swiper_wrapper = first(FPT_SWIPER_WRAPPER, promotion_and_payment_container)
+            if swiper_wrapper is not None:
+                payment_promotions = []
+                for slide in FPT_SWIPER_SLIDES(swiper_wrapper):
+                    img_tag = first(FPT_IMG, slide)
+                    if img_tag is not None:
+                        payment_promotions.append({
+                            'description': img_tag.get('alt', '').strip(),
+                            'image_url': img_tag.get('src', '').strip()
+                        })
+                all_promotions['payment_promotions'] = payment_promotions
+
+            promotions_list_container = first(FPT_OTHER_PROMOTIONS, promotion_and_payment_container)
+            if promotions_list_container is not None:
+                other_promotions = []
+                for p_tag in FPT_OTHER_PROMOTION_TEXT(promotions_list_container):
+                    promotion_text = get_text(p_tag, strip=True).replace("Xem chi tiết", "").strip()
+                    if promotion_text:
+                        other_promotions.append(promotion_text)
+                all_promotions['other_promotions_and_gifts'] = other_promotions
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất toàn bộ khuyến mãi từ {url}: {e}")
+        print(traceback.format_exc())
+
+    return all_promotions
+
+
+def extract_extended_warranty_fptshop(detail_container, url):
+    """Các gói bảo hành mở rộng (xem JobSpider._extract_extended_warranty_fptshop)"""
+    extended_warranties = []
+
+    try:
+        warranty_list_container = first(FPT_WARRANTY_LIST, detail_container)
+        if warranty_list_container is None:
+            return extended_warranties
+
+        for item in FPT_WARRANTY_ITEMS(warranty_list_container):
+            title_tag = first(FPT_WARRANTY_TITLE, item)
+            current_price_tag = first(FPT_WARRANTY_CURRENT_PRICE, item)
+            original_price_tag = first(FPT_WARRANTY_ORIGINAL_PRICE, item)
+
+            warranty_info = {
+                'title': None,
+                'current_price': None,
+                'original_price': None,
+            }
+            if title_tag is not None:
+                warranty_info['title'] = get_text(title_tag, strip=True)
+            if current_price_tag is not None:
+                warranty_info['current_price'] = _price(get_text(current_price_tag, strip=True))
+            if original_price_tag is not None:
+                warranty_info['original_price'] = _price(get_text(original_price_tag, strip=True))
+
+            extended_warranties.append(warranty_info)
+
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất gói bảo hành mở rộng từ {url}: {e}")
+        print(traceback.format_exc())
+
+    return extended_warranties
@@ -0,0 +1,127 @@
+# parse_stage.py - Stage parse HTML chạy trên process pool cho phần trích xuất CPU-bound
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from phone.capture import ArtifactCapture
+from phone.utils import deferred_from_future
+
+# Spider dùng trong mỗi worker process (chỉ để gọi các hàm trích xuất, không crawl)
+_worker_spider = None
+
+
+def _init_worker(capture_kwargs=None, extraction_options=None):
+    global _worker_spider
+    from multiprocessing.util import Finalize
+
+    from phone.capture import ArtifactCapture
+    from phone.extraction import ExtractionExecutor
+    from phone.spiders.crawl_phone import JobSpider
+
+    _worker_spider = JobSpider()
+    _worker_spider.extraction = ExtractionExecutor(max_workers=1, mode='serial')
+    for name, value in (extraction_options or {}).items():
+        setattr(_worker_spider, name, value)
+    if capture_kwargs:
+        # Mỗi worker có writer riêng, giới hạn sample/dung lượng tính theo từng process
+        _worker_spider.capture = ArtifactCapture(**capture_kwargs)
+        Finalize(None, _worker_spider.capture.close, exitpriority=10)
+
+
+def _extract_in_worker(site, body, url, encoding):
+    """Chạy trong worker process: parse HTML và trả về dict thuần cùng thống kê thời gian"""
+    sections = _worker_spider.extract_sections(site, body, url, encoding)
+    return sections, _worker_spider.extraction.drain_timings()
+
+
+class ProcessParseStage(object):
+    """
+    Đẩy việc parse HTML (lxml/BeautifulSoup, decode flight payload) sang một ProcessPoolExecutor
+    để tận dụng nhiều core thay vì chỉ chạy trên process của reactor.
+
+    Backpressure: khi số trang đang chờ parse đạt `max_pending`, engine của Scrapy được
+    pause để scheduler ngừng gửi request mới; engine được unpause khi số trang chờ
+    giảm xuống một nửa. Nhờ vậy response body không dồn lại trong memory.
+    """
+
+    def __init__(self, crawler, extraction, max_workers, max_pending=None, capture_kwargs=None,
+                 extraction_options=None):
+        self.crawler = crawler
+        self.extraction = extraction
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 2
+        self.resume_pending = self.max_pending // 2
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(capture_kwargs, extraction_options),
+        )
+        self.pending = 0
+        self.engine_paused = False
+
+    @classmethod
+    def from_crawler(cls, crawler, extraction):
+        """Trả về None nếu PARSE_PROCESS_POOL_SIZE = 0 (parse ngay trong callback)"""
+        max_workers = crawler.settings.getint('PARSE_PROCESS_POOL_SIZE', 0)
+        if max_workers <= 0:
+            return None
+        stage = cls(
+            crawler,
+            extraction,
+            max_workers=max_workers,
+            max_pending=crawler.settings.getint('PARSE_PROCESS_MAX_PENDING', 0),
+            capture_kwargs=ArtifactCapture.settings_kwargs(crawler.settings),
+            extraction_options=crawler.spider.extraction_options(crawler.settings),
+        )
+        print(f"🧮 Parse process pool started with {max_workers} workers (max pending: {stage.max_pending})")
+        return stage
+
+    def submit(self, site, body, url, encoding):
+        """Gửi raw body sang process pool, trả về Deferred với dict các phần đã trích xuất"""
+        self.pending += 1
+        self._update_backpressure()
+
+        future = self.executor.submit(_extract_in_worker, site, body, url, encoding)
+        d = deferred_from_future(future)
+        d.addBoth(self._finished)
+        d.addCallback(self._merge_result)
+        return d
+
+    def _finished(self, result):
+        self.pending -= 1
+        self._update_backpressure()
+        return result
+
+    def _merge_result(self, result):
+        sections, timings = result
+        self.extraction.merge_timings(timings)
+        return sections
+
+    def _update_backpressure(self):
+        stats = self.crawler.stats
+        stats.max_value('parse_stage/max_pending', self.pending)
+
+        engine = self.crawler.engine
+        if engine is None:
+            return
+
+        if not self.engine_paused and self.pending >= self.max_pending:
+            engine.pause()
+            self.engine_paused = True
+            stats.inc_value('parse_stage/engine_paused')
+        elif self.engine_paused and self.pending <= self.resume_pending:
+            engine.unpause()
+            self.engine_paused = False
+            # engine.unpause() chỉ bỏ cờ paused: engine tự chạy lại ở heartbeat kế tiếp (tối đa 5s).
+            # Đánh thức ngay qua `_slot.nextcall` - API private của Scrapy (còn ở 2.17),
+            # nên chỉ dùng khi còn tồn tại, không có thì chờ heartbeat.
+            nextcall = getattr(getattr(engine, '_slot', None), 'nextcall', None)
+            schedule = getattr(nextcall, 'schedule', None)
+            if schedule is not None:
+                schedule()
+
+    def close(self):
+        if self.engine_paused and self.crawler.engine is not None:
+            self.crawler.engine.unpause()
+        self.executor.shutdown(wait=True)
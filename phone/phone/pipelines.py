@@ -1,27 +1,134 @@
 # pipelines.py - Optimized for multi-threading
+import asyncio
+import inspect
 import traceback
 import pymongo
+from pymongo.errors import CollectionInvalid, OperationFailure
+import hashlib
 import json
+from collections import OrderedDict, deque
 from itemadapter import ItemAdapter
 import os
 from decouple import config
 import threading
-from queue import Queue
+from queue import Empty, Full, Queue
 import time
 from datetime import datetime
 import logging
 
-class OptimizedMongoDBPipeline(object):
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.reactor import is_asyncio_reactor_installed
+from twisted.internet.defer import Deferred
+
+from phone.price_history import HISTORY_INDEX, split_item, timeseries_options
+from phone.sites import site_for_url, target_collection
+
+# Đặt vào queue khi đóng pipeline: writer ghi nốt batch hiện tại rồi dừng
+_STOP = object()
+
+# Loại ghi của từng item trong một bulk write (WritePlan.kinds)
+WRITE_NEW = 'new'  # URL chưa có trong MongoDB: upsert cả document
+WRITE_CHANGED = 'changed'  # Đã có, nội dung khác (hoặc document cũ chưa có hash): $set cả document
+WRITE_UNCHANGED = 'unchanged'  # Đã có, cùng hash: chỉ $set crawled_at
+
+
+def content_hash(product_data):
     """
-    MongoDB Pipeline tối ưu với connection pooling và batch processing
+    Hash ổn định của `product_data`: JSON với key sắp xếp, nên thứ tự key trong dict
+    không làm đổi hash. Giá trị không phải JSON (vd: datetime) được đổi thành str.
     """
-    
+    canonical = json.dumps(product_data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ContentHashCache(object):
+    """
+    URL -> `content_hash` của document đang lưu trong MongoDB (None: document chưa có hash),
+    LRU có giới hạn, dùng chung cho các writer thread.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.hashes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def get_many(self, urls):
+        """{url: hash} cho các URL có trong cache"""
+        found = {}
+        with self.lock:
+            for url in urls:
+                if url in self.hashes:
+                    self.hashes.move_to_end(url)
+                    found[url] = self.hashes[url]
+        return found
+
+    def update(self, hashes):
+        with self.lock:
+            for url, value in hashes.items():
+                self.hashes[url] = value
+                self.hashes.move_to_end(url)
+            while len(self.hashes) > self.max_size:
+                self.hashes.popitem(last=False)
+
+
+class WritePlan(object):
+    """Các operation của một bulk write, `items`/`kinds` song song với `operations`"""
+
+    def __init__(self):
+        self.operations = []
+        self.items = []
+        self.kinds = []
+        self.skipped = []  # Đã có trong MongoDB và không được ghi đè: không gửi gì
+
+
+class AdaptiveBatchSize(object):
+    """
+    Kích thước batch tự điều chỉnh theo thời gian `bulk_write` đo được, trong [minimum, maximum].
+
+    - Batch đầy ghi nhanh hơn nửa `target_ms`: tăng gấp đôi (MongoDB còn dư sức)
+    - Batch ghi chậm hơn `target_ms`: giảm theo tỉ lệ target/thời gian thực tế
+    Batch chưa đầy (flush do hết hạn) không dùng để tăng vì không nói gì về sức ghi.
+    """
+
+    def __init__(self, initial=100, minimum=10, maximum=1000, target_ms=500):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target_ms = target_ms
+        self.value = min(max(initial, self.minimum), self.maximum)
+        self.lock = threading.Lock()
+
+    def observe(self, size, elapsed_ms):
+        with self.lock:
+            if elapsed_ms > self.target_ms:
+                value = int(size * self.target_ms / elapsed_ms)
+            elif size >= self.value and elapsed_ms < self.target_ms / 2:
+                value = self.value * 2
+            else:
+                return self.value
+            self.value = min(max(value, self.minimum), self.maximum)
+            return self.value
+
+
+class MongoItemWriter(object):
+    """
+    Phần dùng chung của các pipeline MongoDB (sync và async): cấu hình, build bulk operations
+    từ item, thống kê kết quả bulk write và báo URL đã lưu cho spider.
+    """
+
+    INDEXES = (
+        ("url", {"unique": True, "background": True}),  # Index on URL for faster duplicate checking
+        ("crawled_at", {"background": True}),  # Index on crawled_at for time-based queries
+        ("status", {"background": True}),  # Index on status for filtering
+    )
+
     def __init__(self):
         self.url = config('url')
-        self.db_name = "thegioididong"
-        # self.db_name = "cellphones"  # Sử dụng database cellphones
-        # self.db_name = "fptshop"  # Sử dụng database fptshop
-        self.collection_name = "details_raw"  # Sử dụng collection details_raw
+        # Database/collection theo site của từng item (phone/sites.py),
+        # URL không thuộc site nào dùng MONGO_DATABASE/MONGO_COLLECTION
+        self.settings = None
         
         # Connection pooling settings
         self.max_pool_size = 50  # Tăng pool size
@@ -31,74 +138,349 @@ class OptimizedMongoDBPipeline(object):
         self.connect_timeout_ms = 5000
         
         # Batch processing settings
-        self.batch_size = 100  # Process 100 items at once
+        self.batch_size = 100  # Kích thước batch khởi đầu, sau đó tự điều chỉnh
+        self.batch_size_min = 10
+        self.batch_size_max = 1000
+        self.batch_target_ms = 500  # Thời gian bulk_write mong muốn cho một batch
         self.batch_timeout = 5  # Max 5 seconds to wait for batch
+        self.batch_sizer = None  # AdaptiveBatchSize, tạo khi mở spider
+        self.crawler_stats = None  # Scrapy stats (from_crawler)
         
-        # Thread-safe queues and locks
-        self.item_queue = Queue()
-        self.processing_thread = None
-        self.stop_event = threading.Event()
-        self.stats_lock = threading.Lock()
+        # INCREMENTAL_RECRAWL: item của URL đã có sẽ ghi đè document cũ ($set)
+        self.overwrite = False
+        
+        # Hash nội dung của các document đã biết (đọc trước bằng $in hoặc vừa ghi)
+        self.hash_cache_size = 100000
+        self.content_hashes = None
+        
+        # PRICE_HISTORY: giá/khuyến mãi ghi vào time-series collection, document sản phẩm chỉ giữ phần tĩnh
+        self.price_history = False
+        self.price_history_collection = 'price_history'
+        self.price_history_granularity = 'hours'
         
         # Statistics
         self.stats = {
             'processed': 0,
             'inserted': 0,
+            'updated': 0,
+            'unchanged': 0,
             'duplicates': 0,
             'errors': 0,
+            'price_observations': 0,
             'start_time': datetime.now()
         }
         
         # Initialize connection
         self.client = None
-        self.db = None
-        self.collection = None
+        self.collections = {}  # (database, collection) -> Collection
+        self.spider = None
+        self.crawler = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls()
+        pipeline.crawler = crawler
+        pipeline.crawler_stats = crawler.stats
+        settings = crawler.settings
+        pipeline.batch_size_min = settings.getint('MONGO_BATCH_SIZE_MIN', pipeline.batch_size_min)
+        pipeline.batch_size_max = settings.getint('MONGO_BATCH_SIZE_MAX', pipeline.batch_size_max)
+        pipeline.batch_target_ms = settings.getfloat('MONGO_BATCH_TARGET_MS', pipeline.batch_target_ms)
+        pipeline.hash_cache_size = settings.getint('MONGO_HASH_CACHE_SIZE', pipeline.hash_cache_size)
+        pipeline.price_history = settings.getbool('PRICE_HISTORY', pipeline.price_history)
+        pipeline.price_history_collection = settings.get('PRICE_HISTORY_COLLECTION', pipeline.price_history_collection)
+        pipeline.price_history_granularity = settings.get('PRICE_HISTORY_GRANULARITY',
+                                                          pipeline.price_history_granularity)
+        return pipeline
+
+    def setup(self, spider):
+        """Đọc cấu hình của spider khi mở pipeline"""
+        self.spider = spider or self.crawler.spider
+        self.settings = self.spider.settings
+        self.overwrite = self.settings.getbool('INCREMENTAL_RECRAWL')
+        self.batch_sizer = AdaptiveBatchSize(self.batch_size, self.batch_size_min, self.batch_size_max,
+                                             self.batch_target_ms)
+        self.content_hashes = ContentHashCache(self.hash_cache_size)
+
+    def client_options(self):
+        """Tham số chung cho MongoClient / AsyncMongoClient"""
+        return dict(
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=self.min_pool_size,
+            maxIdleTimeMS=self.max_idle_time_ms,
+            serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+            connectTimeoutMS=self.connect_timeout_ms,
+            retryWrites=True,
+            w='majority'  # Write concern for reliability
+        )
+
+    def group_by_collection(self, batch):
+        """Chia batch theo collection đích: [(site, items)]"""
+        groups = {}
+        for item_data in batch:
+            site = site_for_url(item_data["url"])
+            groups.setdefault(target_collection(self.settings, site), (site, []))[1].append(item_data)
+        return list(groups.values())
+
+    def split_price_history(self, site, batch):
+        """Tách giá ra khỏi các item (PRICE_HISTORY), trả về các quan sát giá cần insert"""
+        if not self.price_history:
+            return []
+        observations = []
+        for item_data in batch:
+            observations.extend(split_item(site, item_data))
+        return observations
+
+    def history_target(self, site):
+        """(database, collection) lịch sử giá: cùng database với sản phẩm của site"""
+        return target_collection(self.settings, site)[0], self.price_history_collection
+
+    def record_history(self, collection, count):
+        self.stats['price_observations'] += count
+        if self.crawler_stats is not None:
+            self.crawler_stats.inc_value('mongo/price_observations', count)
+        print(f"📈 Price history [{collection.full_name}]: {count} observations")
+
+    def record_history_error(self, error):
+        if self.crawler_stats is not None:
+            self.crawler_stats.inc_value('mongo/price_history_errors')
+        print(f"❌ Error writing price history: {error}")
+
+    def known_hashes(self, batch):
+        """
+        Tính `content_hash` cho từng item, trả về ({url: hash} đã biết từ cache, các URL cần đọc trước).
+        Chỉ đọc trước khi INCREMENTAL_RECRAWL: không ghi đè thì URL đã có chỉ cần upsert $setOnInsert.
+        """
+        for item_data in batch:
+            item_data["content_hash"] = content_hash(item_data.get("product_data"))
+        urls = [item_data["url"] for item_data in batch]
+        known = self.content_hashes.get_many(urls)
+        missing = [url for url in urls if url not in known] if self.overwrite else []
+        return known, missing
+
+    def prefetch_query(self, urls):
+        """(filter, projection) đọc hash của các URL trong một lần `find` ($in, dùng index url)"""
+        return {"url": {"$in": urls}}, {"_id": 0, "url": 1, "content_hash": 1}
+
+    def remember_hashes(self, docs):
+        """Đưa kết quả `find(*prefetch_query(...))` vào cache, trả về {url: hash}"""
+        found = {doc["url"]: doc.get("content_hash") for doc in docs}
+        self.content_hashes.update(found)
+        return found
+
+    def plan_writes(self, batch, known):
+        """
+        Build bulk operations theo URL. `known`: {url: hash} các URL đã có trong MongoDB.
+
+        - URL mới: upsert cả document (kèm content_hash)
+        - URL đã có, không ghi đè (không INCREMENTAL_RECRAWL hoặc crawl lỗi): bỏ qua
+        - Cùng hash: chỉ $set crawled_at (LastCrawledIndex đọc crawled_at để tính hạn crawl lại)
+        - Khác hash: $set cả document
+        """
+        plan = WritePlan()
+        for item_data in batch:
+            url = item_data["url"]
+            if url not in known:
+                kind, update, upsert = WRITE_NEW, self.build_update(item_data), True
+            elif not self.is_refresh(item_data):
+                plan.skipped.append(item_data)
+                continue
+            elif known[url] == item_data["content_hash"]:
+                kind, update, upsert = WRITE_UNCHANGED, {"$set": {"crawled_at": item_data.get("crawled_at")}}, False
+            else:
+                kind, update, upsert = WRITE_CHANGED, {"$set": item_data}, False
+            plan.operations.append(pymongo.UpdateOne({"url": url}, update, upsert=upsert))
+            plan.items.append(item_data)
+            plan.kinds.append(kind)
+        return plan
+
+    def record_result(self, collection, site, plan, result):
+        """Cập nhật thống kê theo kết quả bulk write (None nếu không có gì để ghi) và báo các URL vừa lưu cho spider"""
+        upserted_ids = result.upserted_ids if result is not None else {}
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'duplicates': len(plan.skipped)}
+        stored = []
+        written = {}  # url -> hash của document sau bulk write
+        for i, (item_data, kind) in enumerate(zip(plan.items, plan.kinds)):
+            if i in upserted_ids:
+                counts['inserted'] += 1
+            elif kind == WRITE_UNCHANGED:
+                counts['unchanged'] += 1
+            elif self.is_refresh(item_data):
+                counts['updated'] += 1
+            else:
+                # Upsert $setOnInsert trúng document đã có: không ghi gì
+                counts['duplicates'] += 1
+                continue
+            written[item_data["url"]] = item_data["content_hash"]
+            stored.append(item_data["url"])
+        self.content_hashes.update(written)
+
+        self.stats['processed'] += len(plan.items) + len(plan.skipped)
+        for key, count in counts.items():
+            self.stats[key] += count
+            if self.crawler_stats is not None and count:
+                self.crawler_stats.inc_value(f'mongo/{key}', count)
+
+        print(f"📦 Processed batch [{collection.full_name}]: {len(plan.items) + len(plan.skipped)} items, "
+              f"Inserted: {counts['inserted']}, "
+              f"Updated: {counts['updated']}, "
+              f"Unchanged: {counts['unchanged']}, "
+              f"Duplicates: {counts['duplicates']}")
+
+        # Báo cho spider các URL vừa được lưu để cập nhật index URL đã crawl
+        if stored:
+            self.report_stored(stored, site)
+
+    def is_refresh(self, item_data):
+        """Item có được ghi đè document cũ không: chỉ khi crawl lại thành công"""
+        return self.overwrite and item_data.get("status") == "success"
+    
+    def build_update(self, item_data):
+        """
+        Chỉ insert URL mới ($setOnInsert), hoặc ghi đè khi crawl lại tăng dần ($set).
+        Lần crawl lại bị lỗi không ghi đè dữ liệu tốt đã lưu trước đó.
+        """
+        if self.is_refresh(item_data):
+            return {"$set": item_data}
+        return {"$setOnInsert": item_data}
+    
+    def report_stored(self, urls, site=None):
+        """Gọi `spider.mark_stored(urls, site)` nếu spider hỗ trợ"""
+        mark_stored = getattr(self.spider, 'mark_stored', None)
+        if mark_stored is None:
+            return
+        try:
+            mark_stored(urls, site)
+        except Exception as e:
+            print(f"⚠️ Could not report stored URLs to spider: {e}")
+
+    def record_flush(self, items, elapsed_ms, batch_size):
+        """Stats của một lần flush (mongo/flush_*) và batch size hiện tại"""
+        stats = self.crawler_stats
+        if stats is None:
+            return
+        stats.set_value('mongo/batch_size', batch_size)
+        stats.inc_value('mongo/flushes')
+        stats.inc_value('mongo/flush_items', items)
+        total_ms = stats.get_value('mongo/flush_ms_total', 0) + elapsed_ms
+        stats.set_value('mongo/flush_ms_total', round(total_ms, 1))
+        stats.set_value('mongo/flush_ms_avg', round(total_ms / stats.get_value('mongo/flushes'), 1))
+        stats.max_value('mongo/flush_ms_max', round(elapsed_ms, 1))
+
+    def print_final_stats(self):
+        """In thống kê cuối cùng"""
+        elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
+        rate = self.stats['processed'] / max(elapsed, 1)
+        
+        print("\n" + "="*60)
+        print("📊 FINAL CRAWLING STATISTICS")
+        print("="*60)
+        print(f"⏱️  Total time: {elapsed:.1f} seconds")
+        print(f"📄 Total processed: {self.stats['processed']} items")
+        print(f"✅ Successfully inserted: {self.stats['inserted']} items")
+        print(f"♻️  Updated (recrawled): {self.stats['updated']} items")
+        print(f"🟰 Unchanged (recrawled): {self.stats['unchanged']} items")
+        if self.price_history:
+            print(f"📈 Price observations: {self.stats['price_observations']}")
+        print(f"🔄 Duplicates skipped: {self.stats['duplicates']} items")
+        print(f"❌ Errors: {self.stats['errors']} items")
+        print(f"⚡ Average rate: {rate:.1f} items/second")
+        if self.batch_sizer is not None:
+            print(f"📐 Final batch size: {self.batch_sizer.value}")
+        self.print_writer_stats()
+        print("="*60)
+
+    def print_writer_stats(self):
+        """Thống kê riêng của cách ghi (queue/writer thread, task async...)"""
+
+    def print_progress_stats(self):
+        """In thống kê tiến trình"""
+        elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
+        rate = self.stats['processed'] / max(elapsed, 1)
+        
+        print(f"📈 Progress - Processed: {self.stats['processed']}, "
+              f"Inserted: {self.stats['inserted']}, "
+              f"Updated: {self.stats['updated']}, "
+              f"Unchanged: {self.stats['unchanged']}, "
+              f"Duplicates: {self.stats['duplicates']}, "
+              f"Errors: {self.stats['errors']}, "
+              f"Rate: {rate:.1f} items/sec")
+
+
+class OptimizedMongoDBPipeline(MongoItemWriter):
+    """
+    MongoDB Pipeline tối ưu với connection pooling và batch processing
+
+    - Item được đưa vào queue có giới hạn (MONGO_QUEUE_SIZE), MONGO_WRITER_THREADS writer thread
+      cùng lấy từ queue và ghi theo batch song song (mỗi writer một connection của pool)
+    - Writer block chờ item đầu tiên rồi lấy tiếp tối đa `batch_size` item; batch được ghi khi đủ
+      hoặc khi item đầu tiên đã chờ `batch_timeout` giây
+    - `batch_size` chỉ là giá trị khởi đầu, sau đó tự điều chỉnh theo thời gian `bulk_write`
+      (AdaptiveBatchSize, trong MONGO_BATCH_SIZE_MIN..MONGO_BATCH_SIZE_MAX)
+    - Khi queue đầy (MongoDB ghi chậm hơn tốc độ crawl), `process_item` chờ một Deferred trong
+      hàng chờ trên thread reactor, không giữ thread nào của thread pool (dùng chung với DNS và
+      index URL đã crawl); writer đánh thức sau mỗi lần lấy item ra, nên Scrapy tự giảm số item
+      xử lý song song
+    - Độ sâu queue và thời gian flush được ghi vào Scrapy stats (mongo/*)
+    """
+    
+    def __init__(self):
+        super().__init__()
         
-    def open_spider(self, spider):
+        # Queue có giới hạn giữa Scrapy và các writer thread
+        self.queue_size = 1000
+        self.writer_threads = 4
+        self.item_queue = None
+        self.space_waiters = deque()  # Deferred của các process_item chờ queue có chỗ (chỉ trên thread reactor)
+        self.processing_threads = []
+        self.writer_stats = []  # Mỗi writer: {'items', 'busy_seconds'}
+        self.stats_lock = threading.Lock()
+        self.report_lock = threading.Lock()  # mark_stored của spider không thread-safe
+        self.collections_lock = threading.Lock()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = super().from_crawler(crawler)
+        settings = crawler.settings
+        pipeline.queue_size = settings.getint('MONGO_QUEUE_SIZE', pipeline.queue_size)
+        pipeline.writer_threads = max(1, settings.getint('MONGO_WRITER_THREADS', pipeline.writer_threads))
+        return pipeline
+
+    def open_spider(self, spider=None):
         """Khởi tạo kết nối khi spider bắt đầu"""
+        self.setup(spider)
+        self.item_queue = Queue(maxsize=self.queue_size)
         try:
             # Tạo MongoDB client với connection pooling
-            self.client = pymongo.MongoClient(
-                self.url,
-                maxPoolSize=self.max_pool_size,
-                minPoolSize=self.min_pool_size,
-                maxIdleTimeMS=self.max_idle_time_ms,
-                serverSelectionTimeoutMS=self.server_selection_timeout_ms,
-                connectTimeoutMS=self.connect_timeout_ms,
-                retryWrites=True,
-                w='majority'  # Write concern for reliability
-            )
+            self.client = self.create_client()
             
             # Test connection
             self.client.admin.command('ping')
             print("✅ MongoDB connection established successfully")
             
-            # Get database and collection
-            self.db = self.client[self.db_name]
-            self.collection = self.db[self.collection_name]
-            
-            # Create indexes for better performance
-            self.create_indexes()
-            
             # Start background processing thread
             self.start_background_processor()
             
-            print(f"📊 Pipeline initialized with batch size: {self.batch_size}")
+            print(f"📊 Pipeline initialized with batch size: {self.batch_sizer.value} "
+                  f"({self.batch_sizer.minimum}-{self.batch_sizer.maximum}), "
+                  f"writers: {self.writer_threads}, queue size: {self.queue_size}")
             
         except Exception as e:
             print(f"❌ Error connecting to MongoDB: {e}")
             raise
     
-    def close_spider(self, spider):
+    def close_spider(self, spider=None):
         """Đóng kết nối khi spider kết thúc"""
         print("🔄 Closing MongoDB pipeline...")
         
-        # Stop background processor
-        self.stop_event.set()
-        if self.processing_thread and self.processing_thread.is_alive():
-            self.processing_thread.join(timeout=10)
+        # Mỗi writer nhận một _STOP, ghi hết các item trước đó rồi dừng
+        alive = [thread for thread in self.processing_threads if thread.is_alive()]
+        for _ in alive:
+            self.item_queue.put(_STOP)
+        for thread in alive:
+            thread.join()
+        self.processing_threads = []
         
-        # Process remaining items
+        # Writer đã chết giữa chừng: ghi các item còn lại trong queue
         self.process_remaining_items()
         
         # Close connection
@@ -109,100 +491,188 @@ class OptimizedMongoDBPipeline(object):
         # Print final statistics
         self.print_final_stats()
     
-    def create_indexes(self):
+    def create_client(self):
+        return pymongo.MongoClient(self.url, **self.client_options())
+
+    def collection_for(self, site):
+        """Collection lưu sản phẩm của site, tạo indexes ở lần dùng đầu tiên"""
+        target = target_collection(self.settings, site)
+        with self.collections_lock:
+            collection = self.collections.get(target)
+            if collection is None:
+                db_name, collection_name = target
+                collection = self.client[db_name][collection_name]
+                self.create_indexes(collection)
+                self.collections[target] = collection
+        return collection
+    
+    def create_indexes(self, collection):
         """Tạo indexes để tối ưu hiệu suất"""
         try:
-            # Index on URL for faster duplicate checking
-            self.collection.create_index("url", unique=True, background=True)
+            for keys, options in self.INDEXES:
+                collection.create_index(keys, **options)
             
-            # Index on crawled_at for time-based queries
-            self.collection.create_index("crawled_at", background=True)
-            
-            # Index on status for filtering
-            self.collection.create_index("status", background=True)
-            
-            print("✅ Database indexes created/verified")
+            print(f"✅ Database indexes created/verified: {collection.full_name}")
             
         except Exception as e:
             print(f"⚠️ Warning: Could not create indexes: {e}")
+
+    def history_collection_for(self, site):
+        """Collection lịch sử giá, tạo (time-series) ở lần dùng đầu tiên"""
+        target = self.history_target(site)
+        with self.collections_lock:
+            collection = self.collections.get(target)
+            if collection is None:
+                collection = self.create_history_collection(*target)
+                self.collections[target] = collection
+        return collection
+
+    def create_history_collection(self, db_name, collection_name):
+        """
+        Time-series collection (MongoDB >= 5.0) gom các quan sát giá theo URL + màu vào bucket.
+        Server cũ hơn: collection thường, cùng index (url, thời gian).
+        """
+        db = self.client[db_name]
+        try:
+            db.create_collection(collection_name, timeseries=timeseries_options(self.price_history_granularity))
+            print(f"✅ Time-series collection created: {db_name}.{collection_name}")
+        except CollectionInvalid:
+            pass  # Đã có từ lần crawl trước
+        except OperationFailure as e:
+            print(f"⚠️ Time-series not supported, using a regular collection for price history: {e}")
+        collection = db[collection_name]
+        try:
+            collection.create_index(HISTORY_INDEX)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create price history index: {e}")
+        return collection
+
+    def write_history(self, site, observations):
+        """Insert các quan sát giá của một batch"""
+        try:
+            collection = self.history_collection_for(site)
+            collection.insert_many(observations, ordered=False)
+            with self.stats_lock:
+                self.record_history(collection, len(observations))
+        except Exception as e:
+            with self.stats_lock:
+                self.record_history_error(e)
     
     def start_background_processor(self):
-        """Khởi động thread xử lý batch trong background"""
-        self.processing_thread = threading.Thread(
-            target=self.batch_processor,
-            daemon=True
-        )
-        self.processing_thread.start()
-        print("🚀 Background batch processor started")
+        """Khởi động các writer thread, cùng lấy item từ một queue"""
+        self.writer_stats = [{'items': 0, 'busy_seconds': 0.0} for _ in range(self.writer_threads)]
+        for writer_id in range(self.writer_threads):
+            thread = threading.Thread(
+                target=self.batch_processor,
+                args=(writer_id,),
+                daemon=True,
+                name=f'mongo-writer-{writer_id}'
+            )
+            thread.start()
+            self.processing_threads.append(thread)
+        print(f"🚀 Background batch processor started ({self.writer_threads} writers)")
     
-    def batch_processor(self):
-        """Xử lý items theo batch trong background thread"""
-        batch = []
-        last_process_time = time.time()
-        
-        while not self.stop_event.is_set():
-            try:
-                # Get item from queue with timeout
+    def batch_processor(self, writer_id=0):
+        """Writer thread: chờ item đầu tiên, gom tiếp tới khi đủ batch hoặc hết hạn, rồi ghi"""
+        stopping = False
+        while not stopping:
+            item = self.item_queue.get()
+            if item is _STOP:
+                break
+
+            # Deadline tính từ item đầu tiên của batch, không phải từ lần flush trước
+            batch = [item]
+            taken = 1  # Số item đã lấy khỏi queue nhưng chưa báo cho các process_item đang chờ
+            batch_size = self.batch_sizer.value
+            deadline = time.monotonic() + self.batch_timeout
+            while len(batch) < batch_size:
                 try:
-                    item = self.item_queue.get(timeout=1.0)
-                    batch.append(item)
-                except:
-                    # Timeout - check if we should process current batch
-                    pass
-                
-                current_time = time.time()
-                
-                # Process batch if it's full or timeout reached
-                should_process = (
-                    len(batch) >= self.batch_size or
-                    (batch and (current_time - last_process_time) >= self.batch_timeout)
-                )
-                
-                if should_process and batch:
-                    self.process_batch(batch)
-                    batch = []
-                    last_process_time = current_time
-                    
-            except Exception as e:
-                print(f"❌ Error in batch processor: {e}")
-                print(traceback.format_exc())
-        
-        # Process final batch
-        if batch:
+                    item = self.item_queue.get_nowait()
+                except Empty:
+                    # Queue đã cạn: đánh thức process_item đang chờ trước khi chờ item tiếp,
+                    # nếu không các item đó chỉ vào queue sau khi batch hết hạn
+                    if taken:
+                        self.notify_space(taken)
+                        taken = 0
+                    try:
+                        item = self.item_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except Empty:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                taken += 1
+
+            if taken:
+                self.notify_space(taken)
+            self.flush(batch, writer_id)
+
+    def notify_space(self, count):
+        """Writer thread vừa lấy `count` item khỏi queue: đánh thức tối đa `count` process_item đang chờ"""
+        from twisted.internet import reactor
+
+        reactor.callFromThread(self.wake_space_waiters, count)
+
+    def wake_space_waiters(self, count):
+        """Trên thread reactor: mỗi process_item được đánh thức thử lại put_nowait ngay trong callback"""
+        while count > 0 and self.space_waiters:
+            count -= 1
+            self.space_waiters.popleft().callback(None)
+
+    def flush(self, batch, writer_id=0):
+        """Ghi một batch, điều chỉnh kích thước batch và cập nhật stats thời gian flush / throughput"""
+        start = time.perf_counter()
+        try:
             self.process_batch(batch)
-    
+        except Exception as e:
+            with self.stats_lock:
+                self.stats['errors'] += len(batch)
+            print(f"❌ Error in batch processor: {e}")
+            print(traceback.format_exc())
+        elapsed = time.perf_counter() - start
+        elapsed_ms = elapsed * 1000
+        batch_size = self.batch_sizer.observe(len(batch), elapsed_ms)
+
+        stats = self.crawler_stats
+        with self.stats_lock:
+            writer = self.writer_stats[writer_id]
+            writer['items'] += len(batch)
+            writer['busy_seconds'] += elapsed
+            if stats is None:
+                return
+            # Throughput khi đang ghi (item / giây ghi) của writer này
+            stats.set_value(f'mongo/writer_{writer_id}/items', writer['items'])
+            stats.set_value(f'mongo/writer_{writer_id}/items_per_sec',
+                            round(writer['items'] / max(writer['busy_seconds'], 1e-6), 1))
+            self.record_flush(len(batch), elapsed_ms, batch_size)
+            stats.set_value('mongo/queue_depth', self.item_queue.qsize())
+
     def process_batch(self, batch):
-        """Xử lý một batch items"""
+        """Xử lý một batch items, mỗi collection đích một bulk write"""
         if not batch:
             return
         
+        for site, items in self.group_by_collection(batch):
+            self.write_batch(site, items)
+    
+    def write_batch(self, site, batch):
+        """Ghi các items của cùng một site bằng một bulk write"""
         try:
-            # Prepare bulk operations
-            operations = []
-            
-            for item_data in batch:
-                # Use upsert to handle duplicates efficiently
-                operations.append(
-                    pymongo.UpdateOne(
-                        {"url": item_data["url"]},  # Filter
-                        {"$setOnInsert": item_data},  # Only set on insert
-                        upsert=True
-                    )
-                )
+            collection = self.collection_for(site)
+            observations = self.split_price_history(site, batch)
+            known, missing = self.known_hashes(batch)
+            if missing:
+                known.update(self.remember_hashes(collection.find(*self.prefetch_query(missing))))
+            plan = self.plan_writes(batch, known)
             
             # Execute bulk operation
-            if operations:
-                result = self.collection.bulk_write(operations, ordered=False)
-                
-                # Update statistics
-                with self.stats_lock:
-                    self.stats['processed'] += len(batch)
-                    self.stats['inserted'] += result.upserted_count
-                    self.stats['duplicates'] += (len(batch) - result.upserted_count)
-                
-                print(f"📦 Processed batch: {len(batch)} items, "
-                      f"Inserted: {result.upserted_count}, "
-                      f"Duplicates: {len(batch) - result.upserted_count}")
+            result = collection.bulk_write(plan.operations, ordered=False) if plan.operations else None
+            with self.stats_lock, self.report_lock:
+                self.record_result(collection, site, plan, result)
+            
+            if observations:
+                self.write_history(site, observations)
                 
         except Exception as e:
             with self.stats_lock:
@@ -215,25 +685,50 @@ class OptimizedMongoDBPipeline(object):
         remaining_items = []
         
         # Collect remaining items
-        while not self.item_queue.empty():
+        while True:
             try:
                 item = self.item_queue.get_nowait()
-                remaining_items.append(item)
-            except:
+            except Empty:
                 break
+            if item is not _STOP:
+                remaining_items.append(item)
         
         if remaining_items:
             print(f"🔄 Processing {len(remaining_items)} remaining items...")
             self.process_batch(remaining_items)
     
-    def process_item(self, item, spider):
-        """Main method được Scrapy gọi cho mỗi item"""
+    async def process_item(self, item, spider=None):
+        """
+        Main method được Scrapy gọi cho mỗi item.
+        Queue đầy: chờ writer lấy bớt item (Deferred trong `space_waiters`, không chiếm thread),
+        item chỉ hoàn tất khi đã vào queue (backpressure).
+        """
         try:
             # Convert item to dict
             item_data = ItemAdapter(item).asdict()
             
             # Add to queue for batch processing
-            self.item_queue.put(item_data)
+            waited = False
+            while True:
+                try:
+                    self.item_queue.put_nowait(item_data)
+                    break
+                except Full:
+                    if not waited and self.crawler_stats is not None:
+                        self.crawler_stats.inc_value('mongo/queue_full')
+                    waiter = Deferred()
+                    if waited:
+                        # Đã được đánh thức nhưng item mới lấy mất chỗ: giữ lượt ở đầu hàng chờ
+                        self.space_waiters.appendleft(waiter)
+                    else:
+                        self.space_waiters.append(waiter)
+                    waited = True
+                    await maybe_deferred_to_future(waiter)
+
+            if self.crawler_stats is not None:
+                depth = self.item_queue.qsize()
+                self.crawler_stats.set_value('mongo/queue_depth', depth)
+                self.crawler_stats.max_value('mongo/queue_depth_max', depth)
             
             # Print progress periodically
             with self.stats_lock:
@@ -249,33 +744,208 @@ class OptimizedMongoDBPipeline(object):
         
         return item
     
-    def print_progress_stats(self):
-        """In thống kê tiến trình"""
-        elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
-        rate = self.stats['processed'] / max(elapsed, 1)
-        
-        print(f"📈 Progress - Processed: {self.stats['processed']}, "
-              f"Inserted: {self.stats['inserted']}, "
-              f"Duplicates: {self.stats['duplicates']}, "
-              f"Errors: {self.stats['errors']}, "
-              f"Rate: {rate:.1f} items/sec")
-    
-    def print_final_stats(self):
-        """In thống kê cuối cùng"""
-        elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
-        rate = self.stats['processed'] / max(elapsed, 1)
-        
-        print("\n" + "="*60)
-        print("📊 FINAL CRAWLING STATISTICS")
-        print("="*60)
-        print(f"⏱️  Total time: {elapsed:.1f} seconds")
-        print(f"📄 Total processed: {self.stats['processed']} items")
-        print(f"✅ Successfully inserted: {self.stats['inserted']} items")
-        print(f"🔄 Duplicates skipped: {self.stats['duplicates']} items")
-        print(f"❌ Errors: {self.stats['errors']} items")
-        print(f"⚡ Average rate: {rate:.1f} items/second")
-        print(f"💾 Queue size at end: {self.item_queue.qsize()}")
-        print("="*60)
+    def print_writer_stats(self):
+        print(f"💾 Queue size at end: {self.item_queue.qsize() if self.item_queue else 0}")
+        for writer_id, writer in enumerate(self.writer_stats):
+            rate = writer['items'] / max(writer['busy_seconds'], 1e-6)
+            print(f"✍️  Writer #{writer_id}: {writer['items']} items, {rate:.1f} items/sec while writing")
+
+class AsyncMongoDBPipeline(MongoItemWriter):
+    """
+    Pipeline MongoDB với driver async (pymongo AsyncMongoClient, hoặc motor với pymongo < 4.9),
+    chạy ngay trên event loop asyncio của reactor: không writer thread, không lock.
+
+    - Cần TWISTED_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
+    - Item được gom vào buffer; mỗi batch là một asyncio task `bulk_write`, tối đa
+      MONGO_WRITER_THREADS batch ghi song song. Khi đủ, `process_item` chờ một batch ghi xong
+      (backpressure cho Scrapy như khi queue của OptimizedMongoDBPipeline đầy)
+    - Batch được gửi khi đủ `batch_size` (tự điều chỉnh như pipeline sync) hoặc khi item đầu tiên
+      đã chờ `batch_timeout` giây
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.max_concurrent_writes = 4
+        self.buffer = []
+        self.flush_timer = None  # Deadline của batch đang gom (asyncio.TimerHandle)
+        self.write_tasks = set()
+        self.index_tasks = {}  # (database, collection) -> Task tạo indexes / collection lịch sử giá
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not is_asyncio_reactor_installed():
+            raise RuntimeError(
+                "AsyncMongoDBPipeline needs TWISTED_REACTOR = "
+                "'twisted.internet.asyncioreactor.AsyncioSelectorReactor'"
+            )
+        pipeline = super().from_crawler(crawler)
+        pipeline.max_concurrent_writes = max(1, crawler.settings.getint('MONGO_WRITER_THREADS',
+                                                                        pipeline.max_concurrent_writes))
+        return pipeline
+
+    async def open_spider(self, spider=None):
+        """Khởi tạo kết nối khi spider bắt đầu"""
+        self.setup(spider)
+        try:
+            self.client = self.create_client()
+            await self.client.admin.command('ping')
+            print("✅ MongoDB connection established successfully (async)")
+            print(f"📊 Pipeline initialized with batch size: {self.batch_sizer.value} "
+                  f"({self.batch_sizer.minimum}-{self.batch_sizer.maximum}), "
+                  f"concurrent writes: {self.max_concurrent_writes}")
+        except Exception as e:
+            print(f"❌ Error connecting to MongoDB: {e}")
+            raise
+
+    async def close_spider(self, spider=None):
+        """Ghi nốt buffer, chờ các batch đang ghi rồi đóng kết nối"""
+        print("🔄 Closing MongoDB pipeline...")
+        self.flush_buffer()
+        if self.write_tasks:
+            await asyncio.gather(*self.write_tasks)
+
+        if self.client:
+            # AsyncMongoClient.close() là coroutine, motor close() thì không
+            closed = self.client.close()
+            if inspect.isawaitable(closed):
+                await closed
+            print("✅ MongoDB connection closed")
+
+        self.print_final_stats()
+
+    def create_client(self):
+        try:
+            from pymongo import AsyncMongoClient
+        except ImportError:
+            try:
+                from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+            except ImportError:
+                raise RuntimeError("AsyncMongoDBPipeline needs pymongo >= 4.9 (AsyncMongoClient) or motor")
+        return AsyncMongoClient(self.url, **self.client_options())
+
+    async def collection_for(self, site):
+        """Collection lưu sản phẩm của site, tạo indexes ở lần dùng đầu tiên"""
+        target = target_collection(self.settings, site)
+        collection = self.collections.get(target)
+        if collection is None:
+            db_name, collection_name = target
+            collection = self.collections[target] = self.client[db_name][collection_name]
+            self.index_tasks[target] = asyncio.ensure_future(self.create_indexes(collection))
+        await self.index_tasks[target]
+        return collection
+
+    async def create_indexes(self, collection):
+        """Tạo indexes để tối ưu hiệu suất"""
+        try:
+            for keys, options in self.INDEXES:
+                await collection.create_index(keys, **options)
+            print(f"✅ Database indexes created/verified: {collection.full_name}")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create indexes: {e}")
+
+    async def history_collection_for(self, site):
+        """Collection lịch sử giá, tạo (time-series) ở lần dùng đầu tiên"""
+        target = self.history_target(site)
+        if target not in self.index_tasks:
+            self.index_tasks[target] = asyncio.ensure_future(self.create_history_collection(*target))
+        return await self.index_tasks[target]
+
+    async def create_history_collection(self, db_name, collection_name):
+        """Time-series collection, hoặc collection thường nếu server không hỗ trợ (xem pipeline sync)"""
+        db = self.client[db_name]
+        try:
+            await db.create_collection(collection_name,
+                                       timeseries=timeseries_options(self.price_history_granularity))
+            print(f"✅ Time-series collection created: {db_name}.{collection_name}")
+        except CollectionInvalid:
+            pass  # Đã có từ lần crawl trước
+        except OperationFailure as e:
+            print(f"⚠️ Time-series not supported, using a regular collection for price history: {e}")
+        collection = db[collection_name]
+        try:
+            await collection.create_index(HISTORY_INDEX)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create price history index: {e}")
+        return collection
+
+    async def write_history(self, site, observations):
+        """Insert các quan sát giá của một batch"""
+        try:
+            collection = await self.history_collection_for(site)
+            await collection.insert_many(observations, ordered=False)
+            self.record_history(collection, len(observations))
+        except Exception as e:
+            self.record_history_error(e)
+
+    async def process_item(self, item, spider=None):
+        """Main method được Scrapy gọi cho mỗi item"""
+        try:
+            # Đủ số batch đang ghi song song: chờ một batch xong (backpressure)
+            while len(self.write_tasks) >= self.max_concurrent_writes:
+                if self.crawler_stats is not None:
+                    self.crawler_stats.inc_value('mongo/writes_full')
+                await asyncio.wait(self.write_tasks, return_when=asyncio.FIRST_COMPLETED)
+
+            self.buffer.append(ItemAdapter(item).asdict())
+            if len(self.buffer) >= self.batch_sizer.value:
+                self.flush_buffer()
+            elif self.flush_timer is None:
+                # Deadline tính từ item đầu tiên của batch
+                self.flush_timer = asyncio.get_running_loop().call_later(self.batch_timeout, self.flush_buffer)
+
+            if self.crawler_stats is not None:
+                self.crawler_stats.set_value('mongo/queue_depth', len(self.buffer))
+                self.crawler_stats.max_value('mongo/queue_depth_max', len(self.buffer))
+
+            total_processed = self.stats['processed']
+            if total_processed > 0 and total_processed % 100 == 0:
+                self.print_progress_stats()
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f'❌ Error in process_item: {e}')
+            print(traceback.format_exc())
+
+        return item
+
+    def flush_buffer(self):
+        """Gửi buffer hiện tại thành một task bulk write"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        task = asyncio.ensure_future(self.write(batch))
+        self.write_tasks.add(task)
+        task.add_done_callback(self.write_tasks.discard)
+
+    async def write(self, batch):
+        """Ghi một batch, mỗi collection đích một bulk write"""
+        start = time.perf_counter()
+        for site, items in self.group_by_collection(batch):
+            try:
+                collection = await self.collection_for(site)
+                observations = self.split_price_history(site, items)
+                known, missing = self.known_hashes(items)
+                if missing:
+                    docs = await collection.find(*self.prefetch_query(missing)).to_list(None)
+                    known.update(self.remember_hashes(docs))
+                plan = self.plan_writes(items, known)
+                result = await collection.bulk_write(plan.operations, ordered=False) if plan.operations else None
+                self.record_result(collection, site, plan, result)
+                if observations:
+                    await self.write_history(site, observations)
+            except Exception as e:
+                self.stats['errors'] += len(items)
+                print(f"❌ Error processing batch: {e}")
+                print(traceback.format_exc())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.record_flush(len(batch), elapsed_ms, self.batch_sizer.observe(len(batch), elapsed_ms))
+
+    def print_writer_stats(self):
+        print(f"✍️  Concurrent writes: {self.max_concurrent_writes}, buffered at end: {len(self.buffer)}")
+
 
 # Legacy pipeline for backward compatibility
 class MongoDBPipeline(OptimizedMongoDBPipeline):
@@ -284,7 +954,7 @@ class MongoDBPipeline(OptimizedMongoDBPipeline):
     def __init__(self):
         print("⚠️  Using legacy MongoDBPipeline. Consider switching to OptimizedMongoDBPipeline")
         super().__init__()
-        # Use smaller batch size for legacy mode
+        # Use smaller batch size for legacy mode (giá trị khởi đầu, sau đó tự điều chỉnh)
         self.batch_size = 50
 
 # Additional specialized pipelines
@@ -294,7 +964,7 @@ class FastMongoDBPipeline(OptimizedMongoDBPipeline):
     
     def __init__(self):
         super().__init__()
-        # Aggressive settings for maximum speed
+        # Aggressive settings for maximum speed (batch size khởi đầu, sau đó tự điều chỉnh)
         self.batch_size = 200
         self.batch_timeout = 2
         self.max_pool_size = 100
@@ -322,9 +992,9 @@ class SafeMongoDBPipeline(OptimizedMongoDBPipeline):
             # Fallback: process items one by one
             for item_data in batch:
                 try:
-                    self.collection.update_one(
+                    self.collection_for(site_for_url(item_data["url"])).update_one(
                         {"url": item_data["url"]},
-                        {"$setOnInsert": item_data},
+                        self.build_update(item_data),
                         upsert=True
                     )
                     with self.stats_lock:
@@ -0,0 +1,138 @@
+# price_history.py - Tách item thành document sản phẩm (ít thay đổi) và các quan sát giá (time-series)
+import re
+from datetime import datetime, timezone
+
+from phone.seen_urls import parse_timestamp
+
+# Time-series collection: mỗi quan sát là một document nhỏ, MongoDB gom theo `meta` (URL + màu) vào bucket
+TIME_FIELD = 'observed_at'
+META_FIELD = 'meta'
+# Index đọc lịch sử giá của một URL theo thời gian (cũng dùng cho collection thường khi không có time-series)
+HISTORY_INDEX = [(f'{META_FIELD}.url', 1), (TIME_FIELD, 1)]
+
+# Một số tiền: nhóm nghìn ngăn bởi '.' hoặc ',' ('10.990.000'), hoặc chuỗi số liền ('10990000')
+_AMOUNT = re.compile(r'\d{1,3}(?:[.,]\d{3})+(?!\d)|\d+')
+
+
+def timeseries_options(granularity='hours'):
+    """Tham số `timeseries` của create_collection"""
+    return {'timeField': TIME_FIELD, 'metaField': META_FIELD, 'granularity': granularity}
+
+
+def parse_price(value):
+    """
+    Giá dạng '10.990.000₫' / '10,990,000đ' / int -> int (VND), None nếu không có số.
+    Chuỗi có nhiều số tiền (vd: khoảng giá '10.990.000₫ - 12.000.000₫') lấy số đầu tiên.
+    """
+    if isinstance(value, int):
+        return value
+    if not value:
+        return None
+    match = _AMOUNT.search(str(value))
+    return int(re.sub(r'[.,]', '', match.group())) if match else None
+
+
+def observation(color, current_price, original_price=None, discount=None, promotions=None, **extra):
+    """Một quan sát giá; `extra`: các field khác đi kèm giá (trả góp, điểm thưởng...) giữ nguyên"""
+    return {
+        'color': color or '',
+        'current_price': parse_price(current_price),
+        'original_price': parse_price(original_price),
+        'discount': discount or None,
+        'promotions': [promo for promo in (promotions or []) if promo],
+        **extra,
+    }
+
+
+# Field của một entry `price_and_promotions` được chuẩn hoá trong observation, các field khác giữ nguyên
+_TGDD_PRICE_FIELDS = ('color', 'current_price', 'original_price', 'discount', 'promo_list')
+
+
+def split_thegioididong(product_data):
+    """
+    `price_and_promotions`: một entry cho mỗi màu (render hoặc HTML tĩnh).
+    installment_info, location, promo_title, loyalty_points... đi theo observation của màu.
+    """
+    static = dict(product_data)
+    entries = static.pop('price_and_promotions', None) or []
+    return static, [
+        observation(entry.get('color'), entry.get('current_price'), entry.get('original_price'),
+                    entry.get('discount'), entry.get('promo_list'),
+                    **{key: value for key, value in entry.items() if key not in _TGDD_PRICE_FIELDS})
+        for entry in entries
+    ]
+
+
+def split_cellphones(product_data):
+    """Giá của màu đang chọn (sale_price/base_price) và giá hiển thị trên từng màu"""
+    static = dict(product_data)
+    sale_price = static.pop('sale_price', None)
+    base_price = static.pop('base_price', None)
+    promotions_data = static.pop('promotions', None) or {}
+    promotions = [promo.get('detail') for promo in promotions_data.get('promotions', [])]
+    promo_title = promotions_data.get('promotion_title')
+
+    colors = static.get('colors') or {}
+    if colors:
+        static['colors'] = {name: {key: value for key, value in info.items() if key != 'price'}
+                            for name, info in colors.items()}
+
+    observations = []
+    for name, info in colors.items():
+        if info.get('is_active'):
+            observations.append(observation(name, sale_price or info.get('price'), base_price, None, promotions,
+                                            promo_title=promo_title))
+        else:
+            observations.append(observation(name, info.get('price'), None, None, promotions,
+                                            promo_title=promo_title))
+    if not colors:
+        observations.append(observation('', sale_price, base_price, None, promotions, promo_title=promo_title))
+    return static, observations
+
+
+def split_fptshop(product_data):
+    """Một giá cho màu đang chọn"""
+    static = dict(product_data)
+    current_price = static.pop('current_price', None)
+    original_price = static.pop('original_price', None)
+    discount = static.pop('discount_percent', None)
+    general_promotions = []
+    if isinstance(static.get('promotions'), dict):
+        promotions = static['promotions'] = dict(static['promotions'])
+        general_promotions = promotions.pop('general_promotions', [])
+
+    color = next((option.get('name') for option in static.get('color_options') or [] if option.get('is_selected')), '')
+    return static, [observation(color, current_price, original_price, discount, general_promotions)]
+
+
+# Site -> hàm tách product_data thành (document sản phẩm, [quan sát giá])
+SPLITTERS = {
+    'thegioididong': split_thegioididong,
+    'cellphones': split_cellphones,
+    'fptshop': split_fptshop,
+}
+
+
+def split_item(site, item_data):
+    """
+    Tách giá/khuyến mãi ra khỏi `item_data['product_data']` (thay bằng phần tĩnh),
+    trả về các document quan sát giá cần insert vào time-series collection.
+    Item lỗi hoặc site không có splitter: giữ nguyên, không có quan sát nào.
+    """
+    splitter = SPLITTERS.get(site.name) if site is not None else None
+    product_data = item_data.get('product_data')
+    if splitter is None or item_data.get('status') != 'success' or not isinstance(product_data, dict):
+        return []
+
+    static, observations = splitter(product_data)
+    item_data['product_data'] = static
+
+    timestamp = parse_timestamp(item_data.get('crawled_at'))
+    observed_at = datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else datetime.now(timezone.utc)
+    documents = []
+    for fields in observations:
+        if fields['current_price'] is None:
+            continue
+        color = fields.pop('color')
+        documents.append({TIME_FIELD: observed_at, META_FIELD: {'url': item_data['url'], 'color': color}, **fields})
+    return documents
@@ -0,0 +1,450 @@
+# render_pool.py - Pool các worker Node.js/Playwright chạy lâu dài
+import json
+import os
+import subprocess
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from itertools import count
+from queue import Empty, Full, Queue
+
+from twisted.internet import threads
+
+from phone.utils import deferred_from_future
+
+CLIENT_CRAWL_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../client_crawl')
+)
+RENDER_WORKER_SCRIPT = os.path.join(CLIENT_CRAWL_DIR, 'render_worker.js')
+
+# Số mẫu thời gian render gần nhất giữ lại cho mỗi (task, giai đoạn) để tính percentile
+LATENCY_SAMPLES = 10000
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, p):
+    """Percentile theo nearest-rank trên danh sách đã sắp xếp"""
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-p * len(sorted_values) // 100))  # ceil
+    return sorted_values[rank - 1]
+
+
+class RenderError(Exception):
+    """Lỗi khi render một URL bằng worker Node.js"""
+
+
+class RenderTimeout(RenderError):
+    """Worker không trả kết quả trong thời gian cho phép"""
+
+
+class RenderWorker(object):
+    """
+    Một process `node render_worker.js` giữ một browser, giao tiếp qua JSON lines
+    """
+
+    def __init__(self, worker_id, script_path=RENDER_WORKER_SCRIPT, node_bin='node', env=None):
+        self.worker_id = worker_id
+        self.script_path = script_path
+        self.node_bin = node_bin
+        self.env = env
+        self.jobs_done = 0
+        self.proc = None
+        self.responses = Queue()
+        self.reader_thread = None
+        self._ids = count(1)
+
+    def start(self):
+        """Khởi động process Node.js và thread đọc stdout"""
+        self.proc = subprocess.Popen(
+            [self.node_bin, self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,  # Log của worker đi thẳng ra stderr của crawler
+            text=True,
+            bufsize=1,
+            cwd=os.path.dirname(self.script_path),
+            env={**os.environ, **self.env} if self.env else None,
+        )
+        self.reader_thread = threading.Thread(
+            target=self._read_stdout,
+            args=(self.proc, self.responses),
+            daemon=True
+        )
+        self.reader_thread.start()
+        print(f"🚀 Render worker #{self.worker_id} started (PID: {self.proc.pid})")
+
+    @staticmethod
+    def _read_stdout(proc, responses):
+        for line in proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"⚠️ Render worker output is not JSON: {line[:200]}")
+        # EOF - process đã thoát
+        responses.put(None)
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def call_batch(self, task, urls, timeout, concurrency=1, on_result=None):
+        """
+        Gửi một batch URL, worker render song song trên `concurrency` page của cùng browser.
+        `on_result(url, ok, result_or_error, timings)` được gọi cho từng URL ngay khi worker trả về
+        (không theo thứ tự gửi); `timings` là thời gian (ms) theo giai đoạn do worker đo. `timeout` là thời gian tối đa chờ giữa hai kết quả liên tiếp.
+        """
+        job_id = next(self._ids)
+        job = {"id": job_id, "task": task, "urls": urls, "concurrency": concurrency}
+        try:
+            self.proc.stdin.write(json.dumps(job) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RenderError(f"Render worker #{self.worker_id} is not accepting jobs: {e}")
+
+        while True:
+            try:
+                message = self.responses.get(timeout=timeout)
+            except Empty:
+                raise RenderTimeout(f"Render batch timed out after {timeout}s without a result ({len(urls)} URLs)")
+            if message is None:
+                raise RenderError(f"Render worker #{self.worker_id} exited (code {self.proc.poll()})")
+            if message.get("id") is None and message.get("ok") is False:
+                # Worker không đọc được id của job (dòng job hỏng): worker xử lý từng job một
+                # nên lỗi thuộc về job đang chờ, báo lỗi ngay thay vì chờ tới timeout
+                raise RenderError(message.get("error") or "Invalid render job")
+            if message.get("id") != job_id:
+                # Kết quả của một job cũ, bỏ qua
+                continue
+
+            if message.get("done"):
+                if message.get("ok", True) is False:
+                    raise RenderError(message.get("error") or "Unknown render error")
+                return
+
+            self.jobs_done += 1
+            if on_result is not None:
+                ok = bool(message.get("ok"))
+                on_result(message.get("url"), ok, message.get("result") if ok else message.get("error"),
+                          message.get("timings") or {})
+
+    def stop(self, timeout=10):
+        """Đóng stdin để worker tự tắt browser, kill nếu quá thời gian"""
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.kill()
+        self.proc = None
+
+    def kill(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+        self.proc = None
+
+
+class RenderBatcher(object):
+    """
+    Gom các URL cùng task thành batch trước khi đưa vào pool.
+
+    - Batch được gửi khi đủ `batch_size` URL, hoặc khi URL đầu tiên của batch đã chờ
+      `max_wait` giây (không để URL chờ lâu khi crawl chậm)
+    - Mỗi URL có Future riêng, pool trả kết quả về đúng Future theo URL
+    - `submit()` không bao giờ block: việc đưa batch vào queue của pool (có thể block khi
+      queue đầy) chạy trên thread riêng của batcher, không phải thread của reactor
+    """
+
+    def __init__(self, pool, batch_size=8, max_wait=0.5):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.pending = {}  # task -> (deadline, [(url, future)])
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name='render-batcher')
+        self.thread.start()
+
+    def submit(self, task, url):
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RenderError("Render batcher is closed")
+            batch = self.pending.get(task)
+            if batch is None:
+                batch = self.pending[task] = (time.monotonic() + self.max_wait, [])
+            batch[1].append((url, future))
+            if len(batch[1]) == 1 or len(batch[1]) >= self.batch_size:
+                # Batch mới (deadline mới) hoặc batch đã đủ: đánh thức thread gửi
+                self.condition.notify()
+        return future
+
+    def _take_ready(self):
+        now = time.monotonic()
+        ready = [task for task, (deadline, entries) in self.pending.items()
+                 if self.closed or deadline <= now or len(entries) >= self.batch_size]
+        batches = []
+        for task in ready:
+            entries = self.pending.pop(task)[1]
+            for i in range(0, len(entries), self.batch_size):
+                batches.append((task, entries[i:i + self.batch_size]))
+        return batches
+
+    def _run(self):
+        while True:
+            with self.condition:
+                ready = self._take_ready()
+                while not ready:
+                    if self.closed:
+                        return
+                    timeout = None
+                    if self.pending:
+                        timeout = max(0.0, min(deadline for deadline, _ in self.pending.values()) - time.monotonic())
+                    self.condition.wait(timeout)
+                    ready = self._take_ready()
+
+            for task, entries in ready:
+                self.pool.submit_batch(task, entries)
+
+    def close(self):
+        """Gửi nốt các batch đang gom rồi dừng thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class RenderWorkerPool(object):
+    """
+    Pool N worker render chạy lâu dài, nhận URL qua một queue có giới hạn.
+
+    - Mỗi worker là một process Node.js giữ một browser mở suốt quá trình crawl
+    - Job quá `job_timeout` giây sẽ bị huỷ và worker được khởi động lại
+    - Worker được thay mới sau `max_jobs_per_worker` job (URL) để tránh rò rỉ bộ nhớ
+    - Nếu `batch_size` > 1, URL được gom thành batch (RenderBatcher); mỗi worker render một
+      batch trên `pages_per_worker` page song song và trả về từng URL ngay khi xong
+    """
+
+    def __init__(self, size=4, queue_size=64, max_jobs_per_worker=200, job_timeout=120,
+                 script_path=RENDER_WORKER_SCRIPT, node_bin='node',
+                 batch_size=1, batch_max_wait=0.5, pages_per_worker=1, worker_env=None):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.job_timeout = job_timeout
+        self.script_path = script_path
+        self.node_bin = node_bin
+        self.pages_per_worker = pages_per_worker
+        self.worker_env = worker_env
+        self.batcher = RenderBatcher(self, batch_size, batch_max_wait) if batch_size > 1 else None
+
+        self.jobs = Queue(maxsize=queue_size)
+        self.threads = []
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'jobs': 0,
+            'batches': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'recycled': 0,
+        }
+        self.latencies = {}  # task -> {giai đoạn: deque các mẫu ms}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            size=settings.getint('RENDER_POOL_SIZE', 4),
+            queue_size=settings.getint('RENDER_POOL_QUEUE_SIZE', 64),
+            max_jobs_per_worker=settings.getint('RENDER_POOL_MAX_JOBS_PER_WORKER', 200),
+            job_timeout=settings.getfloat('RENDER_JOB_TIMEOUT', 120),
+            node_bin=settings.get('RENDER_NODE_BIN', 'node'),
+            batch_size=settings.getint('RENDER_BATCH_SIZE', 1),
+            batch_max_wait=settings.getfloat('RENDER_BATCH_MAX_WAIT', 0.5),
+            pages_per_worker=settings.getint('RENDER_PAGES_PER_WORKER', 1),
+            worker_env={
+                'RENDER_BLOCK_RESOURCES': '1' if settings.getbool('RENDER_BLOCK_RESOURCES', True) else '0',
+                'RENDER_WAIT_TIMEOUT': str(int(settings.getfloat('RENDER_WAIT_TIMEOUT', 5) * 1000)),
+                'RENDER_OPTIONAL_WAIT_TIMEOUT': str(int(settings.getfloat('RENDER_OPTIONAL_WAIT_TIMEOUT', 1.5) * 1000)),
+            },
+        )
+
+    def start(self):
+        for slot in range(self.size):
+            thread = threading.Thread(target=self._run, args=(slot,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        if self.batcher is not None:
+            self.batcher.start()
+            print(f"🖥️  Render pool started with {self.size} workers (batch: {self.batcher.batch_size} URLs, "
+                  f"max wait: {self.batcher.max_wait}s, {self.pages_per_worker} pages/worker)")
+        else:
+            print(f"🖥️  Render pool started with {self.size} workers")
+
+    def submit(self, task, url, block=True):
+        """Đưa job vào queue, trả về concurrent.futures.Future. Block nếu queue đầy."""
+        future = Future()
+        self.jobs.put((task, [(url, future)]), block=block)
+        return future
+
+    def submit_batch(self, task, entries, block=True):
+        """Đưa một batch [(url, future)] vào queue như một job. Block nếu queue đầy."""
+        self.jobs.put((task, entries), block=block)
+
+    def render_deferred(self, task, url):
+        """
+        Gọi bất đồng bộ từ thread của reactor, trả về Deferred.
+        Khi queue đầy, việc chờ chỗ trống được đẩy sang thread pool của reactor.
+        """
+        if self.batcher is not None:
+            return deferred_from_future(self.batcher.submit(task, url))
+        try:
+            future = self.submit(task, url, block=False)
+        except Full:
+            d = threads.deferToThread(self.submit, task, url)
+            d.addCallback(deferred_from_future)
+            return d
+        return deferred_from_future(future)
+
+    def record_timings(self, task, timings):
+        """Lưu thời gian theo giai đoạn của một URL (gọi khi đang giữ stats_lock)"""
+        phases = self.latencies.setdefault(task, {})
+        for phase, elapsed in timings.items():
+            if phase not in phases:
+                phases[phase] = deque(maxlen=LATENCY_SAMPLES)
+            phases[phase].append(elapsed)
+
+    def latency_percentiles(self):
+        """{task: {giai đoạn: {50: ms, 90: ms, 99: ms}}} trên các mẫu gần nhất"""
+        with self.stats_lock:
+            latencies = {task: {phase: sorted(samples) for phase, samples in phases.items()}
+                         for task, phases in self.latencies.items()}
+        return {
+            task: {phase: {p: percentile(samples, p) for p in LATENCY_PERCENTILES}
+                   for phase, samples in phases.items()}
+            for task, phases in latencies.items()
+        }
+
+    def export_stats(self, stats):
+        """Ghi số job và percentile thời gian render vào Scrapy stats"""
+        with self.stats_lock:
+            counters = dict(self.stats)
+        for name, value in counters.items():
+            stats.set_value(f'render/{name}', value)
+        for task, phases in self.latency_percentiles().items():
+            for phase, values in phases.items():
+                for p, value in values.items():
+                    stats.set_value(f'render/{task}/{phase}_p{p}_ms', value)
+
+    def print_stats(self):
+        for task, phases in sorted(self.latency_percentiles().items()):
+            print(f"⏱️  Render timings: {task}")
+            for phase, values in phases.items():
+                print(f"   {phase:<10} " + "  ".join(f"p{p}: {value:>7} ms" for p, value in values.items()))
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join(timeout=self.job_timeout)
+        self.threads = []
+        print(f"✅ Render pool closed - jobs: {self.stats['jobs']}, batches: {self.stats['batches']}, errors: {self.stats['errors']}, "
+              f"timeouts: {self.stats['timeouts']}, recycled: {self.stats['recycled']}")
+
+    def _spawn(self, slot):
+        worker = RenderWorker(slot, script_path=self.script_path, node_bin=self.node_bin, env=self.worker_env)
+        worker.start()
+        return worker
+
+    def _run(self, slot):
+        """Vòng lặp của một slot: lấy job (batch URL) từ queue và gửi cho worker của slot"""
+        worker = None
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            task, entries = job
+            # URL -> các Future đang chờ (một URL có thể được gửi nhiều lần trong cùng batch)
+            waiting = {}
+            for url, future in entries:
+                if future.set_running_or_notify_cancel():
+                    waiting.setdefault(url, []).append(future)
+            if not waiting:
+                continue
+
+            def on_result(url, ok, value, timings):
+                futures = waiting.pop(url, ())
+                with self.stats_lock:
+                    self.record_timings(task, timings)
+                    self.stats['jobs'] += len(futures)
+                    if not ok:
+                        self.stats['errors'] += len(futures)
+                for future in futures:
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(RenderError(value or "Unknown render error"))
+
+            failure = None
+            try:
+                if worker is None or not worker.is_alive():
+                    worker = self._spawn(slot)
+                worker.call_batch(task, list(waiting), self.job_timeout, self.pages_per_worker, on_result)
+            except RenderTimeout as e:
+                with self.stats_lock:
+                    self.stats['timeouts'] += 1
+                # Worker đang kẹt, kill để slot nhận job tiếp theo
+                worker.kill()
+                worker = None
+                failure = e
+            except RenderError as e:
+                if worker is not None and not worker.is_alive():
+                    worker = None
+                failure = e
+            except Exception as e:
+                print(f"❌ Render worker #{slot} crashed: {e}")
+                print(traceback.format_exc())
+                if worker is not None:
+                    worker.kill()
+                worker = None
+                failure = RenderError(str(e))
+            finally:
+                with self.stats_lock:
+                    self.stats['batches'] += 1
+
+            # Các URL chưa có kết quả (worker lỗi/timeout giữa chừng) nhận lỗi của cả batch
+            for url, futures in waiting.items():
+                with self.stats_lock:
+                    self.stats['jobs'] += len(futures)
+                    self.stats['errors'] += len(futures)
+                for future in futures:
+                    future.set_exception(failure or RenderError(f"Render worker #{slot} returned no result for {url}"))
+
+            # Recycle worker sau K job
+            if worker is not None and worker.jobs_done >= self.max_jobs_per_worker:
+                worker.stop()
+                worker = None
+                with self.stats_lock:
+                    self.stats['recycled'] += 1
+
+        if worker is not None:
+            worker.stop()
@@ -0,0 +1,523 @@
+# seen_urls.py - Index các URL đã có trong MongoDB, load lazy khi spider bắt đầu crawl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import chain
+
+import pymongo
+from decouple import config
+
+from phone.sites import target_collection
+
+SNAPSHOT_MAGIC = b'SEENURL1'
+LAST_CRAWLED_MAGIC = b'LASTCRL1'
+BLOOM_MAGIC = b'SEENBLM1'
+BLOOM_HEADER = struct.Struct('<8sQQQQ')  # magic, num_bits, num_hashes, capacity, count
+CONFIRM_BATCH_SIZE = 1000  # Số URL tối đa trong một query `$in` xác nhận
+
+
+def url_fingerprint(url):
+    """Fingerprint 64-bit của một URL (blake2b)"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def parse_timestamp(value):
+    """
+    Chuyển thời gian sang epoch seconds (UTC), trả về None nếu không đọc được.
+    Hỗ trợ `crawled_at` của pipeline ("%Y-%m-%d %H:%M:%S", UTC) và `<lastmod>` của
+    sitemap (W3C datetime: "2024-01-01", "2024-01-01T10:00:00+07:00", "...Z").
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iter_stored_docs(mongo_url, db_name, collection_name, fields, batch_size=10000):
+    """Stream các document trong collection theo batch, chỉ projection `fields` (bỏ `_id`)"""
+    projection = dict.fromkeys(fields, 1)
+    projection['_id'] = 0
+    client = pymongo.MongoClient(mongo_url, serverSelectionTimeoutMS=5000, connectTimeoutMS=5000)
+    try:
+        cursor = client[db_name][collection_name].find({}, projection, batch_size=batch_size)
+        for doc in cursor:
+            if doc.get('url'):
+                yield doc
+    finally:
+        client.close()
+
+
+def iter_stored_urls(mongo_url, db_name, collection_name, batch_size=10000):
+    """Stream các URL trong collection theo batch, chỉ projection `url` (bỏ `_id`)"""
+    for doc in iter_stored_docs(mongo_url, db_name, collection_name, ('url',), batch_size):
+        yield doc['url']
+
+
+class SeenUrlIndex(object):
+    """
+    Interface cho index "URL đã crawl". Spider mở index trong start_requests, không phải
+    lúc import module, nên `scrapy list` hay import spider không chạm tới MongoDB.
+
+    `blocking`: `filter_new`/`filter_due` có query MongoDB (đồng bộ), spider gọi chúng trên
+    thread pool thay vì trên thread của reactor.
+    """
+
+    blocking = False
+
+    @classmethod
+    def from_crawler(cls, crawler, site=None):
+        return cls()
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def add(self, url):
+        raise NotImplementedError
+
+    def add_many(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def filter_new(self, urls):
+        """Trả về các URL chưa có trong index, giữ nguyên thứ tự"""
+        return [url for url in urls if url not in self]
+
+    def filter_due(self, entries):
+        """
+        Trả về các URL cần crawl từ danh sách (url, lastmod) của sitemap.
+        Mặc định chỉ crawl URL mới; LastCrawledIndex crawl lại cả URL đã thay đổi/quá hạn.
+        """
+        return self.filter_new([url for url, _ in entries])
+
+    def __contains__(self, url):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class FingerprintSeenUrlIndex(SeenUrlIndex):
+    """
+    Lưu URL dưới dạng fingerprint 64-bit: một array('Q') đã sort (8 byte/URL) cộng
+    một set nhỏ cho các URL mới thêm trong lần crawl hiện tại.
+
+    Khi mở: dùng snapshot trên đĩa nếu còn hạn, ngược lại stream collection theo batch
+    (chỉ projection `url`, bỏ `_id`) rồi ghi lại snapshot cho lần khởi động sau.
+    """
+
+    def __init__(self, mongo_url, db_name, collection_name='details_raw', snapshot_path=None,
+                 snapshot_max_age=0, refresh=False, batch_size=10000):
+        self.mongo_url = mongo_url
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.snapshot_path = snapshot_path
+        self.snapshot_max_age = snapshot_max_age
+        self.refresh = refresh
+        self.batch_size = batch_size
+
+        self.fingerprints = array('Q')  # Sorted
+        self.added = set()
+
+    @classmethod
+    def from_crawler(cls, crawler, site=None):
+        settings = crawler.settings
+        db_name, collection_name = target_collection(settings, site)
+        snapshot_path = settings.get('SEEN_URLS_SNAPSHOT')
+        return cls(
+            mongo_url=config('url'),
+            db_name=db_name,
+            collection_name=collection_name,
+            snapshot_path=snapshot_path.format(db=db_name) if snapshot_path else None,
+            snapshot_max_age=settings.getfloat('SEEN_URLS_SNAPSHOT_MAX_AGE', 0),
+            refresh=settings.getbool('SEEN_URLS_REFRESH', False),
+            batch_size=settings.getint('SEEN_URLS_BATCH_SIZE', 10000),
+        )
+
+    def open(self):
+        if not self.refresh and self._snapshot_is_fresh():
+            self.load_snapshot()
+            print(f"📂 Loaded {len(self)} seen URLs from snapshot {self.snapshot_path}")
+            return
+
+        start = time.time()
+        self.load_from_mongo()
+        print(f"------Num in DB--------- {len(self)} (loaded in {time.time() - start:.1f}s)")
+        if self.snapshot_path:
+            self.save_snapshot()
+
+    def close(self):
+        if self.snapshot_path:
+            self.save_snapshot()
+
+    def _snapshot_is_fresh(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        if self.snapshot_max_age <= 0:
+            return True
+        return time.time() - os.path.getmtime(self.snapshot_path) < self.snapshot_max_age
+
+    def load_from_mongo(self):
+        """Stream cursor theo batch, chỉ giữ lại fingerprint của URL"""
+        fingerprints = array('Q')
+        for url in iter_stored_urls(self.mongo_url, self.db_name, self.collection_name, self.batch_size):
+            fingerprints.append(url_fingerprint(url))
+
+        self.fingerprints = array('Q', sorted(set(fingerprints)))
+        self.added = set()
+
+    def load_snapshot(self):
+        with open(self.snapshot_path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"Invalid seen URL snapshot: {self.snapshot_path}")
+            fingerprints = array('Q')
+            fingerprints.frombytes(f.read())
+        self.fingerprints = fingerprints
+        self.added = set()
+
+    def save_snapshot(self):
+        """Gộp các URL mới vào array đã sort và ghi snapshot (atomic)"""
+        if self.added:
+            self.fingerprints = array('Q', sorted(set(self.fingerprints).union(self.added)))
+            self.added = set()
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            self.fingerprints.tofile(f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _contains_fingerprint(self, fp):
+        if fp in self.added:
+            return True
+        i = bisect_left(self.fingerprints, fp)
+        return i < len(self.fingerprints) and self.fingerprints[i] == fp
+
+    def add(self, url):
+        fp = url_fingerprint(url)
+        if not self._contains_fingerprint(fp):
+            self.added.add(fp)
+
+    def __contains__(self, url):
+        return self._contains_fingerprint(url_fingerprint(url))
+
+    def __len__(self):
+        return len(self.fingerprints) + len(self.added)
+
+
+class BloomSeenUrlIndex(SeenUrlIndex):
+    """
+    Bloom filter memory-mapped từ file, dùng làm index URL đã crawl.
+
+    - Kích thước tính từ `capacity` và tỉ lệ false-positive `error_rate` cấu hình được
+    - File được mmap khi khởi động, chỉ build lại từ MongoDB nếu chưa có file (hoặc refresh)
+    - Cập nhật tăng dần khi pipeline báo các URL vừa được upsert
+    - `confirm_positives`: các URL filter báo "đã có" được kiểm tra lại bằng một query
+      `$in` theo batch tới MongoDB, nên kết quả của `filter_new` là chính xác (index khi đó là
+      `blocking`). `in` chỉ dùng bloom filter (có thể false-positive), không query MongoDB.
+    """
+
+    def __init__(self, mongo_url, db_name, collection_name='details_raw', path=None,
+                 capacity=5000000, error_rate=0.001, confirm_positives=True, refresh=False,
+                 batch_size=10000):
+        self.mongo_url = mongo_url
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.confirm_positives = confirm_positives
+        self.refresh = refresh
+        self.batch_size = batch_size
+
+        self.num_bits, self.num_hashes = self.optimal_size(capacity, error_rate)
+        self.count = 0  # Ước lượng: chỉ tăng khi có ít nhất một bit mới được bật
+        self.lock = threading.Lock()
+        self.file = None
+        self.bits = None
+        self.client = None
+        self.client_lock = threading.Lock()
+
+    @property
+    def blocking(self):
+        return self.confirm_positives
+
+    @staticmethod
+    def optimal_size(capacity, error_rate):
+        """Số bit m và số hàm hash k tối ưu cho n phần tử với tỉ lệ false-positive p"""
+        num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_bits = (num_bits + 7) // 8 * 8
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        return num_bits, num_hashes
+
+    @classmethod
+    def from_crawler(cls, crawler, site=None):
+        settings = crawler.settings
+        db_name, collection_name = target_collection(settings, site)
+        path = settings.get('SEEN_URLS_BLOOM_PATH', 'seen_urls_{db}.bloom')
+        return cls(
+            mongo_url=config('url'),
+            db_name=db_name,
+            collection_name=collection_name,
+            path=path.format(db=db_name),
+            capacity=settings.getint('SEEN_URLS_BLOOM_CAPACITY', 5000000),
+            error_rate=settings.getfloat('SEEN_URLS_BLOOM_ERROR_RATE', 0.001),
+            confirm_positives=settings.getbool('SEEN_URLS_CONFIRM_POSITIVES', True),
+            refresh=settings.getbool('SEEN_URLS_REFRESH', False),
+            batch_size=settings.getint('SEEN_URLS_BATCH_SIZE', 10000),
+        )
+
+    def open(self):
+        if not self.refresh and os.path.exists(self.path):
+            self._map_file(create=False)
+            print(f"📂 Loaded bloom filter {self.path}: {self.count} URLs, "
+                  f"{self.num_bits // 8 / 1024 / 1024:.1f} MB, {self.num_hashes} hashes")
+            if self.count > self.capacity:
+                print(f"⚠️ Bloom filter is over capacity ({self.count} > {self.capacity}), "
+                      f"false-positive rate is above the configured rate. Set SEEN_URLS_REFRESH=True "
+                      f"with a larger SEEN_URLS_BLOOM_CAPACITY to rebuild it.")
+            return
+
+        start = time.time()
+        self._map_file(create=True)
+        for url in iter_stored_urls(self.mongo_url, self.db_name, self.collection_name, self.batch_size):
+            self._add(url)
+        self.flush()
+        print(f"------Num in DB--------- {self.count} (bloom filter built in {time.time() - start:.1f}s)")
+
+    def _map_file(self, create):
+        if create:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.num_bits, self.num_hashes, self.capacity, 0))
+                f.truncate(BLOOM_HEADER.size + self.num_bits // 8)
+            os.replace(tmp_path, self.path)
+
+        self.file = open(self.path, 'r+b')
+        self.bits = mmap.mmap(self.file.fileno(), 0)
+        magic, num_bits, num_hashes, capacity, count = BLOOM_HEADER.unpack_from(self.bits, 0)
+        if magic != BLOOM_MAGIC:
+            raise ValueError(f"Invalid bloom filter file: {self.path}")
+        # Dùng kích thước lưu trong file, không phải từ settings hiện tại
+        self.num_bits, self.num_hashes, self.capacity, self.count = num_bits, num_hashes, capacity, count
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _might_contain(self, url):
+        bits = self.bits
+        offset = BLOOM_HEADER.size
+        for pos in self._positions(url):
+            if not bits[offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def _add(self, url):
+        bits = self.bits
+        offset = BLOOM_HEADER.size
+        new = False
+        for pos in self._positions(url):
+            i = offset + (pos >> 3)
+            mask = 1 << (pos & 7)
+            if not bits[i] & mask:
+                bits[i] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def add(self, url):
+        with self.lock:
+            self._add(url)
+
+    def add_many(self, urls):
+        with self.lock:
+            for url in urls:
+                self._add(url)
+
+    def _confirm(self, urls):
+        """Query MongoDB một lần cho cả batch, trả về tập URL thực sự đã có"""
+        with self.client_lock:
+            if self.client is None:
+                self.client = pymongo.MongoClient(self.mongo_url, serverSelectionTimeoutMS=5000,
+                                                  connectTimeoutMS=5000)
+        collection = self.client[self.db_name][self.collection_name]
+        cursor = collection.find({"url": {"$in": list(urls)}}, {"url": 1, "_id": 0})
+        return {doc['url'] for doc in cursor}
+
+    def filter_new(self, urls):
+        positives = [url for url in urls if self._might_contain(url)]
+        if not positives:
+            return list(urls)
+
+        if self.confirm_positives:
+            stored = set()
+            for i in range(0, len(positives), CONFIRM_BATCH_SIZE):
+                stored |= self._confirm(positives[i:i + CONFIRM_BATCH_SIZE])
+        else:
+            stored = set(positives)
+        return [url for url in urls if url not in stored]
+
+    def __contains__(self, url):
+        """Chỉ kiểm tra bloom filter (không query MongoDB): có thể false-positive"""
+        return self._might_contain(url)
+
+    def __len__(self):
+        return self.count
+
+    def flush(self):
+        with self.lock:
+            BLOOM_HEADER.pack_into(self.bits, 0, BLOOM_MAGIC, self.num_bits, self.num_hashes, self.capacity, self.count)
+            self.bits.flush()
+
+    def close(self):
+        if self.bits is not None:
+            self.flush()
+            self.bits.close()
+            self.file.close()
+            self.bits = None
+            self.file = None
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+class LastCrawledIndex(FingerprintSeenUrlIndex):
+    """
+    Index "URL -> lần crawl cuối" cho chế độ crawl lại tăng dần (INCREMENTAL_RECRAWL).
+
+    Lưu fingerprint 64-bit trong array('Q') đã sort cùng một array('I') song song chứa
+    `crawled_at` (epoch seconds, 12 byte/URL), cộng một dict nhỏ cho các URL vừa được lưu
+    trong lần crawl hiện tại. So sánh với `<lastmod>` của sitemap không cần query MongoDB.
+
+    Một URL cần crawl khi:
+      - chưa có trong index
+      - `lastmod` mới hơn `crawled_at`
+      - `crawled_at` cũ hơn `max_age` giây (nếu max_age > 0)
+    """
+
+    def __init__(self, *args, max_age=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+        self.crawled_at = array('I')  # Song song với self.fingerprints
+        self.updated = {}  # fingerprint -> crawled_at, ghi trong lần crawl hiện tại
+
+    @classmethod
+    def from_crawler(cls, crawler, site=None):
+        settings = crawler.settings
+        db_name, collection_name = target_collection(settings, site)
+        snapshot_path = settings.get('LAST_CRAWLED_SNAPSHOT')
+        return cls(
+            mongo_url=config('url'),
+            db_name=db_name,
+            collection_name=collection_name,
+            snapshot_path=snapshot_path.format(db=db_name) if snapshot_path else None,
+            snapshot_max_age=settings.getfloat('SEEN_URLS_SNAPSHOT_MAX_AGE', 0),
+            refresh=settings.getbool('SEEN_URLS_REFRESH', False),
+            batch_size=settings.getint('SEEN_URLS_BATCH_SIZE', 10000),
+            max_age=settings.getfloat('RECRAWL_MAX_AGE_DAYS', 0) * 24 * 3600,
+        )
+
+    def load_from_mongo(self):
+        """Stream cursor theo batch, chỉ giữ fingerprint của URL và `crawled_at`"""
+        latest = {}
+        for doc in iter_stored_docs(self.mongo_url, self.db_name, self.collection_name,
+                                    ('url', 'crawled_at'), self.batch_size):
+            fp = url_fingerprint(doc['url'])
+            # Không đọc được crawled_at -> coi như rất cũ (0) để crawl lại
+            crawled_at = int(parse_timestamp(doc.get('crawled_at')) or 0)
+            latest[fp] = max(crawled_at, latest.get(fp, 0))
+
+        self._set_sorted(sorted(latest.items()))
+        self.updated = {}
+
+    def _set_sorted(self, pairs):
+        self.fingerprints = array('Q', (fp for fp, _ in pairs))
+        self.crawled_at = array('I', (crawled_at for _, crawled_at in pairs))
+
+    def load_snapshot(self):
+        with open(self.snapshot_path, 'rb') as f:
+            if f.read(len(LAST_CRAWLED_MAGIC)) != LAST_CRAWLED_MAGIC:
+                raise ValueError(f"Invalid last-crawled snapshot: {self.snapshot_path}")
+            count, = struct.unpack('<Q', f.read(8))
+            fingerprints = array('Q')
+            fingerprints.fromfile(f, count)
+            crawled_at = array('I')
+            crawled_at.fromfile(f, count)
+        self.fingerprints = fingerprints
+        self.crawled_at = crawled_at
+        self.updated = {}
+
+    def save_snapshot(self):
+        """Gộp các lần crawl mới vào hai array đã sort và ghi snapshot (atomic)"""
+        if self.updated:
+            new = []
+            for fp, crawled_at in self.updated.items():
+                i = self._position(fp)
+                if i is None:
+                    new.append((fp, crawled_at))
+                else:
+                    self.crawled_at[i] = crawled_at
+            if new:
+                self._set_sorted(sorted(chain(zip(self.fingerprints, self.crawled_at), new)))
+            self.updated = {}
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(LAST_CRAWLED_MAGIC)
+            f.write(struct.pack('<Q', len(self.fingerprints)))
+            self.fingerprints.tofile(f)
+            self.crawled_at.tofile(f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _position(self, fp):
+        i = bisect_left(self.fingerprints, fp)
+        if i < len(self.fingerprints) and self.fingerprints[i] == fp:
+            return i
+        return None
+
+    def last_crawled(self, url):
+        """Epoch seconds của lần crawl cuối, None nếu URL chưa từng được crawl"""
+        fp = url_fingerprint(url)
+        if fp in self.updated:
+            return self.updated[fp]
+        i = self._position(fp)
+        return None if i is None else self.crawled_at[i]
+
+    def add(self, url, crawled_at=None):
+        self.updated[url_fingerprint(url)] = int(crawled_at if crawled_at is not None else time.time())
+
+    def is_due(self, url, lastmod=None, now=None):
+        crawled_at = self.last_crawled(url)
+        if crawled_at is None:
+            return True
+        if self.max_age > 0 and (now or time.time()) - crawled_at > self.max_age:
+            return True
+        modified = parse_timestamp(lastmod)
+        return modified is not None and modified > crawled_at
+
+    def filter_due(self, entries):
+        now = time.time()
+        return [url for url, lastmod in entries if self.is_due(url, lastmod, now)]
+
+    def _contains_fingerprint(self, fp):
+        return fp in self.updated or self._position(fp) is not None
+
+    def __len__(self):
+        return len(self.fingerprints) + sum(1 for fp in self.updated if self._position(fp) is None)
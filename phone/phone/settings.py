@@ -7,7 +7,7 @@ NEWSPIDER_MODULE = 'phone.spiders'
 # CONCURRENT SETTINGS - Tối ưu hóa đa luồng
 CONCURRENT_REQUESTS = 32  # Tăng từ 16 (mặc định) lên 32
 CONCURRENT_REQUESTS_PER_DOMAIN = 16  # Giới hạn requests cho mỗi domain
-CONCURRENT_REQUESTS_PER_IP = 8  # Giới hạn requests cho mỗi IP
+CONCURRENT_REQUESTS_PER_IP = 0  # 0: slot download theo domain (mỗi site một slot, xem DOWNLOAD_SLOTS trong spider)
 
 # DOWNLOAD SETTINGS
 DOWNLOAD_DELAY = 1  # Giảm delay để tăng tốc độ
@@ -31,6 +31,7 @@ AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
 AUTOTHROTTLE_DEBUG = True  # Bật để debug
 
 # REACTOR SETTINGS - Sử dụng SelectReactor để tránh conflicts
+# AsyncMongoDBPipeline cần reactor asyncio: 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
 TWISTED_REACTOR = 'twisted.internet.selectreactor.SelectReactor'
 
 # MEMORY USAGE - Giám sát và giới hạn memory
@@ -108,6 +109,8 @@ CLOSESPIDER_ERRORCOUNT = 100   # Dừng sau 100 errors
 # ITEM PIPELINES
 ITEM_PIPELINES = {
     'phone.pipelines.MongoDBPipeline': 300,
+    # Ghi async trên event loop của reactor (cần TWISTED_REACTOR asyncio ở trên):
+    # 'phone.pipelines.AsyncMongoDBPipeline': 300,
 }
 
 # LOG SETTINGS
@@ -145,4 +148,73 @@ REDIRECT_MAX_TIMES = 5
 AJAXCRAWL_ENABLED = False
 
 # REQUEST FINGERPRINTER
-REQUEST_FINGERPRINTER_IMPLEMENTATION = '2.7'
\ No newline at end of file
+REQUEST_FINGERPRINTER_IMPLEMENTATION = '2.7'
+
+# RENDER POOL - Worker Node.js/Playwright chạy lâu dài (client_crawl/render_worker.js)
+RENDER_POOL_SIZE = 4  # Số process Node.js, mỗi process giữ một browser
+RENDER_POOL_QUEUE_SIZE = 64  # Số job tối đa chờ trong queue
+RENDER_POOL_MAX_JOBS_PER_WORKER = 200  # Khởi động lại worker sau K job
+RENDER_JOB_TIMEOUT = 120  # Timeout chờ kết quả của mỗi URL (giây)
+RENDER_NODE_BIN = 'node'
+RENDER_BATCH_SIZE = 8  # Số URL tối đa mỗi job; 1 = tắt batch, mỗi URL một job
+RENDER_BATCH_MAX_WAIT = 0.5  # Gửi batch chưa đủ sau tối đa N giây (tính từ URL đầu tiên)
+RENDER_PAGES_PER_WORKER = 4  # Số page render song song trong browser của mỗi worker
+RENDER_WAIT_TIMEOUT = 5  # Chờ tối đa N giây cho phần bắt buộc (giá, nút/modal thông số) thay vì sleep cố định
+RENDER_OPTIONAL_WAIT_TIMEOUT = 1.5  # Chờ tối đa N giây cho phần có thể không có (khuyến mãi)
+RENDER_BLOCK_RESOURCES = True  # Không tải ảnh, font, media và script analytics khi render
+PRICE_STATIC_FIRST = True  # Thegioididong: đọc giá/khuyến mãi từ HTML tĩnh, chỉ render khi thiếu (hoặc nhiều màu)
+VARIANT_REQUESTS = True  # Giá các màu khác tải bằng Request của Scrapy (không qua browser), render riêng trang màu nếu thiếu giá
+
+# EXTRACTION - Executor dùng chung cho các hàm trích xuất
+EXTRACTION_BACKEND = 'lxml'  # 'lxml': selector XPath/CSS compile sẵn (phone/lxml_extractors.py); 'bs4': extractor BeautifulSoup cũ
+EXTRACTION_PARSE_ONLY = True  # Backend 'bs4': chỉ build cây cho các container extractor cần (phone/soup_strainers.py)
+EXTRACTION_MODE = 'serial'  # 'serial': chạy tuần tự trong callback (CPU-bound, tránh tạo thread vô ích); 'threaded': thread pool chung, chỉ để benchmark (vẫn block reactor khi chờ)
+EXTRACTION_MAX_WORKERS = 4  # Kích thước thread pool chung (tác vụ I/O-bound và mode 'threaded')
+
+# PARSE PROCESS POOL - Parse HTML (CPU-bound) trên nhiều core thay vì chỉ process của reactor
+PARSE_PROCESS_POOL_SIZE = 0  # 0: parse ngay trong callback; > 0: số worker process
+PARSE_PROCESS_MAX_PENDING = 0  # Số trang chờ parse tối đa trước khi pause engine (0: 2 x số worker)
+
+# SITES - Các site crawl trong một lần chạy (phone/sites.py), ghi đè bằng: scrapy crawl phone -a sites=...
+CRAWL_SITES = ['thegioididong']  # Hoặc ['thegioididong', 'cellphones', 'fptshop']
+
+# MONGODB - Database/collection của từng site khai báo trong phone/sites.py
+MONGO_DATABASE = 'thegioididong'  # Mặc định cho URL không thuộc site nào
+MONGO_COLLECTION = 'details_raw'
+MONGO_QUEUE_SIZE = 1000  # Số item tối đa chờ ghi; queue đầy thì process_item chờ (backpressure cho Scrapy)
+MONGO_WRITER_THREADS = 4  # Số writer thread ghi bulk song song (mỗi writer dùng một connection của pool); với AsyncMongoDBPipeline là số batch ghi song song
+MONGO_BATCH_SIZE_MIN = 10  # Batch size tự điều chỉnh theo thời gian bulk_write, trong khoảng MIN..MAX
+MONGO_BATCH_SIZE_MAX = 1000
+MONGO_BATCH_TARGET_MS = 500  # Thời gian bulk_write mong muốn cho một batch (ms)
+MONGO_HASH_CACHE_SIZE = 100000  # Số URL nhớ content_hash: item không đổi nội dung chỉ cập nhật crawled_at
+
+# PRICE HISTORY - Giá/khuyến mãi (theo màu) ghi thành quan sát trong time-series collection,
+# document sản phẩm chỉ giữ phần tĩnh nên đổi giá không phải ghi lại cả document.
+# Bật là đổi schema của details_raw (giá/khuyến mãi chuyển sang price_history), nên mặc định tắt.
+PRICE_HISTORY = False
+PRICE_HISTORY_COLLECTION = 'price_history'  # Cùng database với sản phẩm của site
+PRICE_HISTORY_GRANULARITY = 'hours'  # Granularity của time-series (MongoDB >= 5.0), hợp với snapshot hằng ngày
+
+# SEEN URL INDEX - URL đã có trong DB, mở khi spider bắt đầu crawl
+SEEN_URLS_INDEX = 'phone.seen_urls.BloomSeenUrlIndex'  # Hoặc 'phone.seen_urls.FingerprintSeenUrlIndex' (chính xác, 8 byte/URL)
+SEEN_URLS_SNAPSHOT = 'seen_urls_{db}.bin'  # Snapshot fingerprint trên đĩa, None để tắt
+SEEN_URLS_BLOOM_PATH = 'seen_urls_{db}.bloom'  # File bloom filter (mmap)
+SEEN_URLS_BLOOM_CAPACITY = 5000000  # Số URL dự kiến
+SEEN_URLS_BLOOM_ERROR_RATE = 0.001  # Tỉ lệ false-positive
+SEEN_URLS_CONFIRM_POSITIVES = True  # Xác nhận lại các URL filter báo "đã có" bằng query MongoDB theo batch
+SEEN_URLS_SNAPSHOT_MAX_AGE = 24 * 3600  # Quét lại collection nếu snapshot cũ hơn (giây), 0: luôn dùng snapshot
+SEEN_URLS_REFRESH = False  # True: bỏ qua snapshot, quét lại collection
+SEEN_URLS_BATCH_SIZE = 10000  # Batch size của cursor khi quét collection
+
+# INCREMENTAL RECRAWL - Crawl lại sản phẩm đã thay đổi (<lastmod> mới hơn crawled_at) hoặc quá hạn
+INCREMENTAL_RECRAWL = False  # True: dùng LastCrawledIndex và ghi đè document cũ ($set) thay vì chỉ insert URL mới
+RECRAWL_MAX_AGE_DAYS = 7  # Crawl lại URL có crawled_at cũ hơn số ngày này, 0: chỉ dựa vào <lastmod>
+LAST_CRAWLED_SNAPSHOT = 'last_crawled_{db}.bin'  # Snapshot fingerprint + crawled_at trên đĩa, None để tắt
+
+# ARTIFACT CAPTURE - Lưu HTML/JSON trung gian để debug trích xuất (phone/capture.py), mặc định tắt
+CAPTURE_MODE = 'off'  # 'off' | 'sample' (N trang đầu + trang lỗi) | 'failures' (chỉ trang lỗi)
+CAPTURE_DIR = 'captures'  # Thư mục lưu: captures/<hash[:2]>/<hash(url)>/
+CAPTURE_SAMPLE_SIZE = 20  # Số trang thành công được lưu ở mode 'sample' (mỗi parse process đếm riêng)
+CAPTURE_MAX_ARTIFACT_KB = 5120  # Cắt mỗi artifact ở kích thước này
+CAPTURE_MAX_TOTAL_MB = 500  # Ngừng lưu khi tổng dung lượng đã ghi vượt ngưỡng (mỗi process)
+CAPTURE_QUEUE_SIZE = 100  # Queue ghi đầy thì bỏ artifact thay vì chặn callback
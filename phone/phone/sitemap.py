@@ -0,0 +1,107 @@
+# sitemap.py - Đọc sitemap dạng streaming bằng lxml iterparse
+import gzip
+import zlib
+from io import BytesIO
+
+import brotli
+from lxml import etree
+from scrapy.utils.gz import gunzip
+
+SITEMAP_KINDS = {
+    'sitemapindex': 'sitemap',  # Sitemap index -> các sitemap con
+    'urlset': 'url',            # Urlset -> các URL trang
+}
+
+
+class SitemapFormatError(ValueError):
+    """Root của sitemap không phải sitemapindex hay urlset"""
+
+
+def _localname(tag):
+    # Bỏ namespace: '{http://www.sitemaps.org/schemas/sitemap/0.9}loc' -> 'loc'
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def looks_like_xml(body):
+    return body.lstrip()[:1] == b'<'
+
+
+def decompress_body(body, content_encoding=''):
+    """
+    Giải nén body sitemap nếu nó chưa phải XML (vd: fptshop trả về body vẫn còn nén
+    dù HttpCompressionMiddleware đã xử lý). Thử theo Content-Encoding trước, sau đó
+    theo magic number gzip, cuối cùng là zlib/deflate.
+    Trả về body gốc nếu không giải nén được.
+    """
+    if looks_like_xml(body):
+        return body
+
+    attempts = []
+    if 'br' in content_encoding:
+        attempts.append(brotli.decompress)
+    if body[:2] == b'\x1f\x8b':
+        attempts.extend([gunzip, gzip.decompress])
+    attempts.extend([zlib.decompress, lambda data: zlib.decompress(data, -zlib.MAX_WBITS)])
+
+    for decompress in attempts:
+        try:
+            decompressed = decompress(body)
+        except Exception:
+            continue
+        if looks_like_xml(decompressed):
+            return decompressed
+    return body
+
+
+def iter_sitemap(body):
+    """
+    Duyệt sitemap theo kiểu streaming, yield từng (kind, loc, lastmod):
+      - kind = 'sitemap' với sitemapindex, 'url' với urlset
+      - lastmod = None nếu không có
+    Mỗi phần tử <url>/<sitemap> được xoá ngay sau khi đọc nên bộ nhớ không tăng theo
+    kích thước sitemap.
+
+    Raises:
+        SitemapFormatError: root không phải sitemapindex/urlset
+    """
+    context = etree.iterparse(
+        BytesIO(body),
+        events=('start', 'end'),
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+    )
+
+    kind = None
+    loc = lastmod = None
+    for event, elem in context:
+        name = _localname(elem.tag)
+
+        if kind is None:
+            # Sự kiện đầu tiên luôn là 'start' của root
+            kind = SITEMAP_KINDS.get(name)
+            if kind is None:
+                raise SitemapFormatError(f"Unknown sitemap format: {name or elem.tag!r}")
+            continue
+
+        if event == 'start':
+            continue
+
+        if name in ('loc', 'lastmod'):
+            # Chỉ lấy con trực tiếp của <url>/<sitemap>, bỏ qua <image:loc>, <video:loc>...
+            if _localname(elem.getparent().tag) == kind:
+                value = (elem.text or '').strip() or None
+                if name == 'loc':
+                    loc = value
+                else:
+                    lastmod = value
+        elif name == kind:
+            if loc:
+                yield kind, loc, lastmod
+            loc = lastmod = None
+
+            # Giải phóng phần tử đã xử lý và các anh em phía trước
+            elem.clear()
+            parent = elem.getparent()
+            while elem.getprevious() is not None:
+                del parent[0]
@@ -0,0 +1,123 @@
+# sites.py - Registry các site được crawl: sitemap, referer, callback, renderer, database
+from urllib.parse import urlsplit
+
+from phone.url_rules import get_rules
+
+
+class Site(object):
+    """
+    Cấu hình crawl của một site.
+
+    Args:
+        name (str): tên site, cũng là key của luật URL trong phone/url_rules.py
+        domains (list): các domain thuộc site (gồm cả subdomain)
+        sitemaps (list): sitemap gốc để bắt đầu crawl
+        referer (str): header Referer cho mọi request của site
+        callback (str): tên method của spider parse trang sản phẩm
+        render_task (str): task của client_crawl/render_worker.js, None nếu không cần render
+        database (str): database MongoDB lưu sản phẩm
+        collection (str): collection MongoDB lưu sản phẩm
+        download_slot (dict): cấu hình slot download riêng (concurrency, delay) cho các host của site
+    """
+
+    def __init__(self, name, domains, sitemaps, referer, callback, render_task=None,
+                 database=None, collection='details_raw', download_slot=None):
+        self.name = name
+        self.domains = domains
+        self.sitemaps = sitemaps
+        self.referer = referer
+        self.callback = callback
+        self.render_task = render_task
+        self.database = database or name
+        self.collection = collection
+        self.download_slot = download_slot or {}
+
+    @property
+    def rules(self):
+        return get_rules(self.name)
+
+    @property
+    def hosts(self):
+        """Các host xuất hiện trong sitemap/URL sản phẩm của site"""
+        hosts = {urlsplit(url).hostname for url in self.sitemaps + [self.referer]}
+        return sorted(host for host in hosts if host)
+
+    def owns(self, host):
+        return any(host == domain or host.endswith('.' + domain) for domain in self.domains)
+
+    def __repr__(self):
+        return f"Site({self.name!r})"
+
+
+SITES = {
+    'thegioididong': Site(
+        'thegioididong',
+        domains=['thegioididong.com'],
+        sitemaps=[
+            # 'https://www.thegioididong.com/newsitemap/sitemap-cate',
+            'https://www.thegioididong.com/newsitemap/sitemap-product',
+            # 'https://www.thegioididong.com/newsitemap/sitemap-news'
+        ],
+        referer='https://www.thegioididong.com/',
+        callback='parse_product_info',
+        render_task='thegioididong',
+        download_slot={'concurrency': 16, 'delay': 1},
+    ),
+    'cellphones': Site(
+        'cellphones',
+        domains=['cellphones.com.vn'],
+        sitemaps=['https://cellphones.com.vn/sitemap/sitemap_index.xml'],
+        referer='https://cellphones.com.vn/',
+        callback='_parse_product_info_cellphones',
+        render_task='cellphones_specs',
+        download_slot={'concurrency': 16, 'delay': 1},
+    ),
+    'fptshop': Site(
+        'fptshop',
+        domains=['fptshop.com.vn'],
+        sitemaps=['https://fptshop.com.vn/sitemap.xml'],
+        referer='https://fptshop.com.vn/',
+        callback='_parse_product_info_fptshop',
+        download_slot={'concurrency': 16, 'delay': 1},
+    ),
+}
+
+
+def get_site(name):
+    try:
+        return SITES[name]
+    except KeyError:
+        raise ValueError(f"Unknown site {name!r} (expected one of {list(SITES)})")
+
+
+def get_sites(names):
+    """Danh sách Site từ list tên hoặc chuỗi 'a,b,c'"""
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    return [get_site(name) for name in names]
+
+
+def site_for_url(url):
+    """Site sở hữu URL theo domain, None nếu không thuộc site nào"""
+    host = (urlsplit(url).hostname or '').lower()
+    for site in SITES.values():
+        if site.owns(host):
+            return site
+    return None
+
+
+def target_collection(settings, site=None):
+    """(database, collection) chứa sản phẩm của site, mặc định theo settings MONGO_*"""
+    if site is not None:
+        return site.database, site.collection
+    return settings.get('MONGO_DATABASE', 'thegioididong'), settings.get('MONGO_COLLECTION', 'details_raw')
+
+
+def download_slots(sites=None):
+    """Giá trị cho setting DOWNLOAD_SLOTS: mỗi host của site có slot riêng"""
+    slots = {}
+    for site in (sites or SITES.values()):
+        if site.download_slot:
+            for host in site.hosts:
+                slots[host] = dict(site.download_slot)
+    return slots
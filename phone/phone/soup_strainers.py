@@ -0,0 +1,84 @@
+# soup_strainers.py - Chỉ build cây BeautifulSoup cho các container mà extractor của site cần
+from bs4 import SoupStrainer
+
+# Các container (tag, attribute, giá trị) chứa mọi thứ extractor bs4 của site đọc tới.
+# Với 'class', giá trị là một class trong danh sách class của tag (giống find(class_=...)).
+SECTION_CONTAINERS = {
+    'thegioididong': [
+        ('section', 'class', 'detail'),
+        ('div', 'class', 'box-specifi'),
+        ('ul', 'class', 'policy__list'),
+        ('div', 'id', 'popup-baohanh-content'),
+        # Giá & khuyến mãi tĩnh (JobSpider.extract_price_static), có thể nằm ngoài section.detail
+        ('div', 'class', 'price-one'),
+        ('div', 'class', 'bs_title'),
+        ('div', 'id', 'location-detail'),
+        ('div', 'class', 'block__promo'),
+        ('p', 'class', 'loyalty__main__point'),
+        ('div', 'class', 'scrolling_inner'),
+    ],
+    'cellphones': [
+        ('div', 'class', 'box-detail-product'),
+        ('script', 'type', 'application/ld+json'),  # Breadcrumb JSON-LD
+    ],
+    'fptshop': [
+        ('div', 'id', 'ThongTinSanPham'),
+        ('nav', 'class', 'Breadcrumb'),
+        # Thông số đọc từ HTML thô (flight payload), không cần trong soup
+    ],
+}
+
+
+class SectionStrainer(SoupStrainer):
+    """
+    `parse_only` cho BeautifulSoup: một tag ở ngoài mọi container chỉ được tạo nếu khớp một
+    container, khi đó cả subtree của nó được giữ nguyên. Phần còn lại của trang (menu, bài
+    viết, script...) không bao giờ thành Tag/NavigableString nên parse nhanh và tốn ít memory hơn.
+
+    SoupStrainer chỉ AND các điều kiện name/attrs, nên điều kiện OR giữa các container
+    được kiểm tra trực tiếp trong hook của builder.
+    """
+
+    def __init__(self, containers):
+        self.containers = {}
+        for tag, attr, value in containers:
+            self.containers.setdefault(tag, []).append((attr, value))
+        # Rule theo tên tag để BeautifulSoup không coi strainer là "nhận mọi thứ"
+        super().__init__(name=sorted(self.containers))
+
+    def _admits(self, name, attrs):
+        for attr, value in self.containers.get(name, ()):
+            actual = attrs.get(attr) if attrs else None
+            if actual is None:
+                continue
+            if attr == 'class':
+                classes = actual.split() if isinstance(actual, str) else actual
+                if value in classes:
+                    return True
+            elif actual == value:
+                return True
+        return False
+
+    # beautifulsoup4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self._admits(name, attrs)
+
+    def allow_string_creation(self, string):
+        return False
+
+    # beautifulsoup4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        if isinstance(markup_name, str) and self._admits(markup_name, markup_attrs):
+            return markup_name
+        return None
+
+
+_strainers = {}
+
+
+def section_strainer(site):
+    """SectionStrainer của site (tạo một lần), None nếu site chưa khai báo container"""
+    if site not in _strainers:
+        containers = SECTION_CONTAINERS.get(site)
+        _strainers[site] = SectionStrainer(containers) if containers else None
+    return _strainers[site]
@@ -1,56 +1,39 @@
 import traceback
-import pymongo
-import os
 from time import gmtime, strftime
 import scrapy
+from scrapy import signals
 from bs4 import BeautifulSoup, Tag
-from decouple import config
 from scrapy import Request
-from scrapy.spiders.sitemap import gzip_magic_number
-from scrapy.utils.gz import gunzip
-import gzip
-import zlib
-import brotli
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.misc import load_object
+from twisted.internet import threads
 import logging
 import json
 import re
-import xmltodict
-from concurrent.futures import ThreadPoolExecutor
-
-import sys
-
-import subprocess
-import json
-
-
-# Bắt buộc dùng demjson3 để parse JS-style object literals
+from urllib.parse import urljoin
+from lxml import etree
+
+from phone.capture import ArtifactCapture
+from phone.extraction import ExtractionExecutor
+from phone.flight import FlightPayload, ReferenceResolver
+from phone import lxml_extractors as lx
+from phone.parse_stage import ProcessParseStage
+from phone.render_pool import RenderError, RenderWorkerPool
+from phone.seen_urls import LastCrawledIndex
+from phone.soup_strainers import section_strainer
+from phone.variants import VariantAggregator
+from phone.sitemap import SitemapFormatError, decompress_body, iter_sitemap
+from phone.sites import SITES, download_slots, get_sites, site_for_url
+
+
+# demjson3 chỉ cần cho đường parse cũ của FPT Shop (fallback khi không decode được flight payload)
 try:
     import demjson3
 except ImportError:
-    sys.exit(
-        "⚠️ [LỖI] Cần cài `demjson3` để parse JS literals linh hoạt. Vui lòng chạy `pip install demjson3` và thử lại.`"
-    )
+    demjson3 = None
 
-# MongoDB setup
-url = config('url')
-client = pymongo.MongoClient(url, serverSelectionTimeoutMS=5000, connectTimeoutMS=5000)
 logging.getLogger("pymongo").setLevel(logging.WARNING)
 
-try:
-    print(client.admin.command('ping'))
-    print("Ping thành công, đã kết nối đến primary.")
-except Exception as e:
-    print("LỖI khi ping:", e)
-
-db = client["thegioididong"]
-# db = client["cellphones"]
-# db = client["fptshop"]
-
-# Lấy URLs đã có trong DB
-current_links = list(db['details_raw'].find({}, {"url": 1}))  
-current_set = set([item['url'] for item in current_links])
-print('------Num in DB---------', len(current_links))
-
 def cleanText(p_texts):
     txt = ''
     for p_t in p_texts:
@@ -59,25 +42,16 @@ def cleanText(p_texts):
             txt += "{}\n".format(clean_p_t)
     return txt
 
-def contains_brand(url: str) -> bool:
-    brands = [
-        "iphone", "samsung", "xiaomi", "oppo", "realme", "nothing", "infinix", "vivo",
-        "tecno", "sony", "itel", "nubia", "masstel", "nokia", "oneplus", "tcl", "inoi", "benco", "asus"
-    ]
-    url_lower = url.lower()
-    return any(brand in url_lower for brand in brands)
-
 REMOVE_ATTRIBUTES = ['style', 'data-src', 'src', 'href', 'aria-describedby', 'data-wpel-link', 'rel', 'target', 'id', 'class', 'aria-level', 'data-mce-style', 'data-mce-href']
 
+# Số URL sản phẩm gom lại trước mỗi lần kiểm tra seen-URL index khi đọc sitemap
+SITEMAP_BATCH_SIZE = 1000
+
 class JobSpider(scrapy.Spider):
     name = 'phone'
-    start_urls = [
-        # 'https://www.thegioididong.com/newsitemap/sitemap-cate',
-        'https://www.thegioididong.com/newsitemap/sitemap-product', 
-        # 'https://www.thegioididong.com/newsitemap/sitemap-news'
-        # 'https://cellphones.com.vn/sitemap/sitemap_index.xml'
-        # 'https://fptshop.com.vn/sitemap.xml'
-    ]
+    # Các site crawl trong lần chạy này (xem phone/sites.py), vd: scrapy crawl phone -a sites=thegioididong,cellphones
+    # Mặc định theo setting CRAWL_SITES
+    sites = None
 
     custom_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36',
@@ -93,7 +67,9 @@ class JobSpider(scrapy.Spider):
         # CONCURRENT SETTINGS - Tăng hiệu suất đa luồng
         'CONCURRENT_REQUESTS': 32,  # Tăng từ 16 (mặc định) lên 32
         'CONCURRENT_REQUESTS_PER_DOMAIN': 16,  # Giới hạn cho mỗi domain
-        'CONCURRENT_REQUESTS_PER_IP': 8,  # Giới hạn cho mỗi IP
+        'CONCURRENT_REQUESTS_PER_IP': 0,  # 0: slot download theo domain, mỗi site một slot riêng (DOWNLOAD_SLOTS)
+        'DOWNLOAD_SLOTS': download_slots(),
+        'SCHEDULER_PRIORITY_QUEUE': 'scrapy.pqueues.DownloaderAwarePriorityQueue',  # Xen kẽ request giữa các site
         
         # DOWNLOAD SETTINGS
         'DOWNLOAD_DELAY': 1,  # Giảm delay từ 2 xuống 1
@@ -112,9 +88,6 @@ class JobSpider(scrapy.Spider):
         'AUTOTHROTTLE_TARGET_CONCURRENCY': 2.0,
         'AUTOTHROTTLE_DEBUG': True,
         
-        # REACTOR SETTINGS - Sử dụng SelectReactor để tránh conflicts
-        'TWISTED_REACTOR': 'twisted.internet.selectreactor.SelectReactor',
-        
         # MEMORY USAGE
         'MEMUSAGE_ENABLED': True,
         'MEMUSAGE_LIMIT_MB': 2048,
@@ -126,7 +99,129 @@ class JobSpider(scrapy.Spider):
         'LOG_LEVEL': 'INFO',
     }
 
-    def parse(self, response):
+    # Hàm trích xuất các phần tĩnh của trang sản phẩm theo backend (EXTRACTION_BACKEND) và site
+    SECTION_EXTRACTORS = {
+        'lxml': {
+            'thegioididong': '_extract_sections_thegioididong_lxml',
+            'cellphones': '_extract_sections_cellphones_lxml',
+            'fptshop': '_extract_sections_fptshop_lxml',
+        },
+        'bs4': {
+            'thegioididong': '_extract_sections_thegioididong',
+            'cellphones': '_extract_sections_cellphones',
+            'fptshop': '_extract_sections_fptshop',
+        },
+    }
+
+    extraction_backend = 'lxml'
+    parse_only_sections = True  # bs4: chỉ build cây cho các container cần thiết (phone/soup_strainers.py)
+    parse_stage = None
+    capture = None  # ArtifactCapture, None/off = không ghi artifact debug
+    price_static_first = True  # Đọc giá/khuyến mãi từ HTML tĩnh trước khi render (PRICE_STATIC_FIRST)
+    variant_requests_enabled = True  # Giá các màu lấy bằng Request thường (VARIANT_REQUESTS)
+    variant_render_task = 'thegioididong_price'  # Task render giá của một trang màu (client_crawl/render_worker.js)
+    variants = None  # VariantAggregator
+    crawl_sites = ()
+    seen_urls = {}  # site -> SeenUrlIndex
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        return spider
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        self.crawl_sites = get_sites(self.sites or self.settings.getlist('CRAWL_SITES', ['thegioididong']))
+        print(f"🌐 Crawling sites: {', '.join(site.name for site in self.crawl_sites)}")
+
+        # Chỉ mở index URL đã crawl khi thực sự bắt đầu crawl (không phải lúc import module)
+        self.seen_urls = {site.name: self.open_seen_urls(site) for site in self.crawl_sites}
+        for site in self.crawl_sites:
+            for url in site.sitemaps:
+                yield Request(url, callback=self.parse, dont_filter=True, headers={'Referer': site.referer})
+
+    def open_seen_urls(self, site):
+        if self.settings.getbool('INCREMENTAL_RECRAWL'):
+            # Cần thời điểm crawl của từng URL để so sánh với <lastmod>
+            index_cls = LastCrawledIndex
+        else:
+            index_cls = load_object(self.settings.get('SEEN_URLS_INDEX', 'phone.seen_urls.FingerprintSeenUrlIndex'))
+        index = index_cls.from_crawler(self.crawler, site)
+        index.open()
+        return index
+
+    def mark_stored(self, urls, site=None):
+        """Được pipeline gọi với các URL vừa được lưu (insert, hoặc update khi INCREMENTAL_RECRAWL)"""
+        if site is not None:
+            index = self.seen_urls.get(site.name)
+            if index is not None:
+                index.add_many(urls)
+            return
+        for url in urls:
+            url_site = site_for_url(url)
+            index = self.seen_urls.get(url_site.name) if url_site else None
+            if index is not None:
+                index.add(url)
+
+    @classmethod
+    def extraction_options(cls, settings):
+        """Các attribute của spider quyết định cách parse trang (cũng được gửi sang worker của parse stage)"""
+        backend = settings.get('EXTRACTION_BACKEND', 'lxml')
+        if backend not in cls.SECTION_EXTRACTORS:
+            raise ValueError(f"Unknown EXTRACTION_BACKEND: {backend!r} (expected one of {list(cls.SECTION_EXTRACTORS)})")
+        return {
+            'extraction_backend': backend,
+            'parse_only_sections': settings.getbool('EXTRACTION_PARSE_ONLY', True),
+        }
+
+    def spider_opened(self, spider):
+        """Khởi động pool worker render (Node.js/Playwright) và executor trích xuất dùng chung cho cả spider"""
+        self.extraction = ExtractionExecutor.from_settings(self.settings)
+        for name, value in self.extraction_options(self.settings).items():
+            setattr(self, name, value)
+        self.capture = ArtifactCapture.from_settings(self.settings)
+        self.price_static_first = self.settings.getbool('PRICE_STATIC_FIRST', True)
+        self.variant_requests_enabled = self.settings.getbool('VARIANT_REQUESTS', True)
+        self.variants = VariantAggregator()
+        self.parse_stage = ProcessParseStage.from_crawler(self.crawler, self.extraction)
+        self.render_pool = RenderWorkerPool.from_settings(self.settings)
+        self.render_pool.start()
+
+    def spider_closed(self, spider):
+        if self.variants:
+            # Spider dừng sớm (CLOSESPIDER_*) khi còn màu đang tải: các item này không được lưu
+            incomplete = self.variants.drain()
+            print(f"⚠️ {len(incomplete)} products closed before all color variants were fetched")
+            self.crawler.stats.set_value('variants/incomplete', len(incomplete))
+
+        render_pool = getattr(self, 'render_pool', None)
+        if render_pool:
+            render_pool.close()
+            render_pool.export_stats(self.crawler.stats)
+            render_pool.print_stats()
+
+        if self.parse_stage is not None:
+            self.parse_stage.close()
+
+        for index in self.seen_urls.values():
+            index.close()
+
+        if self.capture is not None:
+            self.capture.close()
+            self.capture.export_stats(self.crawler.stats)
+
+        extraction = getattr(self, 'extraction', None)
+        if extraction:
+            extraction.export_stats(self.crawler.stats)
+            extraction.print_stats()
+            extraction.shutdown()
+
+    async def parse(self, response):
         if response.status == 403:
             self.logger.error(f"Access forbidden for URL: {response.url}")
             return
@@ -134,196 +229,132 @@ class JobSpider(scrapy.Spider):
         print('---response.url:', response.url)
         print('---response.status:', response.status)
 
-        # response = requests.get(url, headers={'Accept-Encoding': 'gzip, deflate'}) # Sử dụng requests để lấy nội dung cho fptshop
-        # print('---response.status_code:', response.status_code)
-        # response.raise_for_status()
-
-        if 'https://fptshop.com.vn/sitemap.xml' in self.start_urls:
-            body = response.body
-            headers = response.headers.get
-
-            # 1) Xem Content-Encoding header
-            encoding = headers(b'Content-Encoding', b'').decode().lower()
-            self.logger.info(f"Content-Encoding: {encoding}")
-
-            # 2) Giải nén theo header
-            try:
-                if 'br' in encoding:
-                    body = brotli.decompress(body)
-                    self.logger.info("✅ Brotli decompressed")
-                elif gzip_magic_number(response):
-                    try:
-                        body = gunzip(body)
-                    except Exception:
-                        body = gzip.decompress(body)
-                    self.logger.info("✅ GZIP decompressed via gunzip/gzip.decompress")
-                # thử deflate/raw zlib (nếu vẫn không phải XML)
-                if not body.strip().startswith(b'<'):
-                    try:
-                        body = zlib.decompress(body)
-                        self.logger.info("✅ Zlib/Deflate decompressed")
-                    except Exception:
-                        pass
-            except Exception as e:
-                self.logger.warning(f"Decompression step failed: {e}")
-
-            # 3) Chuyển sang text & parse XML
-            try:
-                text = body.decode('utf-8', errors='ignore')
-                obj = xmltodict.parse(text)
-                json_data = json.loads(json.dumps(obj))
-            except Exception as e:
-                self.logger.error(f"❌ XML parse error: {e}")
-                self.logger.debug(body[:200])
-                self.logger.debug(traceback.format_exc())
-                return
-        else:
-            try:
-                obj = xmltodict.parse(response.body)
-                json_data = json.loads(json.dumps(obj))
-                print('---json_data keys:', list(json_data.keys()))
-                self.logger.info(f"Parsed XML data successfully from {response.url}")
-            except Exception as e:
-                self.logger.error(f"❌ XML parse error: {e}")
-                self.logger.debug(response.body[:200])
-                self.logger.debug(traceback.format_exc())
-                return
+        # Một số site (vd: fptshop) trả về body vẫn còn nén -> giải nén nếu chưa phải XML
+        encoding = response.headers.get(b'Content-Encoding', b'').decode().lower()
+        body = decompress_body(response.body, encoding)
+
+        # Luật chọn URL, referer, callback theo site của sitemap (xem phone/sites.py)
+        site = site_for_url(response.url)
+        if site is None or site.name not in self.seen_urls:
+            self.logger.warning(f"⚠️ Sitemap does not belong to a crawled site: {response.url}")
+            return
+        rules = site.rules
+
+        # Đọc sitemap dạng streaming: từng <sitemap>/<url> được xử lý rồi giải phóng ngay
+        pending = []
+        batch_id = 0
         try:
-            # Kiểm tra xem đây là sitemapindex hay urlset
-            if 'sitemapindex' in json_data:
-                # Đây là sitemap index - cần crawl các sitemap con
-                print("📋 Found sitemapindex - crawling sub-sitemaps...")
-                sitemap_list = json_data['sitemapindex'].get('sitemap', [])
-                
-                if isinstance(sitemap_list, dict):
-                    sitemap_list = [sitemap_list]
-                
-                for sitemap_item in sitemap_list:
-                    sitemap_url = sitemap_item.get('loc')
-                    print("sitemap_url", sitemap_url)
-                    if sitemap_url: # fptshop: 'products' in sitemap_url and 'dien-thoai' in sitemap_url:
-                        yield Request(
-                            url=sitemap_url,
-                            callback=self.parse,
-                            # dont_filter=True,
-                            headers={'Referer': 'https://www.thegioididong.com/'},
-                            # headers={'Referer': 'https://fptshop.com.vn/'},
-                            # headers={'Referer': 'https://cellphones.com.vn/'},
-                            priority=1  # Priority cao cho sitemap
-                        )
-                        
-            elif 'urlset' in json_data:
-                # Đây là urlset chứa các URL bài viết
-                print("📄 Found urlset - extracting article URLs...")
-                url_list = json_data['urlset'].get('url', [])
-                
-                if isinstance(url_list, dict):
-                    url_list = [url_list]
-                
-                urls = []
-                for url_item in url_list:
-                    if isinstance(url_item, dict):
-                        loc = url_item.get('loc')
-                        if loc:
-                            urls.append(loc)
-                    elif isinstance(url_item, str):
-                        urls.append(url_item)
-                
-                new_links = [url for url in urls if url not in current_set]
-                print(f'📊 Total URLs: {len(urls)}, New URLs: {len(new_links)}')
-                
-                # Chia URLs thành batches để xử lý song song
-                batch_size = 50
-                for i in range(0, len(new_links), batch_size):
-                    batch = new_links[i:i + batch_size]
-                    for link in batch:
-                        if 'http' in link and 'dtdd' in link and 'sac' not in link and 'phu-kien' not in link: # thegioididong (dtdd) # cellphones: if dien-thoai is not link, To should be check keywords such as iPhone, samsung, xiaomi, oppo, realme, nothing, infinix, vivo, tecno, sony, itel, nubia, masstel, nokia, oneplus, tcl, inoi, benco, asus
-                            yield Request(
-                                url=link,
-                                callback=self.parse_product_info, # thegioididong (self.parse_product_info)
-                                # dont_filter=True,
-                                # headers={'Referer': 'https://cellphones.com.vn/'},
-                                # headers={'Referer': 'https://fptshop.com.vn/'},
-                                headers={'Referer': 'https://www.thegioididong.com/'},
-                                priority=0,  # Priority thấp hơn sitemap
-                                meta={'batch_id': i // batch_size}  # Để tracking
-                            )
-                        # else:
-                        #     if 'http' in link and 'dien-thoai' not in link and 'sac' not in link and 'phu-kien' not in link and contains_brand(link):
-                        #         yield Request(
-                        #         url=link,
-                        #         callback=self.parse_product_info, # thegioididong (self.parse_product_info)
-                        #         # dont_filter=True,
-                        #         headers={'Referer': 'https://cellphones.com.vn/'}, # https://www.thegioididong.com/
-                        #         # headers={'Referer': 'https://fptshop.com.vn/'},
-                        #         # headers={'Referer': 'https://www.thegioididong.com/'},
-                        #         priority=0,  # Priority thấp hơn sitemap
-                        #         meta={'batch_id': i // batch_size}  # Để tracking
-                        #     )
-            else:
-                print("⚠️ Unknown sitemap format:", list(json_data.keys()))
-                
+            for kind, loc, lastmod in iter_sitemap(body):
+                if kind == 'sitemap':
+                    # Đây là sitemap index - cần crawl các sitemap con
+                    if not rules.follow_sitemap(loc):
+                        continue
+                    print("sitemap_url", loc)
+                    yield Request(
+                        url=loc,
+                        callback=self.parse,
+                        # dont_filter=True,
+                        headers={'Referer': site.referer},
+                        priority=1  # Priority cao cho sitemap
+                    )
+                    continue
+
+                # Đây là urlset chứa các URL sản phẩm, phân loại theo batch
+                pending.append((loc, lastmod))
+                if len(pending) >= SITEMAP_BATCH_SIZE:
+                    for request in await self._product_requests(site, rules.select(pending), batch_id):
+                        yield request
+                    pending = []
+                    batch_id += 1
+
+            for request in await self._product_requests(site, rules.select(pending), batch_id):
+                yield request
+        except (etree.XMLSyntaxError, SitemapFormatError) as e:
+            self.logger.error(f"❌ XML parse error: {e}")
+            self.logger.debug(body[:200])
+            self.logger.debug(traceback.format_exc())
         except Exception as e:
             print(f'❌ Error parsing sitemap {response.url}: {e}')
             print('Response body preview:', response.body[:500])
             print(traceback.format_exc())
 
-    def parse_product_info(self, response):
+    async def _product_requests(self, site, entries, batch_id):
+        """
+        Lọc URL đã crawl theo batch rồi tạo Request cho các URL sản phẩm mới (hoặc cần crawl lại).
+        Index có query MongoDB (vd: bloom filter xác nhận positive) được lọc trên thread pool
+        để không block reactor.
+        """
+        if not entries:
+            return []
+        index = self.seen_urls[site.name]
+        if index.blocking:
+            new_links = await maybe_deferred_to_future(threads.deferToThread(index.filter_due, entries))
+        else:
+            new_links = index.filter_due(entries)
+        print(f'📊 [{site.name}] Batch {batch_id} - URLs: {len(entries)}, Due URLs: {len(new_links)}')
+
+        callback = getattr(self, site.callback)
+        return [
+            Request(
+                url=link,
+                callback=callback,
+                # dont_filter=True,
+                headers={'Referer': site.referer},
+                priority=0,  # Priority thấp hơn sitemap
+                meta={'batch_id': batch_id}  # Để tracking
+            )
+            for link in new_links
+        ]
+
+    async def parse_product_info(self, response):
         try:
             print(f'📄 Parsing product: {response.url}')
             url = response.request.url
-            soup = BeautifulSoup(response.text, "lxml")
-
-            # --- Khởi tạo các biến với giá trị mặc định ---
-            product_data = {}
 
-            # --- Tìm các container chính ---
-            detail_container = soup.find("section", class_="detail")
-            if not detail_container:
-                print(f"⚠️ Critical: Main 'detail' container not found for {url}. Aborting.")
+            # --- Trích xuất các phần tĩnh từ HTML (in-process hoặc qua process pool) ---
+            sections = await self.extract_page_sections('thegioididong', response)
+            if sections is None:
                 return
 
-            # Sử dụng ThreadPoolExecutor để xử lý song song các phần khác nhau
-            with ThreadPoolExecutor(max_workers=8) as executor:
-                # Submit các task để chạy song song
-                future_basic_info = executor.submit(self.extract_basic_info, detail_container, url)
-                future_options = executor.submit(self.extract_options, detail_container, url)
-                future_price_and_promotions = executor.submit(self.extract_price_and_promotions, url)
-                future_specifications = executor.submit(self.extract_specifications, soup, url)
-                future_policies = executor.submit(self.extract_policies, soup, url)
-
-                # Collect results
-                basic_info = future_basic_info.result()
-                options_info = future_options.result()
-                price_and_promotions = future_price_and_promotions.result()
-                specifications = future_specifications.result()
-                policies = future_policies.result()
-
-                # Merge all data
-                product_data.update(basic_info)
-                product_data.update(options_info)
-                product_data["price_and_promotions"] = price_and_promotions
-                product_data['specifications'] = specifications
-                product_data['policies'] = policies
+            # Giá/khuyến mãi:
+            # - nhiều màu: giá từng màu lấy bằng Request thường (parse_variant), item chờ trong aggregator
+            # - còn lại: đọc từ HTML tĩnh nếu đủ, ngược lại render qua Node.js
+            #   (reactor tiếp tục chạy trong lúc chờ)
+            price_static = sections['price_static']
+            fan_out = self.wants_variant_requests(price_static, url)
+            price_and_promotions = None
+            if not fan_out:
+                price_and_promotions = self.price_and_promotions_from_static(price_static, url)
+                if price_and_promotions is None:
+                    price_and_promotions = await maybe_deferred_to_future(self.extract_price_and_promotions(url))
+
+            # Merge all data
+            product_data = {}
+            product_data.update(sections['basic_info'])
+            product_data.update(sections['options'])
+            product_data["price_and_promotions"] = price_and_promotions
+            product_data['specifications'] = sections['specifications']
+            product_data['policies'] = sections['policies']
 
             if not product_data.get('product_name'):
                 print(f"⚠️ No product name found for: {url}")
-                yield {
-                    "url": url,
-                    "product_data": product_data,
-                    "crawled_at": strftime("%Y-%m-%d %H:%M:%S", gmtime()),
-                    "status": "no_name_found"
-                }
-                return
+                status = "no_name_found"
+            else:
+                print(f"✅ Successfully parsed: {product_data.get('product_name', 'Unknown')}")
+                status = "success"
 
-            print(f"✅ Successfully parsed: {product_data.get('product_name', 'Unknown')}")
-            
-            yield {
+            item = {
                 "url": url,
                 "product_data": product_data,
                 "crawled_at": strftime("%Y-%m-%d %H:%M:%S", gmtime()),
-                "status": "success"
+                "status": status
             }
+            if not fan_out:
+                yield item
+                return
+
+            for request_or_item in self.variant_requests(url, item, price_static):
+                yield request_or_item
 
         except Exception as e:
             print(f'❌ Error parsing article {response.url}: {e}')
@@ -336,6 +367,84 @@ class JobSpider(scrapy.Spider):
                 "status": f"error: {str(e)}"
             }
 
+    async def extract_page_sections(self, site, response):
+        """
+        Trích xuất các phần tĩnh (không cần render) của trang sản phẩm.
+        Chạy qua process pool nếu PARSE_PROCESS_POOL_SIZE > 0, ngược lại chạy ngay trong callback.
+        """
+        url = response.request.url
+        if self.parse_stage is not None:
+            d = self.parse_stage.submit(site, response.body, url, response.encoding)
+            return await maybe_deferred_to_future(d)
+        return self.extract_sections(site, response.body, url, response.encoding)
+
+    def extract_sections(self, site, body, url, encoding):
+        """Parse HTML và chạy các extractor của một site, trả về dict các phần (hoặc None nếu bỏ qua trang)"""
+        extract = getattr(self, self.SECTION_EXTRACTORS[self.extraction_backend][site])
+        document = None
+        try:
+            if self.extraction_backend == 'lxml':
+                document = lx.parse_html(body, encoding)
+            else:
+                strainer = section_strainer(site) if self.parse_only_sections else None
+                document = BeautifulSoup(body, "lxml", from_encoding=encoding, parse_only=strainer)
+            sections = extract(document, url, body)
+        except Exception as e:
+            self.capture_page(url, body, failure=f"failure: {e}", artifacts={'error.txt': traceback.format_exc()})
+            raise
+        finally:
+            # Cây bs4 có vòng tham chiếu parent <-> child nên chỉ được giải phóng khi GC chạy,
+            # phá ngay để cây không sống cùng response trong lúc chờ render (cây lxml tự giải phóng)
+            if isinstance(document, BeautifulSoup):
+                document.decompose()
+        if sections is None:
+            self.capture_page(url, body, failure="failure: product container not found")
+        else:
+            self.capture_page(url, body, artifacts={'sections.json': sections})
+        return sections
+
+    def capture_page(self, url, body, failure=None, artifacts=None):
+        """
+        Lưu HTML (và artifact kèm theo) của trang khi CAPTURE_MODE bật.
+        Không làm gì với mode 'off' - chỉ kiểm tra một flag, không serialize hay ghi file.
+        """
+        capture = self.capture
+        if capture is None or not capture.wants(failed=failure is not None):
+            return
+        artifacts = dict(artifacts or {})
+        artifacts['page.html'] = body
+        capture.capture(url, failure or 'sample', artifacts)
+
+    def _extract_sections_thegioididong(self, soup, url, body):
+        # --- Tìm các container chính ---
+        detail_container = soup.find("section", class_="detail")
+        if not detail_container:
+            print(f"⚠️ Critical: Main 'detail' container not found for {url}. Aborting.")
+            return None
+
+        # Các extractor BeautifulSoup chạy trên executor dùng chung của spider
+        return self.extraction.run_all([
+            ('basic_info', self.extract_basic_info, (detail_container, url)),
+            ('options', self.extract_options, (detail_container, url)),
+            ('specifications', self.extract_specifications, (soup, url)),
+            ('policies', self.extract_policies, (soup, url)),
+            ('price_static', self.extract_price_static, (soup, url)),
+        ])
+
+    def _extract_sections_thegioididong_lxml(self, root, url, body):
+        detail_container = lx.first(lx.TGDD_DETAIL, root) if root is not None else None
+        if detail_container is None:
+            print(f"⚠️ Critical: Main 'detail' container not found for {url}. Aborting.")
+            return None
+
+        return self.extraction.run_all([
+            ('basic_info', lx.extract_basic_info_thegioididong, (detail_container, url)),
+            ('options', lx.extract_options_thegioididong, (detail_container, url)),
+            ('specifications', lx.extract_specifications_thegioididong, (root, url)),
+            ('policies', lx.extract_policies_thegioididong, (root, url)),
+            ('price_static', lx.extract_price_static_thegioididong, (root, url)),
+        ])
+
     def extract_basic_info(self, detail_container, url):
         """Trích xuất thông tin cơ bản của sản phẩm"""
         product_data = {}
@@ -396,35 +505,177 @@ class JobSpider(scrapy.Spider):
             
         return product_data
 
-    def extract_price_and_promotions(self, url):
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        crawl_script_path = os.path.join(script_dir, '../../../client_crawl/thegioididong_crawl.js')
+    def extract_price_static(self, soup, url):
+        """
+        Giá & khuyến mãi của màu đang mở đọc thẳng từ HTML tĩnh, cùng selector và cùng field
+        với extractPriceAndPromotions (client_crawl/thegioididong_crawl.js), kèm link các màu
+        (`selected`: màu đang mở, giá trên trang là giá của màu này).
+        """
+        def text_content(node, selector):
+            # Giống `el.textContent.trim()`, '' nếu không có phần tử
+            tag = node.select_one(selector)
+            return tag.get_text().strip() if tag else ''
+
+        fields = {}
+        price_box = soup.select_one("div.price-one")
+        bs_price = soup.select_one("div.bs_title div.bs_price") if not price_box else None
+        if price_box:
+            fields['current_price'] = text_content(price_box, "p.box-price-present")
+            fields['original_price'] = text_content(price_box, "p.box-price-old")
+            fields['discount'] = text_content(price_box, "p.box-price-percent")
+            fields['installment_info'] = text_content(price_box, "span.label--black")
+        elif bs_price:
+            fields['current_price'] = text_content(bs_price, "strong")
+            fields['original_price'] = text_content(bs_price, "em")
+            fields['discount'] = text_content(bs_price, "i")
+            fields['installment_info'] = ''
+        else:
+            fields.update(current_price='', original_price='', discount='', installment_info='')
 
-        try:
-            proc = subprocess.run(
-                ["node", crawl_script_path, url],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
+        fields['location'] = text_content(soup, "div#location-detail a")
+
+        promo_box = soup.select_one("div.block__promo")
+        if promo_box:
+            fields['promo_title'] = text_content(promo_box, "p.pr-txtb")
+            fields['promo_list'] = [p.get_text().strip() for p in promo_box.select("div.divb-right p")]
+        else:
+            fields['promo_title'] = ''
+            fields['promo_list'] = []
+
+        fields['loyalty_points'] = text_content(soup, "p.loyalty__main__point")
+
+        colors = [{'name': a.get_text().strip(), 'href': urljoin(url, a.get('href') or ''),
+                   'selected': 'act' in (a.get('class') or [])}
+                  for a in soup.select("div.scrolling_inner div.box03.color.group.desk a.box03__item")]
+        return {'fields': fields, 'colors': colors}
+
+    def price_and_promotions_from_static(self, price_static, url):
+        """
+        Kết quả giống renderer ([{color, giá, khuyến mãi...}]) từ HTML tĩnh, None nếu vẫn phải render:
+        giá không có trong HTML tĩnh, hoặc sản phẩm có nhiều màu (HTML chỉ chứa màu đang mở).
+        """
+        stats = self.crawler.stats
+        if not self.price_static_first:
+            return None
+        if not price_static or not price_static['fields'].get('current_price'):
+            reason = 'no_price'
+        elif len(price_static['colors']) > 1:
+            reason = 'variants'
+        else:
+            stats.inc_value('price_static/hit')
+            colors = price_static['colors']
+            return [{'color': colors[0]['name'] if colors else '', **price_static['fields']}]
+
+        stats.inc_value('price_static/miss')
+        stats.inc_value(f'price_static/miss/{reason}')
+        return None
+
+    def wants_variant_requests(self, price_static, url):
+        """Sản phẩm nhiều màu có giá trong HTML tĩnh: lấy giá các màu bằng Request thay vì render"""
+        return (
+            self.variant_requests_enabled
+            and self.price_static_first
+            and bool(price_static and price_static['fields'].get('current_price'))
+            and len(price_static['colors']) > 1
+            and url not in self.variants
+        )
+
+    def variant_requests(self, url, item, price_static):
+        """
+        Đăng ký item vào aggregator và tạo Request cho các màu chưa có giá.
+        Màu đang mở dùng luôn giá của trang gốc. Trả về các Request (và item nếu đã đủ màu).
+        """
+        colors = price_static['colors']
+        selected = next((slot for slot, color in enumerate(colors) if color['selected']), None)
+        if selected is None:
+            selected = next((slot for slot, color in enumerate(colors) if color['href'] == url), None)
+        known = {selected: price_static['fields']} if selected is not None else {}
+
+        to_request, item = self.variants.add(url, item, colors, known)
+        stats = self.crawler.stats
+        stats.inc_value('variants/products')
+        stats.inc_value('variants/requested', len(to_request))
+        stats.inc_value('variants/shared', len(colors) - len(known) - len(to_request))
+
+        for variant_url in to_request:
+            yield Request(
+                url=variant_url,
+                callback=self.parse_variant,
+                errback=self.variant_failed,
+                # Dedup trong aggregator (mỗi URL màu chỉ một request đang chạy), không qua dupefilter
+                # để URL màu cũng có trong sitemap vẫn được crawl như một sản phẩm riêng
+                dont_filter=True,
+                headers={'Referer': url},
+                priority=2,  # Cao hơn sitemap/sản phẩm để item đang chờ sớm hoàn tất
+                meta={'variant_url': variant_url},
             )
+        if item is not None:
+            yield item
+
+    async def parse_variant(self, response):
+        """Giá & khuyến mãi của một màu từ HTML tĩnh, render riêng trang đó nếu HTML không có giá"""
+        variant_url = response.meta['variant_url']
+        fields = None
+        try:
+            price_static = self.extraction.run('variant_price_static', self.extract_price_static_page,
+                                               response.body, variant_url, response.encoding)
+            if price_static and price_static['fields'].get('current_price'):
+                fields = price_static['fields']
+                self.crawler.stats.inc_value('variants/static')
+        except Exception as e:
+            print(f"⚠️ Error extracting variant price for {variant_url}: {e}")
+
+        if fields is None:
+            fields = await self.render_variant_price(variant_url)
+
+        for item in self.variants.resolve(variant_url, fields):
+            yield item
+
+    async def variant_failed(self, failure):
+        """Tải trang màu thất bại (sau khi retry): render riêng trang đó"""
+        variant_url = failure.request.meta['variant_url']
+        print(f"⚠️ Variant request failed for {variant_url}: {failure.value}")
+        self.crawler.stats.inc_value('variants/download_failed')
 
-            output_str = proc.stdout.strip()
-            specs = []
-            # Thử load thẳng
-            try:
-                specs = json.loads(output_str)
-            except json.JSONDecodeError:
-                # Nếu stdout có thêm log khác, ta vẫn có thể extract mảng JSON
-                import re
-                m = re.search(r'(\[.*\])', output_str, re.S)
-                if not m:
-                    raise
-                specs = json.loads(m.group(1))
-
-            return specs
-        except subprocess.CalledProcessError as e:
-            print("Node.js error:", e.stderr)
+        fields = await self.render_variant_price(variant_url)
+        for item in self.variants.resolve(variant_url, fields):
+            yield item
+
+    def extract_price_static_page(self, body, url, encoding):
+        """Parse trang màu và chỉ đọc giá & khuyến mãi (theo EXTRACTION_BACKEND)"""
+        if self.extraction_backend == 'lxml':
+            root = lx.parse_html(body, encoding)
+            return lx.extract_price_static_thegioididong(root, url) if root is not None else None
+
+        strainer = section_strainer('thegioididong') if self.parse_only_sections else None
+        soup = BeautifulSoup(body, "lxml", from_encoding=encoding, parse_only=strainer)
+        try:
+            return self.extract_price_static(soup, url)
+        finally:
+            soup.decompose()
+
+    async def render_variant_price(self, url):
+        """Render giá & khuyến mãi của đúng một trang màu, None nếu lỗi"""
+        stats = self.crawler.stats
+        stats.inc_value('variants/rendered')
+        d = self.extraction.track('variant_price', self.render_pool.render_deferred(self.variant_render_task, url))
+        try:
+            return await maybe_deferred_to_future(d)
+        except RenderError as e:
+            print("Node.js error:", e)
+            stats.inc_value('variants/failed')
+            return None
+
+    def extract_price_and_promotions(self, url):
+        """Render giá & khuyến mãi qua render pool, trả về Deferred"""
+        def _failed(failure):
+            failure.trap(RenderError)
+            print("Node.js error:", failure.value)
+            return None
+
+        d = self.extraction.track('price_and_promotions', self.render_pool.render_deferred(SITES['thegioididong'].render_task, url))
+        d.addErrback(_failed)
+        return d
 
     def extract_specifications(self, soup, url):
         """Trích xuất thông số kỹ thuật"""
@@ -502,79 +753,34 @@ class JobSpider(scrapy.Spider):
             print(f"⚠️ Lỗi khi trích xuất thông tin chính sách: {e}")
             return {}
     
-    def _parse_product_info_cellphones(self, response):
+    async def _parse_product_info_cellphones(self, response):
         """Phương thức này sẽ được gọi để trích xuất thông tin sản phẩm từ trang chi tiết"""
         try:
             print(f'📄 Parsing product: {response.url}')
             url = response.request.url
-            soup = BeautifulSoup(response.text, "lxml")
 
             # Lưu nội dung HTML vào file để kiểm tra nếu cần
             # self._save_soup_to_file(soup, "output.html")
             # print("HTML content saved to output.html for debugging.")
             # return
             
-            # --- Khởi tạo các biến với giá trị mặc định ---
-            product_data = {}
-            
-            detail_container = soup.find("div", class_="box-detail-product")
-            if not detail_container:
-                print(f"⚠️ Critical: Main 'box-detail-product' container not found for {url}. Aborting.")
+            # --- Trích xuất các phần tĩnh từ HTML (in-process hoặc qua process pool) ---
+            sections = await self.extract_page_sections('cellphones', response)
+            if sections is None:
                 return
 
-            breadcrumb_items = []
-
-            try:
-                # 1. Tìm thẻ <script> chứa JSON-LD của breadcrumb
-                breadcrumb_script = soup.find('script', {'type': 'application/ld+json'}, string=lambda s: 'BreadcrumbList' in s)
-
-                if not isinstance(breadcrumb_script, Tag):
-                    return breadcrumb_items
-
-                # 2. Lấy nội dung JSON và parse nó
-                json_data = json.loads(breadcrumb_script.string)
+            # Thông số kỹ thuật render qua Node.js, không block reactor trong lúc chờ
+            specifications_info = await maybe_deferred_to_future(self._extract_product_specifications_cellphones(url))
 
-                # 3. Lặp qua 'itemListElement' để lấy tên của từng mục
-                if isinstance(json_data, dict) and 'itemListElement' in json_data:
-                    for item in json_data['itemListElement']:
-                        if 'item' in item and 'name' in item['item']:
-                            breadcrumb_items.append(item['item']['name'])
-
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"⚠️ Lỗi khi phân tích JSON-LD của breadcrumb: {e}")
-                print(traceback.format_exc())
-
-            print(f"🔗 Breadcrumb items: {breadcrumb_items}")
-            
-            detail_container_left = detail_container.find("div", class_="box-detail-product__box-left")
-            detail_container_center = detail_container.find("div", class_="box-detail-product__box-center")
-            
-            with ThreadPoolExecutor(max_workers=8) as executor:
-                # Submit các task để chạy song song
-                # Khởi tạo một danh sách để lưu các mục breadcrumb
-                future_basic_info = executor.submit(self._extract_basic_info_cellphones, detail_container_left, url)
-                future_options = executor.submit(self._extract_options_cellphones, detail_container_center, url)
-                future_promotions = executor.submit(self._extract_promotions_cellphones, detail_container_center, url)
-                future_payment_promotions = executor.submit(self._extract_payment_promotions_cellphones, detail_container_center, url)
-                future_commitments = executor.submit(self._extract_product_commitments_cellphones, detail_container_left, url)
-                future_specifications = executor.submit(self._extract_product_specifications_cellphones, url)
-
-                # Collect results
-                basic_info = future_basic_info.result()
-                options_info = future_options.result()
-                promotions_info = future_promotions.result()
-                payment_promotions_info = future_payment_promotions.result()
-                commitments_info = future_commitments.result()
-                specifications_info = future_specifications.result()
-
-                # Gộp tất cả dữ liệu vào product_data
-                product_data.update(basic_info)
-                product_data['product_type'] = breadcrumb_items
-                product_data.update(options_info)
-                product_data['promotions'] = promotions_info
-                product_data['payment_promotions'] = payment_promotions_info
-                product_data['commitments'] = commitments_info
-                product_data['specifications'] = specifications_info
+            # Gộp tất cả dữ liệu vào product_data
+            product_data = {}
+            product_data.update(sections['basic_info_cellphones'])
+            product_data['product_type'] = sections['breadcrumb_items']
+            product_data.update(sections['options_cellphones'])
+            product_data['promotions'] = sections['promotions_cellphones']
+            product_data['payment_promotions'] = sections['payment_promotions_cellphones']
+            product_data['commitments'] = sections['commitments_cellphones']
+            product_data['specifications'] = specifications_info
 
             if not product_data.get('product_name'):
                 print(f"⚠️ No product name found for: {url}")
@@ -603,6 +809,73 @@ class JobSpider(scrapy.Spider):
                 "crawled_at": strftime("%Y-%m-%d %H:%M:%S", gmtime()),
                 "status": f"error: {str(e)}"
             }
+
+    def _extract_sections_cellphones(self, soup, url, body):
+        detail_container = soup.find("div", class_="box-detail-product")
+        if not detail_container:
+            print(f"⚠️ Critical: Main 'box-detail-product' container not found for {url}. Aborting.")
+            return None
+
+        breadcrumb_items = []
+
+        try:
+            # 1. Tìm thẻ <script> chứa JSON-LD của breadcrumb
+            breadcrumb_script = soup.find('script', {'type': 'application/ld+json'}, string=lambda s: 'BreadcrumbList' in s)
+
+            if not isinstance(breadcrumb_script, Tag):
+                return None
+
+            # 2. Lấy nội dung JSON và parse nó
+            json_data = json.loads(breadcrumb_script.string)
+
+            # 3. Lặp qua 'itemListElement' để lấy tên của từng mục
+            if isinstance(json_data, dict) and 'itemListElement' in json_data:
+                for item in json_data['itemListElement']:
+                    if 'item' in item and 'name' in item['item']:
+                        breadcrumb_items.append(item['item']['name'])
+
+        except (json.JSONDecodeError, KeyError) as e:
+            print(f"⚠️ Lỗi khi phân tích JSON-LD của breadcrumb: {e}")
+            print(traceback.format_exc())
+
+        print(f"🔗 Breadcrumb items: {breadcrumb_items}")
+        
+        detail_container_left = detail_container.find("div", class_="box-detail-product__box-left")
+        detail_container_center = detail_container.find("div", class_="box-detail-product__box-center")
+
+        sections = self.extraction.run_all([
+            ('basic_info_cellphones', self._extract_basic_info_cellphones, (detail_container_left, url)),
+            ('options_cellphones', self._extract_options_cellphones, (detail_container_center, url)),
+            ('promotions_cellphones', self._extract_promotions_cellphones, (detail_container_center, url)),
+            ('payment_promotions_cellphones', self._extract_payment_promotions_cellphones, (detail_container_center, url)),
+            ('commitments_cellphones', self._extract_product_commitments_cellphones, (detail_container_left, url)),
+        ])
+        sections['breadcrumb_items'] = breadcrumb_items
+        return sections
+
+    def _extract_sections_cellphones_lxml(self, root, url, body):
+        detail_container = lx.first(lx.CPS_DETAIL, root) if root is not None else None
+        if detail_container is None:
+            print(f"⚠️ Critical: Main 'box-detail-product' container not found for {url}. Aborting.")
+            return None
+
+        breadcrumb_items = lx.extract_breadcrumb_cellphones(root, url)
+        if breadcrumb_items is None:
+            return None
+        print(f"🔗 Breadcrumb items: {breadcrumb_items}")
+
+        detail_container_left = lx.first(lx.CPS_LEFT, detail_container)
+        detail_container_center = lx.first(lx.CPS_CENTER, detail_container)
+
+        sections = self.extraction.run_all([
+            ('basic_info_cellphones', lx.extract_basic_info_cellphones, (detail_container_left, url)),
+            ('options_cellphones', lx.extract_options_cellphones, (detail_container_center, url)),
+            ('promotions_cellphones', lx.extract_promotions_cellphones, (detail_container_center, url)),
+            ('payment_promotions_cellphones', lx.extract_payment_promotions_cellphones, (detail_container_center, url)),
+            ('commitments_cellphones', lx.extract_commitments_cellphones, (detail_container_left, url)),
+        ])
+        sections['breadcrumb_items'] = breadcrumb_items
+        return sections
     
     def _extract_basic_info_cellphones(self, detail_container_left, url):
         """Trích xuất thông tin cơ bản của sản phẩm từ Cellphones"""
@@ -873,125 +1146,51 @@ class JobSpider(scrapy.Spider):
             return {}
     
     def _extract_product_specifications_cellphones(self, url):
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        crawl_script_path = os.path.join(script_dir, '../../../client_crawl/crawl.js')
-
-        # Khởi tạo giá trị mặc định cho specifications
-        specifications = {}
-
-        try:
-            future_specifications = subprocess.run(
-                ["node", crawl_script_path, url],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True
-            )
-
-            output_str = future_specifications.stdout
-            
-            # In toàn bộ output để dễ dàng debug nếu có lỗi
-            print("--- Output from Node.js script ---")
-            print(output_str)
-
-            json_start = output_str.find('{')
-            json_end = output_str.rfind('}') + 1
-
-            if json_start != -1 and json_end != -1:
-                json_str = output_str[json_start:json_end]
-                
-                try:
-                    # Chuyển đổi chuỗi JSON thành dictionary
-                    specifications = json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    print(f"Lỗi khi parse JSON: {e}")
-                    print(f"Chuỗi JSON không hợp lệ: {json_str}")
-            else:
+        """Render thông số kỹ thuật Cellphones qua render pool, trả về Deferred"""
+        def _done(specifications):
+            if not isinstance(specifications, dict):
                 print("\nKhông tìm thấy chuỗi JSON hợp lệ trong output của script Node.js.")
-
+                return {}
             return specifications
 
-        except subprocess.CalledProcessError as e:
-            print("--- LỖI XẢY RA TRONG SCRIPT NODE.JS ---")
-            print(f"Lệnh đã chạy: {' '.join(e.cmd)}")
-            print(f"Mã lỗi trả về: {e.returncode}")
-            print("\n--- STDERR ---")
-            print(e.stderr)
-            return {"error": e.stderr} # Trả về dictionary chứa thông tin lỗi
-        
-        except Exception as e:
-            print(f"Lỗi không xác định khi gọi Node.js: {e}")
-            return {"error": str(e)} # Trả về dictionary chứa thông tin lỗi
+        def _failed(failure):
+            if failure.check(RenderError):
+                print("--- LỖI XẢY RA TRONG SCRIPT NODE.JS ---")
+                print(f"URL: {url}")
+                print(failure.value)
+            else:
+                print(f"Lỗi không xác định khi gọi Node.js: {failure.value}")
+            return {"error": str(failure.value)} # Trả về dictionary chứa thông tin lỗi
+
+        d = self.extraction.track('specifications_cellphones', self.render_pool.render_deferred(SITES['cellphones'].render_task, url))
+        d.addCallbacks(_done, _failed)
+        return d
     
-    def _parse_product_info_fptshop(self, response):
+    async def _parse_product_info_fptshop(self, response):
         """Phương thức này sẽ được gọi để trích xuất thông tin sản phẩm từ trang chi tiết FPT Shop"""
         try:
             print(f'📄 Parsing product: {response.url}')
             url = response.request.url
-            soup = BeautifulSoup(response.text, "lxml")
 
             # Lưu nội dung HTML vào file để kiểm tra nếu cần
             # self._save_soup_to_file(soup, "output_fptshop.html")
             # print("HTML content saved to output_fptshop.html for debugging.")
             # return
 
-            # --- Khởi tạo các biến với giá trị mặc định ---
-            product_data = {}
-            
-            detail_container = soup.find("div", id="ThongTinSanPham")
-            if not detail_container:
-                print(f"⚠️ Critical: Main 'product-detail' container not found for {url}. Aborting.")
+            # --- Trích xuất các phần tĩnh từ HTML (in-process hoặc qua process pool) ---
+            sections = await self.extract_page_sections('fptshop', response)
+            if sections is None:
                 return
 
-            breadcrumb_container = soup.find('nav', class_='Breadcrumb')
-
-            breadcrumb_items = []
-            if breadcrumb_container:
-                # 2. Tìm tất cả các thẻ <li> bên trong container
-                list_items = breadcrumb_container.find_all('li')
-
-                for li in list_items:
-                    # 3. Trong mỗi <li>, tìm thẻ <a>
-                    a_tag = li.find('a')
-                    
-                    if a_tag:
-                        # 4. Lấy toàn bộ text bên trong thẻ <a>, strip=True sẽ dọn dẹp khoảng trắng
-                        # và tự động lấy text từ các thẻ con như <span>
-                        text = a_tag.get_text(strip=True)
-                        
-                        # Đảm bảo chỉ thêm các breadcrumb có nội dung
-                        if text:
-                            breadcrumb_items.append(text)
-            else:
-                print("⚠️ Không tìm thấy container của breadcrumb ('nav' với class 'Breadcrumb').")
-            
-            print("breadcrumb_items", breadcrumb_items)
-            
-            with ThreadPoolExecutor(max_workers=8) as executor:
-                # Submit các task để chạy song song
-                future_basic_info = executor.submit(self._extract_basic_info_fptshop, detail_container, url)
-                future_options = executor.submit(self._extract_options_fptshop, detail_container, url)
-                future_price = executor.submit(self._extract_price_fptshop, detail_container, url)
-                future_promotions = executor.submit(self._extract_all_promotions_fptshop, detail_container, url)
-                futre_extented_warranty = executor.submit(self._extract_extended_warranty_fptshop, detail_container, url)
-                future_specifications = executor.submit(self._extract_all_specs_fptshop, str(soup.prettify()), url)
-
-                # Collect results
-                basic_info = future_basic_info.result()
-                options_info = future_options.result()
-                price_info = future_price.result()
-                promotions_info = future_promotions.result()
-                extended_warranty_info = futre_extented_warranty.result()
-                specifications_info = future_specifications.result()
-
-                # Gộp tất cả dữ liệu vào product_data
-                product_data.update(basic_info)
-                product_data['product_type'] = breadcrumb_items
-                product_data.update(options_info)
-                product_data.update(price_info)
-                product_data['promotions'] = promotions_info
-                product_data['extended_warranty'] = extended_warranty_info
-                product_data['specifications'] = specifications_info
+            # Gộp tất cả dữ liệu vào product_data
+            product_data = {}
+            product_data.update(sections['basic_info_fptshop'])
+            product_data['product_type'] = sections['breadcrumb_items']
+            product_data.update(sections['options_fptshop'])
+            product_data.update(sections['price_fptshop'])
+            product_data['promotions'] = sections['promotions_fptshop']
+            product_data['extended_warranty'] = sections['extended_warranty_fptshop']
+            product_data['specifications'] = sections['specifications_fptshop']
             if not product_data.get('product_name'):
                 print(f"⚠️ No product name found for: {url}")
                 yield {
@@ -1017,6 +1216,67 @@ class JobSpider(scrapy.Spider):
                 "crawled_at": strftime("%Y-%m-%d %H:%M:%S", gmtime()),
                 "status": f"error: {str(e)}"
             }
+
+    def _extract_sections_fptshop(self, soup, url, body):
+        detail_container = soup.find("div", id="ThongTinSanPham")
+        if not detail_container:
+            print(f"⚠️ Critical: Main 'product-detail' container not found for {url}. Aborting.")
+            return None
+
+        breadcrumb_container = soup.find('nav', class_='Breadcrumb')
+
+        breadcrumb_items = []
+        if breadcrumb_container:
+            # 2. Tìm tất cả các thẻ <li> bên trong container
+            list_items = breadcrumb_container.find_all('li')
+
+            for li in list_items:
+                # 3. Trong mỗi <li>, tìm thẻ <a>
+                a_tag = li.find('a')
+                
+                if a_tag:
+                    # 4. Lấy toàn bộ text bên trong thẻ <a>, strip=True sẽ dọn dẹp khoảng trắng
+                    # và tự động lấy text từ các thẻ con như <span>
+                    text = a_tag.get_text(strip=True)
+                    
+                    # Đảm bảo chỉ thêm các breadcrumb có nội dung
+                    if text:
+                        breadcrumb_items.append(text)
+        else:
+            print("⚠️ Không tìm thấy container của breadcrumb ('nav' với class 'Breadcrumb').")
+        
+        print("breadcrumb_items", breadcrumb_items)
+
+        sections = self.extraction.run_all([
+            ('basic_info_fptshop', self._extract_basic_info_fptshop, (detail_container, url)),
+            ('options_fptshop', self._extract_options_fptshop, (detail_container, url)),
+            ('price_fptshop', self._extract_price_fptshop, (detail_container, url)),
+            ('promotions_fptshop', self._extract_all_promotions_fptshop, (detail_container, url)),
+            ('extended_warranty_fptshop', self._extract_extended_warranty_fptshop, (detail_container, url)),
+            ('specifications_fptshop', self._extract_all_specs_fptshop, (body, url)),
+        ])
+        sections['breadcrumb_items'] = breadcrumb_items
+        return sections
+
+    def _extract_sections_fptshop_lxml(self, root, url, body):
+        detail_container = lx.first(lx.FPT_DETAIL, root) if root is not None else None
+        if detail_container is None:
+            print(f"⚠️ Critical: Main 'product-detail' container not found for {url}. Aborting.")
+            return None
+
+        breadcrumb_items = lx.extract_breadcrumb_fptshop(root, url)
+        print("breadcrumb_items", breadcrumb_items)
+
+        sections = self.extraction.run_all([
+            ('basic_info_fptshop', lx.extract_basic_info_fptshop, (detail_container, url)),
+            ('options_fptshop', lx.extract_options_fptshop, (detail_container, url)),
+            ('price_fptshop', lx.extract_price_fptshop, (detail_container, url)),
+            ('promotions_fptshop', lx.extract_promotions_fptshop, (detail_container, url)),
+            ('extended_warranty_fptshop', lx.extract_extended_warranty_fptshop, (detail_container, url)),
+            ('specifications_fptshop', self._extract_all_specs_fptshop, (body, url)),
+        ])
+        sections['breadcrumb_items'] = breadcrumb_items
+        return sections
     
     def _extract_basic_info_fptshop(self, detail_container, url: str) -> dict:
         """
@@ -1305,11 +1565,54 @@ class JobSpider(scrapy.Spider):
         return data
 
 
-    def _extract_all_specs_fptshop(self, html_content: str, url: str) -> dict:
+    def _extract_all_specs_fptshop(self, body: bytes, url: str) -> dict:
+        """
+        Trích xuất thông số kỹ thuật từ flight payload (self.__next_f.push) của FPT Shop.
+        Đọc trực tiếp từ HTML thô, chỉ decode (json) các row chứa `attributeItem`.
+        Args:
+            body (bytes): HTML thô của response.
+            url (str): URL sản phẩm (để debug).
+        Returns:
+            dict: specs grouped by displayName.
+        """
+        payload = FlightPayload.from_body(body)
+        if payload is not None:
+            for row_id in payload.rows_containing('"attributeItem"'):
+                items = payload.find_key(payload.row(row_id), 'attributeItem', where=list)
+                if items is not None:
+                    return self._group_attribute_items_fptshop(items)
+
+        if demjson3 is None:
+            print(f"⚠️ [LỖI] Không tìm thấy attributeItem trong flight payload tại {url}")
+            self.capture_page(url, body, failure="failure: attributeItem not found in flight payload")
+            return {}
+        print(f"⚠️ Flight payload không có attributeItem tại {url}, dùng cách parse cũ (demjson3)")
+        return self._extract_all_specs_fptshop_legacy(body, url)
+
+    def _group_attribute_items_fptshop(self, items):
+        """Gom nhóm attributeItem theo groupName -> {displayName: value}"""
+        product_data = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            group = (item.get("groupName") or "").strip()
+            info = {}
+            for attr in item.get("attributes") or []:
+                if not isinstance(attr, dict):
+                    continue
+                name = (attr.get("displayName") or "").strip()
+                val = attr.get("value")
+                if name and val is not None:
+                    info[name] = val
+            if group:
+                product_data[group] = info
+        return product_data
+
+    def _extract_all_specs_fptshop_legacy(self, body: bytes, url: str) -> dict:
         """
-        Trích xuất thông số kỹ thuật từ self.__next_f.push của FPT Shop.
+        Cách parse cũ: regex lấy row "16:" rồi decode bằng demjson3 (chậm, chỉ dùng làm fallback).
         Args:
-            html_content (str): HTML chứa dữ liệu JS.
+            body (bytes): HTML thô chứa dữ liệu JS (không decode cả trang, chỉ decode row tìm được).
             url (str): URL sản phẩm (để debug).
         Returns:
             dict: specs grouped by displayName.
@@ -1318,28 +1621,30 @@ class JobSpider(scrapy.Spider):
 
         # 1. Tìm block JS (lấy phần "16:...[arr,map]...")
         m = re.search(
-            r'self\.__next_f\.push\(\[1,\s*"(16:.*?)"\]\)',
-            html_content,
+            rb'self\.__next_f\.push\(\[1,\s*"(16:.*?)"\]\)',
+            body,
             re.DOTALL
         )
         if not m:
             print(f"⚠️ [LỖI] Không tìm thấy JS data tại {url}")
+            self.capture_page(url, body, failure="failure: flight row 16 not found")
             return product_data
 
         # 2. Tách lấy phần raw sau "16:" và bỏ quotes bao bên ngoài
-        raw = m.group(1).split(":",1)[1].strip('"').replace('\\n','').replace('\\r','')
+        with memoryview(body) as view:
+            start, end = m.span(1)
+            row = str(view[start:end], 'utf-8', 'ignore')
+        raw = row.split(":",1)[1].strip('"').replace('\\n','').replace('\\r','')
         raw = re.sub(r'(?<!\\)"', r'\"', raw)
 
         raw = re.sub(r'\\(?![\\/\"bfnrtu])', r'\\\\', raw)
 
         # 3. Dùng json.loads để un-escape chính xác JS escapes (\\" , \\u..., v.v.)
-
-        with open("raw.json", 'w', encoding='utf-8') as f:
-            json.dump(raw, f, ensure_ascii=False, indent=2)
         try:
             unescaped = json.loads(f'"{raw}"')
         except json.JSONDecodeError as e:
             print(f"⚠️ [LỖI json.loads] tại {url}: {e}")
+            self.capture_page(url, body, failure=f"failure: json.loads: {e}", artifacts={'raw.txt': raw})
             return product_data
 
         # 4. Split mảng và object map
@@ -1355,62 +1660,18 @@ class JobSpider(scrapy.Spider):
         # 5. Build literal JS cho demjson3
         js_literal = f'{{"__root":{arr_str},{map_str}}}'
 
-        with open("output.json", 'w', encoding='utf-8') as f:
-            json.dump(js_literal, f, ensure_ascii=False, indent=2)
-
         # 6. Decode bằng demjson3
         try:
             obj_map = demjson3.decode(js_literal)
         except Exception as e:
             print(f"⚠️ [LỖI demjson3] tại {url}: {e}")
+            self.capture_page(url, body, failure=f"failure: demjson3: {e}",
+                              artifacts={'raw.txt': raw, 'js_literal.txt': js_literal})
             return product_data
 
-        # 7. Resolve các tham chiếu $...
-        def resolve(item, seen=None):
-            if seen is None:
-                seen = set()
-            if isinstance(item, str) and item.startswith("$"):
-                key = item[1:]
-                if key in seen:
-                    return None
-                seen.add(key)
-                return resolve(obj_map.get(key), seen)
-            if isinstance(item, list):
-                return [resolve(i, set(seen)) for i in item]
-            if isinstance(item, dict):
-                return {k: resolve(v, set(seen)) for k, v in item.items()}
-            return item
-
-        root = resolve(obj_map.get("__root", []))
-
-        # 8. Tìm tất cả attributeItem
-        def find_attribute_items(o):
-            if isinstance(o, dict):
-                if "attributeItem" in o and isinstance(o["attributeItem"], list):
-                    return o["attributeItem"]
-                for v in o.values():
-                    r = find_attribute_items(v)
-                    if r:
-                        return r
-            elif isinstance(o, list):
-                for i in o:
-                    r = find_attribute_items(i)
-                    if r:
-                        return r
-            return []
-
-        items = find_attribute_items(root)
+        # 7-8. Tìm attributeItem, chỉ resolve các tham chiếu $... trên đường tới nó
+        resolver = ReferenceResolver(obj_map.get)
+        items = resolver.find_key(obj_map.get("__root", []), "attributeItem", where=list) or []
 
         # 9. Gom nhóm theo groupName
-        for item in items:
-            group = item.get("groupName", "").strip()
-            info = {}
-            for attr in item.get("attributes", []):
-                name = attr.get("displayName", "").strip()
-                val = attr.get("value")
-                if name and val is not None:
-                    info[name] = val
-            if group:
-                product_data[group] = info
-
-        return product_data
\ No newline at end of file
+        return self._group_attribute_items_fptshop(items)
\ No newline at end of file
@@ -8,6 +8,11 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+# Thư mục project (chứa scrapy.cfg) để import được package `phone`
+project_dir = os.path.dirname(os.path.dirname(current_dir))
+if project_dir not in sys.path:
+    sys.path.insert(0, project_dir)
+
 def run_single_spider():
     """Chạy spider đơn với high concurrency"""
     try:
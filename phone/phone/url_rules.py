@@ -0,0 +1,110 @@
+# url_rules.py - Luật chọn URL từ sitemap theo từng site, compile một lần khi dùng
+from itertools import compress
+
+PHONE_BRANDS = [
+    "iphone", "samsung", "xiaomi", "oppo", "realme", "nothing", "infinix", "vivo",
+    "tecno", "sony", "itel", "nubia", "masstel", "nokia", "oneplus", "tcl", "inoi", "benco", "asus"
+]
+
+# Luật khai báo cho từng site:
+#   require : URL phải chứa tất cả các chuỗi
+#   exclude : URL không được chứa chuỗi nào
+#   any_of  : URL phải chứa ít nhất một chuỗi (không phân biệt hoa thường)
+# 'product' lọc URL sản phẩm trong urlset, 'sitemap' lọc sitemap con trong sitemapindex.
+URL_RULES = {
+    'thegioididong': {
+        'product': {
+            'require': ['http', 'dtdd'],
+            'exclude': ['sac', 'phu-kien'],
+        },
+        'sitemap': {},
+    },
+    'cellphones': {
+        'product': {
+            # Cellphones không có 'dien-thoai' trong URL sản phẩm -> nhận diện theo tên hãng
+            'require': ['http'],
+            'exclude': ['dien-thoai', 'sac', 'phu-kien'],
+            'any_of': PHONE_BRANDS,
+        },
+        'sitemap': {},
+    },
+    'fptshop': {
+        'product': {
+            'require': ['http', 'dien-thoai'],
+            'exclude': ['sac', 'phu-kien'],
+        },
+        'sitemap': {
+            'require': ['products', 'dien-thoai'],
+        },
+    },
+}
+
+
+def compile_rule(rule):
+    """
+    Compile một luật thành một predicate `match(url) -> bool`.
+
+    Các needle được gom sẵn thành tuple, kiểm tra theo thứ tự rẻ nhất trước: exclude
+    (loại sớm đa số URL không phải sản phẩm), require, rồi any_of trên URL đã lowercase
+    một lần. Phép `in` trên str chạy trong C nên nhanh hơn regex lookahead/alternation
+    với số needle ít như ở đây.
+    """
+    exclude = tuple(rule.get('exclude', ()))
+    require = tuple(rule.get('require', ()))
+    any_of = tuple(needle.lower() for needle in rule.get('any_of', ()))
+
+    def match(url):
+        for needle in exclude:
+            if needle in url:
+                return False
+        for needle in require:
+            if needle not in url:
+                return False
+        if not any_of:
+            return True
+        url = url.lower()
+        for needle in any_of:
+            if needle in url:
+                return True
+        return False
+
+    return match
+
+
+class UrlRules(object):
+    """Luật đã compile của một site"""
+
+    def __init__(self, site, product, sitemap=None):
+        self.site = site
+        self.product_match = compile_rule(product)
+        self.sitemap_match = compile_rule(sitemap or {})
+
+    @classmethod
+    def for_site(cls, site):
+        try:
+            rules = URL_RULES[site]
+        except KeyError:
+            raise ValueError(f"No URL rules for site {site!r} (expected one of {list(URL_RULES)})")
+        return cls(site, rules['product'], rules.get('sitemap'))
+
+    def is_product(self, url):
+        return self.product_match(url)
+
+    def follow_sitemap(self, url):
+        return self.sitemap_match(url)
+
+    def select(self, entries):
+        """Lọc danh sách (url, lastmod), giữ nguyên thứ tự"""
+        return list(compress(entries, map(self.product_match, [url for url, _ in entries])))
+
+
+_compiled = {}
+
+
+def get_rules(site):
+    """UrlRules của site, compile lần đầu rồi dùng lại"""
+    rules = _compiled.get(site)
+    if rules is None:
+        rules = _compiled[site] = UrlRules.for_site(site)
+    return rules
+
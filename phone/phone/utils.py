@@ -0,0 +1,30 @@
+# utils.py - Tiện ích dùng chung giữa spider và pipelines
+from concurrent.futures import CancelledError
+
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+
+def deferred_from_future(future):
+    """
+    Chuyển một concurrent.futures.Future thành Deferred.
+
+    Kết quả luôn được trả về trên thread của reactor (qua callFromThread), nên
+    callback Scrapy có thể `await` mà không block reactor trong lúc chờ.
+    """
+    from twisted.internet import reactor
+
+    d = Deferred()
+
+    def _fire(f):
+        if f.cancelled():
+            d.errback(Failure(CancelledError()))
+            return
+        exc = f.exception()
+        if exc is not None:
+            d.errback(Failure(exc))
+        else:
+            d.callback(f.result())
+
+    future.add_done_callback(lambda f: reactor.callFromThread(_fire, f))
+    return d
@@ -0,0 +1,78 @@
+# variants.py - Gom giá các màu (variant) của một sản phẩm về một item duy nhất
+
+
+class VariantAggregator(object):
+    """
+    Giữ item của sản phẩm gốc cho tới khi mọi màu đều có kết quả, key theo URL gốc.
+
+    - Mỗi màu là một slot theo thứ tự trên trang (giống thứ tự renderer duyệt các màu)
+    - Một URL màu chỉ được tải một lần tại một thời điểm: sản phẩm khác cần cùng URL
+      đăng ký chờ kết quả của request đang chạy thay vì tạo request mới
+    - Item hoàn tất có `product_data['price_and_promotions']` = [{color, giá, khuyến mãi...}],
+      chỉ gồm các màu lấy được giá (None nếu không màu nào lấy được, giống khi render lỗi)
+    """
+
+    def __init__(self):
+        self.products = {}  # URL gốc -> [item, tên các màu, kết quả theo slot, số slot còn chờ]
+        self.waiting = {}  # URL màu -> [(URL gốc, slot)]
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, parent_url):
+        return parent_url in self.products
+
+    def add(self, parent_url, item, colors, known=None):
+        """
+        Đăng ký `item` chờ giá của `colors` ([{'name', 'href'}]).
+
+        Args:
+            known (dict): {slot: fields} các màu đã có giá (vd: màu đang mở trên trang gốc)
+
+        Returns:
+            (list, dict|None): các URL màu cần request mới, và item nếu đã đủ ngay (mọi màu đều biết)
+        """
+        known = known or {}
+        results = [known.get(slot) for slot in range(len(colors))]
+        product = [item, [color['name'] for color in colors], results, 0]
+        self.products[parent_url] = product
+
+        to_request = []
+        for slot, color in enumerate(colors):
+            if slot in known:
+                continue
+            product[3] += 1
+            waiters = self.waiting.get(color['href'])
+            if waiters is None:
+                waiters = self.waiting[color['href']] = []
+                to_request.append(color['href'])
+            waiters.append((parent_url, slot))
+
+        if product[3] == 0:
+            return to_request, self._finish(parent_url)
+        return to_request, None
+
+    def resolve(self, variant_url, fields):
+        """Kết quả của một URL màu (fields, hoặc None nếu không lấy được); trả về các item vừa đủ màu"""
+        completed = []
+        for parent_url, slot in self.waiting.pop(variant_url, ()):
+            product = self.products.get(parent_url)
+            if product is None:
+                continue
+            product[2][slot] = fields
+            product[3] -= 1
+            if product[3] == 0:
+                completed.append(self._finish(parent_url))
+        return completed
+
+    def _finish(self, parent_url):
+        item, names, results, _ = self.products.pop(parent_url)
+        prices = [{'color': name, **fields} for name, fields in zip(names, results) if fields is not None]
+        item['product_data']['price_and_promotions'] = prices or None
+        return item
+
+    def drain(self):
+        """Lấy các item chưa đủ màu (khi spider đóng), với các màu đã có"""
+        items = [self._finish(parent_url) for parent_url in list(self.products)]
+        self.waiting.clear()
+        return items
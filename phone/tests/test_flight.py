@@ -0,0 +1,138 @@
+import json
+
+import pytest
+
+from phone.flight import FlightDecodeError, FlightPayload, ReferenceResolver, iter_chunks, split_rows
+
+
+def text_row(row_id, text):
+    # Độ dài row text tính theo byte UTF-8
+    return f'{row_id}:T{len(text.encode("utf-8")):x},{text}'
+
+
+def flight_html(payload, chunk_size=7):
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    scripts = ''.join(f'<script>self.__next_f.push([1,{json.dumps(chunk)}])</script>' for chunk in chunks)
+    return f'<html><body><script>self.__next_f.push([0])</script>{scripts}</body></html>'.encode('utf-8')
+
+
+def test_split_rows_json_and_tagged_rows():
+    rows = split_rows('0:["$","div",null,{}]\n\n1:I["chunk.js"]\n2:HL["/style.css"]\n3:{"a":1}')
+    assert rows == {
+        '0': '["$","div",null,{}]',
+        '1': 'I["chunk.js"]',
+        '2': 'HL["/style.css"]',
+        '3': '{"a":1}',
+    }
+
+
+def test_split_rows_text_row_with_multibyte_and_newlines():
+    text = 'Màn hình: 6.1"\nChip: A17 Pro – 3nm'
+    rows = split_rows(text_row('a', text) + '4:{"ok":true}\n' + text_row('b', 'đ') + '5:1\n')
+    # Row text không kết thúc bằng '\n': row tiếp theo bắt đầu ngay sau số byte đã khai báo
+    assert rows == {'a': ('T', text), '4': '{"ok":true}', 'b': ('T', 'đ'), '5': '1'}
+
+
+def test_split_rows_truncated_text_row():
+    with pytest.raises(FlightDecodeError):
+        split_rows('1:T1f')
+
+
+def test_from_body_joins_chunks():
+    text = 'Thông số\nkỹ thuật'
+    payload = '1:{"specs":"$2"}\n' + text_row('2', text) + '3:["a","b"]\n'
+    flight = FlightPayload.from_body(flight_html(payload))
+    assert len(flight) == 3
+    assert flight.row('2') == text
+    assert flight.resolve(flight.row('1')) == {'specs': text}
+    assert list(iter_chunks(b'<html></html>')) == []
+    assert FlightPayload.from_body(b'<html></html>') is None
+
+
+def test_rows_decoded_lazily():
+    flight = FlightPayload(split_rows('1:{"a":1}\n2:I["chunk.js"]\n3:not json\n'))
+    assert flight.decoded == {}
+    assert flight.row('1') == {'a': 1}
+    assert list(flight.decoded) == ['1']
+    assert flight.row('2') == ['chunk.js']  # Bỏ tag I
+    assert flight.row('3') == 'not json'
+    assert flight.row('missing') is None
+    assert flight.rows_containing('chunk') == ['2']
+
+
+def test_references_and_special_values():
+    flight = FlightPayload(split_rows(
+        '1:{"lazy":"$L2","promise":"$@2","path":"$3:items:1:name","dollar":"$$5","undef":"$undefined",'
+        '"unknown":"$9","inf":"$Infinity"}\n'
+        '2:"two"\n'
+        '3:{"items":[{"name":"x"},{"name":"y"}]}\n'
+    ))
+    assert flight.resolve(flight.row('1')) == {
+        'lazy': 'two',
+        'promise': 'two',
+        'path': 'y',
+        'dollar': '$5',
+        'undef': None,
+        'unknown': '$9',  # Row không tồn tại: giữ nguyên chuỗi
+        'inf': float('inf'),
+    }
+
+
+def resolver_for(data):
+    """ReferenceResolver định dạng cũ: '$key' trỏ tới data[key]"""
+    return ReferenceResolver(data.get)
+
+
+def test_resolver_breaks_cycles():
+    flight = FlightPayload(split_rows('1:{"self":"$1","next":"$2"}\n2:{"back":"$1","name":"two"}\n'))
+    assert flight.resolve('$1') == {'self': None, 'next': {'back': None, 'name': 'two'}}
+    # Chuỗi tham chiếu tới chính nó không có container ở giữa
+    resolver = resolver_for({'a': '$b', 'b': '$a'})
+    assert resolver.resolve(['$a', 'x']) == [None, 'x']
+
+
+def test_resolver_memoizes_shared_references():
+    data = {'shared': {'v': [1, 2]}, 'root': ['$shared', {'again': '$shared'}]}
+    lookups = []
+
+    def lookup(key):
+        lookups.append(key)
+        return data.get(key)
+
+    resolver = ReferenceResolver(lookup)
+    assert resolver.resolve('$root') == [{'v': [1, 2]}, {'again': {'v': [1, 2]}}]
+    assert resolver.resolve('$shared') == {'v': [1, 2]}
+    assert lookups == ['root', 'shared']
+    assert resolver.active == set()
+
+
+def test_resolver_deep_chain_without_recursion():
+    depth = 5000
+    data = {str(i): {'child': f'${i + 1}'} for i in range(depth)}
+    data[str(depth)] = 'leaf'
+    node = resolver_for(data).resolve('$0')
+    for _ in range(depth):
+        node = node['child']
+    assert node == 'leaf'
+
+
+def test_find_key_follows_references_without_resolving_everything():
+    data = {
+        'root': {'meta': '$meta', 'page': '$page'},
+        'meta': {'title': 'x'},
+        'page': ['$loop', {'specs': 'not a list'}, {'specs': ['$spec']}],
+        'loop': {'again': '$page'},
+        'spec': {'name': 'RAM', 'value': '8 GB'},
+    }
+    lookups = []
+
+    def lookup(key):
+        lookups.append(key)
+        return data.get(key)
+
+    resolver = ReferenceResolver(lookup)
+    assert resolver.find_key('$root', 'specs', where=list) == [{'name': 'RAM', 'value': '8 GB'}]
+    assert resolver.find_key('$root', 'specs') == 'not a list'
+    assert resolver.find_key('$root', 'missing') is None
+    # Tham chiếu vòng $page -> $loop -> $page chỉ được đi qua một lần
+    assert lookups.count('page') <= 3
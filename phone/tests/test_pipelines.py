@@ -0,0 +1,215 @@
+import queue
+import threading
+import types
+from collections import deque
+
+import pytest
+from scrapy.settings import Settings
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+
+from phone.pipelines import (
+    _STOP,
+    WRITE_CHANGED,
+    WRITE_NEW,
+    WRITE_UNCHANGED,
+    AdaptiveBatchSize,
+    ContentHashCache,
+    MongoItemWriter,
+    OptimizedMongoDBPipeline,
+    content_hash,
+)
+
+
+def test_batch_size_bounds():
+    assert AdaptiveBatchSize(initial=5, minimum=10, maximum=1000).value == 10
+    assert AdaptiveBatchSize(initial=5000, minimum=10, maximum=1000).value == 1000
+    sizer = AdaptiveBatchSize(initial=1, minimum=0, maximum=0)
+    assert (sizer.minimum, sizer.maximum, sizer.value) == (1, 1, 1)
+
+
+def test_batch_size_grows_on_fast_full_batches():
+    sizer = AdaptiveBatchSize(initial=100, minimum=10, maximum=300, target_ms=500)
+    assert sizer.observe(100, 100) == 200
+    assert sizer.observe(200, 100) == 300  # Không vượt maximum
+    assert sizer.observe(300, 100) == 300
+
+
+@pytest.mark.parametrize('size, elapsed_ms', [
+    (50, 100),   # Batch chưa đầy (flush do hết hạn)
+    (100, 300),  # Giữa target/2 và target
+    (100, 500),  # Đúng target
+])
+def test_batch_size_unchanged(size, elapsed_ms):
+    sizer = AdaptiveBatchSize(initial=100, minimum=10, maximum=1000, target_ms=500)
+    assert sizer.observe(size, elapsed_ms) == 100
+
+
+def test_batch_size_shrinks_on_slow_batches():
+    sizer = AdaptiveBatchSize(initial=400, minimum=10, maximum=1000, target_ms=500)
+    assert sizer.observe(400, 1000) == 200  # Tỉ lệ target / thời gian thực tế
+    assert sizer.observe(50, 2000) == 12  # Theo kích thước batch vừa ghi, không phải value hiện tại
+    assert sizer.observe(12, 60000) == 10  # Không dưới minimum
+
+
+def test_content_hash_ignores_key_order():
+    first = content_hash({'name': 'Phone', 'specs': {'RAM': '8 GB', 'ROM': '256 GB'}})
+    assert first == content_hash({'specs': {'ROM': '256 GB', 'RAM': '8 GB'}, 'name': 'Phone'})
+    assert first != content_hash({'name': 'Phone', 'specs': {'RAM': '12 GB', 'ROM': '256 GB'}})
+    assert len(first) == 32
+    assert content_hash(None) == content_hash(None)
+
+
+def test_content_hash_cache_is_lru():
+    cache = ContentHashCache(max_size=2)
+    cache.update({'a': 'ha', 'b': None})
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 'ha', 'b': None}  # None: document chưa có hash
+    cache.get_many(['a'])  # 'a' vừa dùng, 'b' bị đẩy ra trước
+    cache.update({'c': 'hc'})
+    assert len(cache) == 2
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 'ha', 'c': 'hc'}
+
+
+class Spider(object):
+    def __init__(self, recrawl):
+        self.settings = Settings({'INCREMENTAL_RECRAWL': recrawl})
+        self.stored = []
+
+    def mark_stored(self, urls, site):
+        self.stored.extend(urls)
+
+
+def make_writer(monkeypatch, recrawl):
+    monkeypatch.setenv('url', 'mongodb://localhost:27017')
+    writer = MongoItemWriter()
+    writer.setup(Spider(recrawl))
+    return writer
+
+
+def make_item(name, price='10.990.000₫', status='success'):
+    return {'url': f'https://example.com/{name}', 'status': status, 'crawled_at': '2024-05-02 10:00:00',
+            'product_data': {'product_name': name, 'price': price}}
+
+
+def stored_hash(item):
+    return content_hash(item['product_data'])
+
+
+def test_known_hashes_only_prefetches_when_recrawling(monkeypatch):
+    cached, missing = make_item('cached'), make_item('missing')
+    for recrawl, expected in ((False, []), (True, [missing['url']])):
+        writer = make_writer(monkeypatch, recrawl)
+        writer.content_hashes.update({cached['url']: 'old'})
+        known, to_fetch = writer.known_hashes([cached, missing])
+        assert known == {cached['url']: 'old'}
+        assert to_fetch == expected
+        assert cached['content_hash'] == stored_hash(cached)
+
+    assert writer.prefetch_query(['u']) == ({'url': {'$in': ['u']}}, {'_id': 0, 'url': 1, 'content_hash': 1})
+    assert writer.remember_hashes([{'url': 'u', 'content_hash': 'h'}, {'url': 'v'}]) == {'u': 'h', 'v': None}
+    assert writer.content_hashes.get_many(['u', 'v']) == {'u': 'h', 'v': None}
+
+
+def test_plan_writes_on_recrawl(monkeypatch):
+    writer = make_writer(monkeypatch, recrawl=True)
+    new, same, changed, legacy, failed = (make_item('new'), make_item('same'), make_item('changed'),
+                                          make_item('legacy'), make_item('failed', status='error'))
+    batch = [new, same, changed, legacy, failed]
+    writer.known_hashes(batch)
+    known = {same['url']: stored_hash(same), changed['url']: 'old', legacy['url']: None, failed['url']: 'old'}
+
+    plan = writer.plan_writes(batch, known)
+    assert plan.items == [new, same, changed, legacy]
+    assert plan.kinds == [WRITE_NEW, WRITE_UNCHANGED, WRITE_CHANGED, WRITE_CHANGED]
+    assert plan.skipped == [failed]  # Crawl lại lỗi không ghi đè dữ liệu đã lưu
+
+    updates = [(operation._filter, operation._doc, operation._upsert) for operation in plan.operations]
+    assert updates[0] == ({'url': new['url']}, {'$set': new}, True)
+    # Nội dung không đổi: chỉ gửi crawled_at
+    assert updates[1] == ({'url': same['url']}, {'$set': {'crawled_at': same['crawled_at']}}, False)
+    assert updates[2] == ({'url': changed['url']}, {'$set': changed}, False)
+
+
+def test_plan_writes_without_recrawl(monkeypatch):
+    writer = make_writer(monkeypatch, recrawl=False)
+    new, existing = make_item('new'), make_item('existing')
+    writer.known_hashes([new, existing])
+
+    plan = writer.plan_writes([new, existing], {existing['url']: stored_hash(existing)})
+    assert plan.kinds == [WRITE_NEW]
+    assert plan.operations[0]._doc == {'$setOnInsert': new}
+    assert plan.skipped == [existing]
+
+
+def test_record_result(monkeypatch):
+    writer = make_writer(monkeypatch, recrawl=True)
+    new, same, changed = make_item('new'), make_item('same'), make_item('changed')
+    failed = make_item('failed', status='error')
+    batch = [new, same, changed, failed]
+    writer.known_hashes(batch)
+    plan = writer.plan_writes(batch, {same['url']: stored_hash(same), changed['url']: 'old', failed['url']: 'old'})
+
+    collection = types.SimpleNamespace(full_name='phone.items')
+    writer.record_result(collection, None, plan, types.SimpleNamespace(upserted_ids={0: 'id'}))
+    assert {key: writer.stats[key] for key in ('processed', 'inserted', 'updated', 'unchanged', 'duplicates')} == {
+        'processed': 4, 'inserted': 1, 'updated': 1, 'unchanged': 1, 'duplicates': 1,
+    }
+    assert writer.spider.stored == [new['url'], same['url'], changed['url']]
+    # Hash sau khi ghi được nhớ: lần crawl lại tiếp theo không cần đọc trước
+    assert writer.content_hashes.get_many([changed['url']]) == {changed['url']: stored_hash(changed)}
+
+
+def test_record_result_counts_upsert_hitting_existing_document(monkeypatch):
+    writer = make_writer(monkeypatch, recrawl=False)
+    item = make_item('raced')
+    writer.known_hashes([item])
+    plan = writer.plan_writes([item], {})
+
+    collection = types.SimpleNamespace(full_name='phone.items')
+    writer.record_result(collection, None, plan, types.SimpleNamespace(upserted_ids={}))
+    assert (writer.stats['inserted'], writer.stats['duplicates']) == (0, 1)
+    assert writer.spider.stored == []
+
+
+def test_process_item_waits_for_writer_when_queue_is_full(monkeypatch):
+    # Thread reactor giả lập: các lời gọi callFromThread của writer chạy trên thread của test
+    reactor_calls = queue.Queue()
+    monkeypatch.setattr(reactor, 'callFromThread', lambda f, *args: reactor_calls.put((f, args)))
+    monkeypatch.setenv('url', 'mongodb://localhost:27017')
+
+    pipeline = OptimizedMongoDBPipeline()
+    pipeline.queue_size = 2
+    pipeline.writer_threads = 1
+    pipeline.batch_timeout = 0.01
+    pipeline.setup(Spider(recrawl=False))
+    pipeline.item_queue = queue.Queue(maxsize=pipeline.queue_size)
+    written = []
+    release = threading.Event()
+
+    def process_batch(batch):
+        release.wait(5)  # MongoDB chậm
+        written.extend(item['url'] for item in batch)
+
+    monkeypatch.setattr(pipeline, 'process_batch', process_batch)
+
+    items = [make_item(f'p{i}') for i in range(3)]
+    for item in items[:2]:
+        assert Deferred.fromCoroutine(pipeline.process_item(item)).called
+    blocked = Deferred.fromCoroutine(pipeline.process_item(items[2]))
+    assert not blocked.called
+    assert len(pipeline.space_waiters) == 1
+
+    pipeline.start_background_processor()
+    try:
+        while not blocked.called:
+            f, args = reactor_calls.get(timeout=5)
+            f(*args)
+        assert blocked.result is items[2]
+        assert pipeline.space_waiters == deque()
+        assert pipeline.item_queue.qsize() == 1
+    finally:
+        release.set()
+        pipeline.item_queue.put(_STOP)
+        for thread in pipeline.processing_threads:
+            thread.join(5)
+    assert sorted(written) == [item['url'] for item in items]
@@ -0,0 +1,132 @@
+from datetime import datetime, timezone
+
+from phone.price_history import (parse_price, split_cellphones, split_fptshop, split_item,
+                                 split_thegioididong)
+from phone.sites import SITES
+
+
+def test_parse_price_formats():
+    assert parse_price('10.990.000₫') == 10990000
+    assert parse_price('10,990,000đ') == 10990000
+    assert parse_price('Giá: 10990000') == 10990000
+    assert parse_price(8990000) == 8990000
+    assert parse_price('') is None
+    assert parse_price(None) is None
+    assert parse_price('Liên hệ') is None
+
+
+def test_parse_price_takes_first_amount_of_a_range():
+    assert parse_price('10.990.000₫ - 12.000.000₫') == 10990000
+
+
+def test_split_thegioididong_keeps_every_entry_field():
+    product_data = {
+        'product_name': 'iPhone',
+        'price_and_promotions': [{
+            'color': 'Đen',
+            'current_price': '10.990.000₫',
+            'original_price': '12.990.000₫',
+            'discount': '-15%',
+            'installment_info': 'Trả góp 0%',
+            'location': 'Hồ Chí Minh',
+            'promo_title': 'Khuyến mãi',
+            'promo_list': ['Giảm 500.000₫', ''],
+            'loyalty_points': '+2.747 điểm',
+        }],
+    }
+    static, observations = split_thegioididong(product_data)
+
+    assert static == {'product_name': 'iPhone'}
+    assert 'price_and_promotions' in product_data  # Không sửa dict gốc
+    assert observations == [{
+        'color': 'Đen',
+        'current_price': 10990000,
+        'original_price': 12990000,
+        'discount': '-15%',
+        'promotions': ['Giảm 500.000₫'],
+        'installment_info': 'Trả góp 0%',
+        'location': 'Hồ Chí Minh',
+        'promo_title': 'Khuyến mãi',
+        'loyalty_points': '+2.747 điểm',
+    }]
+
+
+def test_split_cellphones_uses_sale_price_for_active_color():
+    product_data = {
+        'product_name': 'Galaxy',
+        'sale_price': '9.990.000đ',
+        'base_price': '11.000.000đ',
+        'colors': {
+            'Xanh': {'price': '9.990.000đ', 'url': '/xanh', 'is_active': True},
+            'Đỏ': {'price': '10.190.000đ', 'url': '/do', 'is_active': False},
+        },
+        'promotions': {'promotion_title': 'KM', 'promotions': [{'detail': 'Giảm 1 triệu', 'link': None}]},
+    }
+    static, observations = split_cellphones(product_data)
+
+    assert static == {
+        'product_name': 'Galaxy',
+        'colors': {'Xanh': {'url': '/xanh', 'is_active': True}, 'Đỏ': {'url': '/do', 'is_active': False}},
+    }
+    assert [(o['color'], o['current_price'], o['original_price']) for o in observations] == [
+        ('Xanh', 9990000, 11000000),
+        ('Đỏ', 10190000, None),
+    ]
+    assert all(o['promotions'] == ['Giảm 1 triệu'] and o['promo_title'] == 'KM' for o in observations)
+
+
+def test_split_cellphones_without_colors():
+    static, observations = split_cellphones({'sale_price': '1.000.000đ'})
+    assert static == {}
+    assert [(o['color'], o['current_price']) for o in observations] == [('', 1000000)]
+
+
+def test_split_fptshop_keeps_other_promotions():
+    product_data = {
+        'product_name': 'Xiaomi',
+        'current_price': 8990000,
+        'original_price': 9990000,
+        'discount_percent': '10%',
+        'reward_points': '+2.000',
+        'color_options': [{'name': 'Đen', 'is_selected': False}, {'name': 'Tím', 'is_selected': True}],
+        'promotions': {'general_promotions': ['Tặng ốp'], 'payment_promotions': [{'description': 'VNPAY'}]},
+    }
+    static, observations = split_fptshop(product_data)
+
+    assert static['promotions'] == {'payment_promotions': [{'description': 'VNPAY'}]}
+    assert static['reward_points'] == '+2.000'
+    assert 'current_price' not in static and 'general_promotions' in product_data['promotions']
+    assert observations == [{'color': 'Tím', 'current_price': 8990000, 'original_price': 9990000,
+                             'discount': '10%', 'promotions': ['Tặng ốp']}]
+
+
+def test_split_item_builds_timeseries_documents():
+    item_data = {
+        'url': 'https://www.thegioididong.com/dtdd/a',
+        'status': 'success',
+        'crawled_at': '2024-05-01 10:00:00',
+        'product_data': {'product_name': 'A', 'price_and_promotions': [
+            {'color': 'Đen', 'current_price': '10.990.000₫'},
+            {'color': 'Trắng', 'current_price': ''},  # Không có giá: bỏ qua
+        ]},
+    }
+    documents = split_item(SITES['thegioididong'], item_data)
+
+    assert item_data['product_data'] == {'product_name': 'A'}
+    assert documents == [{
+        'observed_at': datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc),
+        'meta': {'url': 'https://www.thegioididong.com/dtdd/a', 'color': 'Đen'},
+        'current_price': 10990000,
+        'original_price': None,
+        'discount': None,
+        'promotions': [],
+    }]
+
+
+def test_split_item_leaves_failed_and_unknown_items_alone():
+    failed = {'url': 'https://fptshop.com.vn/x', 'status': 'error: timeout', 'product_data': {'current_price': 1}}
+    assert split_item(SITES['fptshop'], failed) == []
+    assert failed['product_data'] == {'current_price': 1}
+
+    unknown = {'url': 'https://example.com/x', 'status': 'success', 'product_data': {'current_price': 1}}
+    assert split_item(None, unknown) == []
@@ -0,0 +1,250 @@
+import pytest
+
+from phone import seen_urls
+from phone.seen_urls import FingerprintSeenUrlIndex
+
+STORED = ['https://example.com/a', 'https://example.com/b', 'https://example.com/a']
+
+
+@pytest.fixture
+def stored_urls(monkeypatch):
+    """Collection giả: iter_stored_urls trả về STORED, đếm số lần đọc MongoDB"""
+    calls = []
+
+    def fake_iter_stored_urls(mongo_url, db_name, collection_name, batch_size=10000):
+        calls.append((db_name, collection_name))
+        return iter(STORED)
+
+    monkeypatch.setattr(seen_urls, 'iter_stored_urls', fake_iter_stored_urls)
+    return calls
+
+
+def test_fingerprint_index_loads_and_dedups(stored_urls):
+    index = FingerprintSeenUrlIndex('mongodb://unused', 'db')
+    index.open()
+
+    assert len(index) == 2
+    assert 'https://example.com/a' in index
+    assert 'https://example.com/c' not in index
+    assert stored_urls == [('db', 'details_raw')]
+
+
+def test_fingerprint_index_add_and_filter_new(stored_urls):
+    index = FingerprintSeenUrlIndex('mongodb://unused', 'db')
+    index.open()
+    index.add('https://example.com/c')
+    index.add('https://example.com/a')  # Đã có: không đếm lại
+
+    assert len(index) == 3
+    urls = ['https://example.com/d', 'https://example.com/c', 'https://example.com/e', 'https://example.com/b']
+    assert index.filter_new(urls) == ['https://example.com/d', 'https://example.com/e']
+    assert index.filter_due([(url, None) for url in urls]) == ['https://example.com/d', 'https://example.com/e']
+
+
+def test_fingerprint_snapshot_roundtrip(stored_urls, tmp_path):
+    path = str(tmp_path / 'seen.bin')
+    index = FingerprintSeenUrlIndex('mongodb://unused', 'db', snapshot_path=path)
+    index.open()
+    index.add('https://example.com/c')
+    index.close()
+
+    reopened = FingerprintSeenUrlIndex('mongodb://unused', 'db', snapshot_path=path)
+    reopened.open()
+    assert len(stored_urls) == 1  # Lần mở thứ hai đọc snapshot, không đọc MongoDB
+    assert len(reopened) == 3
+    assert all(url in reopened for url in ('https://example.com/a', 'https://example.com/b', 'https://example.com/c'))
+
+
+def test_fingerprint_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'seen.bin'
+    path.write_bytes(b'NOTASNAP' + b'\0' * 8)
+    index = FingerprintSeenUrlIndex('mongodb://unused', 'db', snapshot_path=str(path))
+    with pytest.raises(ValueError):
+        index.open()
+
+
+# ---------------------------------------------------------------------------
+# BloomSeenUrlIndex
+# ---------------------------------------------------------------------------
+
+def make_bloom(tmp_path, capacity=1000, error_rate=0.01, **kwargs):
+    return seen_urls.BloomSeenUrlIndex('mongodb://unused', 'db', path=str(tmp_path / 'seen.bloom'),
+                                       capacity=capacity, error_rate=error_rate, **kwargs)
+
+
+def test_bloom_optimal_size():
+    num_bits, num_hashes = seen_urls.BloomSeenUrlIndex.optimal_size(1000, 0.01)
+    # m = -n ln p / (ln 2)^2 ≈ 9586 bit, làm tròn lên bội số của 8; k = m/n ln 2 ≈ 7
+    assert num_bits == 9592
+    assert num_hashes == 7
+    assert seen_urls.BloomSeenUrlIndex.optimal_size(10, 0.5)[1] >= 1
+
+
+def test_bloom_has_no_false_negatives_and_bounded_false_positives(stored_urls, tmp_path):
+    index = make_bloom(tmp_path, confirm_positives=False)
+    index.open()
+    added = [f'https://example.com/p{i}' for i in range(1000)]
+    index.add_many(added)
+
+    assert all(url in index for url in added)
+    others = [f'https://example.com/q{i}' for i in range(10000)]
+    false_positives = sum(1 for url in others if url in index)
+    assert false_positives / len(others) < 0.03  # error_rate 0.01, chừa biên
+    index.close()
+
+
+def test_bloom_persists_and_keeps_stored_size(stored_urls, tmp_path):
+    index = make_bloom(tmp_path, confirm_positives=False)
+    index.open()
+    index.add('https://example.com/c')
+    num_bits, num_hashes, count = index.num_bits, index.num_hashes, len(index)
+    index.close()
+
+    # Settings khác: kích thước lấy từ file, không build lại từ MongoDB
+    reopened = make_bloom(tmp_path, capacity=10, error_rate=0.5, confirm_positives=False)
+    reopened.open()
+    assert len(stored_urls) == 1
+    assert (reopened.num_bits, reopened.num_hashes, len(reopened)) == (num_bits, num_hashes, count)
+    assert count == 3
+    assert all(url in reopened for url in ('https://example.com/a', 'https://example.com/b', 'https://example.com/c'))
+    reopened.close()
+
+
+def test_bloom_refresh_rebuilds(stored_urls, tmp_path):
+    make_bloom(tmp_path, confirm_positives=False).open()
+    index = make_bloom(tmp_path, confirm_positives=False, refresh=True)
+    index.open()
+    assert len(stored_urls) == 2
+    index.close()
+
+
+def test_bloom_rejects_other_files(tmp_path):
+    (tmp_path / 'seen.bloom').write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        make_bloom(tmp_path).open()
+
+
+def test_bloom_filter_new_confirms_positives_in_batches(stored_urls, tmp_path, monkeypatch):
+    index = make_bloom(tmp_path, capacity=10000)
+    index.open()
+    added = [f'https://example.com/p{i}' for i in range(2500)]
+    index.add_many(added)
+
+    queries = []
+
+    def fake_confirm(urls):
+        queries.append(len(urls))
+        # MongoDB chỉ thực sự có các URL chẵn
+        return {url for url in urls if int(url.rsplit('p', 1)[1]) % 2 == 0}
+
+    monkeypatch.setattr(index, '_confirm', fake_confirm)
+    urls = added + ['https://example.com/new']
+    result = index.filter_new(urls)
+
+    assert index.blocking
+    assert queries == [1000, 1000, 500]  # CONFIRM_BATCH_SIZE mỗi query $in
+    assert result == [url for url in added if int(url.rsplit('p', 1)[1]) % 2] + ['https://example.com/new']
+    # `in` chỉ dùng bloom filter, không query
+    assert 'https://example.com/p1' in index
+    assert queries == [1000, 1000, 500]
+    index.close()
+
+
+def test_bloom_without_confirmation_is_not_blocking(stored_urls, tmp_path):
+    index = make_bloom(tmp_path, confirm_positives=False)
+    index.open()
+    assert not index.blocking
+    assert index.filter_new(['https://example.com/a', 'https://example.com/z']) == ['https://example.com/z']
+    index.close()
+
+
+# ---------------------------------------------------------------------------
+# LastCrawledIndex
+# ---------------------------------------------------------------------------
+
+DAY = 24 * 3600
+T0 = 1714557600  # 2024-05-01 10:00:00 UTC
+
+
+@pytest.fixture
+def stored_docs(monkeypatch):
+    docs = [
+        {'url': 'https://example.com/a', 'crawled_at': '2024-05-01 10:00:00'},
+        {'url': 'https://example.com/a', 'crawled_at': '2024-04-01 10:00:00'},  # Bản cũ hơn của cùng URL
+        {'url': 'https://example.com/b', 'crawled_at': 'không đọc được'},
+    ]
+    calls = []
+
+    def fake_iter_stored_docs(mongo_url, db_name, collection_name, fields, batch_size=10000):
+        calls.append(fields)
+        return iter(docs)
+
+    monkeypatch.setattr(seen_urls, 'iter_stored_docs', fake_iter_stored_docs)
+    return calls
+
+
+def test_parse_timestamp():
+    assert seen_urls.parse_timestamp('2024-05-01 10:00:00') == T0
+    assert seen_urls.parse_timestamp('2024-05-01T17:00:00+07:00') == T0
+    assert seen_urls.parse_timestamp('2024-05-01T10:00:00Z') == T0
+    assert seen_urls.parse_timestamp('2024-05-01') == T0 - 10 * 3600
+    assert seen_urls.parse_timestamp('') is None
+    assert seen_urls.parse_timestamp('yesterday') is None
+
+
+def test_last_crawled_keeps_latest_crawl(stored_docs):
+    index = seen_urls.LastCrawledIndex('mongodb://unused', 'db')
+    index.open()
+
+    assert stored_docs == [('url', 'crawled_at')]
+    assert index.last_crawled('https://example.com/a') == T0
+    assert index.last_crawled('https://example.com/b') == 0  # crawled_at hỏng: coi như rất cũ
+    assert index.last_crawled('https://example.com/c') is None
+    assert len(index) == 2
+
+
+def test_is_due(stored_docs):
+    index = seen_urls.LastCrawledIndex('mongodb://unused', 'db', max_age=7 * DAY)
+    index.open()
+    url = 'https://example.com/a'
+
+    assert index.is_due('https://example.com/new', now=T0)
+    assert not index.is_due(url, now=T0 + DAY)
+    assert not index.is_due(url, '2024-04-30', now=T0 + DAY)  # lastmod cũ hơn lần crawl
+    assert index.is_due(url, '2024-05-01T12:00:00Z', now=T0 + DAY)  # Trang đổi sau lần crawl
+    assert not index.is_due(url, 'không đọc được', now=T0 + DAY)
+    assert index.is_due(url, now=T0 + 8 * DAY)  # Quá max_age
+
+    no_max_age = seen_urls.LastCrawledIndex('mongodb://unused', 'db')
+    no_max_age.open()
+    assert not no_max_age.is_due(url, now=T0 + 365 * DAY)
+
+
+def test_add_records_new_crawls(stored_docs):
+    index = seen_urls.LastCrawledIndex('mongodb://unused', 'db')
+    index.open()
+    index.add('https://example.com/b', crawled_at=T0 + DAY)
+    index.add('https://example.com/c', crawled_at=T0 + DAY)
+
+    assert index.filter_due([('https://example.com/b', None), ('https://example.com/c', None),
+                             ('https://example.com/d', None)]) == ['https://example.com/d']
+    assert 'https://example.com/c' in index
+    assert len(index) == 3
+
+
+def test_last_crawled_snapshot_roundtrip(stored_docs, tmp_path):
+    path = str(tmp_path / 'last_crawled.bin')
+    index = seen_urls.LastCrawledIndex('mongodb://unused', 'db', snapshot_path=path)
+    index.open()
+    index.add('https://example.com/a', crawled_at=T0 + DAY)  # URL đã có: cập nhật tại chỗ
+    index.add('https://example.com/0', crawled_at=T0 + 2 * DAY)  # URL mới: chèn giữ thứ tự
+    index.close()
+
+    reopened = seen_urls.LastCrawledIndex('mongodb://unused', 'db', snapshot_path=path)
+    reopened.open()
+    assert len(stored_docs) == 1
+    assert list(reopened.fingerprints) == sorted(reopened.fingerprints)
+    assert reopened.last_crawled('https://example.com/a') == T0 + DAY
+    assert reopened.last_crawled('https://example.com/0') == T0 + 2 * DAY
+    assert reopened.last_crawled('https://example.com/b') == 0
+    assert len(reopened) == 3
@@ -0,0 +1,80 @@
+import gzip
+import zlib
+
+import pytest
+from lxml import etree
+
+from phone import sitemap
+from phone.sitemap import SitemapFormatError, decompress_body, iter_sitemap
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"'
+
+
+def urlset(count):
+    urls = ''.join(
+        f'<url><loc> https://example.com/p{i} </loc><lastmod>2024-05-0{i % 9 + 1}</lastmod>'
+        f'<image:image><image:loc>https://cdn.example.com/p{i}.jpg</image:loc></image:image></url>'
+        for i in range(count)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset {NS}>{urls}</urlset>'.encode()
+
+
+def test_iter_urlset():
+    entries = list(iter_sitemap(urlset(3)))
+    # <image:loc> không bị lấy nhầm, loc được strip
+    assert entries == [
+        ('url', 'https://example.com/p0', '2024-05-01'),
+        ('url', 'https://example.com/p1', '2024-05-02'),
+        ('url', 'https://example.com/p2', '2024-05-03'),
+    ]
+
+
+def test_iter_sitemapindex_and_missing_fields():
+    body = (f'<sitemapindex {NS}>'
+            '<sitemap><loc>https://example.com/sitemap-1.xml</loc></sitemap>'
+            '<sitemap><lastmod>2024-05-01</lastmod></sitemap>'  # Không có loc: bỏ qua
+            '<sitemap><loc>https://example.com/sitemap-2.xml</loc><lastmod>2024-05-02</lastmod></sitemap>'
+            '</sitemapindex>').encode()
+    assert list(iter_sitemap(body)) == [
+        ('sitemap', 'https://example.com/sitemap-1.xml', None),
+        ('sitemap', 'https://example.com/sitemap-2.xml', '2024-05-02'),
+    ]
+
+
+def test_iter_sitemap_rejects_unknown_root():
+    with pytest.raises(SitemapFormatError):
+        list(iter_sitemap(b'<html><body>403</body></html>'))
+
+
+def test_iter_sitemap_clears_processed_elements(monkeypatch):
+    roots = []
+    original = etree.iterparse
+
+    def recording_iterparse(*args, **kwargs):
+        # Ghi lại root (sự kiện 'start' đầu tiên) để xem cây trong lúc duyệt
+        for event, elem in original(*args, **kwargs):
+            if not roots:
+                roots.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(sitemap.etree, 'iterparse', recording_iterparse)
+
+    max_children = 0
+    for i, _ in enumerate(iter_sitemap(urlset(5000))):
+        max_children = max(max_children, len(roots[0]))
+    assert i == 4999
+    # Các <url> đã đọc bị xoá khỏi root: cây chỉ giữ phần parser đọc trước,
+    # không lớn theo kích thước sitemap
+    assert max_children < 500
+    assert len(roots[0]) <= 1
+
+
+def test_decompress_body():
+    xml = urlset(1)
+    assert decompress_body(xml) is xml
+    assert decompress_body(gzip.compress(xml)) == xml
+    assert decompress_body(zlib.compress(xml)) == xml
+    raw_deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert decompress_body(raw_deflate.compress(xml) + raw_deflate.flush()) == xml
+    assert decompress_body(sitemap.brotli.compress(xml), 'br') == xml
+    assert decompress_body(b'\x00garbage') == b'\x00garbage'
@@ -0,0 +1,69 @@
+from phone.variants import VariantAggregator
+
+
+def colors(*names):
+    return [{'name': name, 'href': f'https://example.com/phone?color={name}'} for name in names]
+
+
+def href(name):
+    return f'https://example.com/phone?color={name}'
+
+
+def new_item(url):
+    return {'url': url, 'product_data': {'product_name': url}}
+
+
+def test_completes_when_every_variant_resolves():
+    aggregator = VariantAggregator()
+    item = new_item('p1')
+    to_request, done = aggregator.add('p1', item, colors('red', 'blue', 'black'), known={0: {'current_price': 1}})
+    assert to_request == [href('blue'), href('black')]
+    assert done is None
+    assert 'p1' in aggregator
+
+    assert aggregator.resolve(href('black'), {'current_price': 3}) == []
+    # Màu không lấy được giá bị bỏ, thứ tự theo slot trên trang
+    assert aggregator.resolve(href('blue'), None) == [item]
+    assert item['product_data']['price_and_promotions'] == [
+        {'color': 'red', 'current_price': 1},
+        {'color': 'black', 'current_price': 3},
+    ]
+    assert len(aggregator) == 0
+    assert aggregator.waiting == {}
+
+
+def test_all_variants_known_finishes_immediately():
+    aggregator = VariantAggregator()
+    item = new_item('p1')
+    to_request, done = aggregator.add('p1', item, colors('red'), known={0: {'current_price': 1}})
+    assert (to_request, done) == ([], item)
+    assert len(aggregator) == 0
+
+
+def test_shared_variant_url_requested_once():
+    aggregator = VariantAggregator()
+    first, second = new_item('p1'), new_item('p2')
+    assert aggregator.add('p1', first, colors('red', 'blue'))[0] == [href('red'), href('blue')]
+    # p2 dùng chung URL màu 'blue' đang tải: chỉ chờ kết quả, không request lại
+    assert aggregator.add('p2', second, colors('blue', 'green'))[0] == [href('green')]
+
+    assert aggregator.resolve(href('blue'), {'current_price': 2}) == []
+    assert aggregator.resolve(href('red'), {'current_price': 1}) == [first]
+    assert aggregator.resolve(href('green'), None) == [second]
+    assert second['product_data']['price_and_promotions'] == [{'color': 'blue', 'current_price': 2}]
+    # URL đã có kết quả: lần sau được request lại
+    assert aggregator.resolve(href('blue'), {'current_price': 2}) == []
+
+
+def test_no_prices_and_drain():
+    aggregator = VariantAggregator()
+    failed, pending = new_item('p1'), new_item('p2')
+    aggregator.add('p1', failed, colors('red'))
+    aggregator.add('p2', pending, colors('red', 'blue'))
+    assert aggregator.resolve(href('red'), None) == [failed]
+    assert failed['product_data']['price_and_promotions'] is None
+
+    assert aggregator.drain() == [pending]
+    assert pending['product_data']['price_and_promotions'] is None
+    assert len(aggregator) == 0
+    assert aggregator.waiting == {}